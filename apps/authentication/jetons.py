@@ -0,0 +1,164 @@
+"""
+Authentication jetons - Authentification JWT sans lecture de l'utilisateur en base
+
+JWTAuthentication de simplejwt lit la ligne User à chaque requête, puis les
+vues lisent user.role (une requête de plus) pour restreindre les données.
+Les jetons émis par JetonRafraichissement portent ce qu'il faut pour s'en
+passer :
+
+- role, role_id : code et id du rôle ;
+- gare : gare de l'affectation principale en cours ;
+- is_staff ;
+- epoque : époque des jetons de l'utilisateur (User.epoque_jetons) à l'émission.
+
+JWTSansEtatAuthentication construit alors request.user à partir des claims :
+une instance User dont les autres champs sont différés (chargés depuis la
+base au premier accès, comme avec .only()), utilisable comme clé étrangère.
+
+Révocation : un jeton d'accès est refusé quand son époque est inférieure
+à l'époque courante de l'utilisateur. L'époque avance quand les claims
+deviennent faux (désactivation, changement de rôle ou de statut staff,
+affectation à une gare) et à la déconnexion ; la rotation d'un jeton de
+rafraîchissement ne la change pas. L'époque courante est mise en cache
+JWT_REVOCATION_CACHE_TIMEOUT secondes : c'est le délai maximal de prise en
+compte d'une révocation par les autres processus.
+
+Les jetons émis avant ces claims restent acceptés, avec lecture en base.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from apps.users.models import Role, User
+
+
+CLAIM_ROLE = 'role'
+CLAIM_ROLE_ID = 'role_id'
+CLAIM_GARE = 'gare'
+CLAIM_STAFF = 'is_staff'
+CLAIM_EPOQUE = 'epoque'
+
+CLE_EPOQUE = 'auth:epoque:{}'
+
+
+def claims_utilisateur(user):
+    """Claims de profil d'un utilisateur (rôle, gare principale, staff, époque)"""
+    return {
+        CLAIM_ROLE: user.role.nom if user.role_id else None,
+        CLAIM_ROLE_ID: str(user.role_id) if user.role_id else None,
+        CLAIM_GARE: str(user.gare_principale_id) if user.gare_principale_id else None,
+        CLAIM_STAFF: user.is_staff,
+        CLAIM_EPOQUE: user.epoque_jetons,
+    }
+
+
+class JetonRafraichissement(RefreshToken):
+    """RefreshToken portant les claims de profil, recopiés dans ses jetons d'accès"""
+
+    @classmethod
+    def for_user(cls, user):
+        jeton = super().for_user(user)
+        jeton.payload.update(claims_utilisateur(user))
+        return jeton
+
+    def enregistrer(self, user):
+        """Ajoute le jeton aux jetons émis de l'utilisateur (révocable en masse)"""
+        OutstandingToken.objects.create(
+            user=user,
+            jti=self[api_settings.JTI_CLAIM],
+            token=str(self),
+            created_at=self.current_time,
+            expires_at=datetime_from_epoch(self['exp']),
+        )
+
+
+def epoque_courante(user_id):
+    """Époque des jetons de l'utilisateur (-1 s'il n'existe plus), mise en cache"""
+    cle = CLE_EPOQUE.format(user_id)
+    epoque = cache.get(cle)
+    if epoque is None:
+        epoque = User.objects.filter(pk=user_id).values_list('epoque_jetons', flat=True).first()
+        if epoque is None:
+            epoque = -1
+        cache.set(cle, epoque, settings.JWT_REVOCATION_CACHE_TIMEOUT)
+    return epoque
+
+
+def changer_epoque(user_id):
+    """
+    Refuse les jetons d'accès déjà émis pour l'utilisateur ; ses jetons de
+    rafraîchissement restent valides et en émettent de nouveaux, à jour
+    """
+    User.objects.filter(pk=user_id).update(epoque_jetons=F('epoque_jetons') + 1)
+    cache.delete(CLE_EPOQUE.format(user_id))
+
+
+def revoquer_jetons_utilisateur(user_id):
+    """
+    Refuse tous les jetons de l'utilisateur : change l'époque et met en
+    liste noire ses jetons de rafraîchissement encore valides
+    """
+    changer_epoque(user_id)
+    emis = list(OutstandingToken.objects.filter(
+        user_id=user_id,
+        expires_at__gt=timezone.now(),
+        blacklistedtoken__isnull=True,
+    ))
+    if emis:
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token=jeton) for jeton in emis],
+            ignore_conflicts=True
+        )
+    return len(emis)
+
+
+def _instance_partielle(modele, base, valeurs):
+    """Instance comme chargée par .only(*valeurs) : les champs absents sont différés"""
+    champs = [champ.attname for champ in modele._meta.concrete_fields if champ.attname in valeurs]
+    return modele.from_db(base, champs, [valeurs[champ] for champ in champs])
+
+
+def utilisateur_depuis_jeton(jeton):
+    """User construit à partir des claims, sans requête"""
+    base = router.db_for_read(User)
+    role_id = jeton.get(CLAIM_ROLE_ID)
+    user = _instance_partielle(User, base, {
+        'id': uuid.UUID(jeton[api_settings.USER_ID_CLAIM]),
+        'role_id': uuid.UUID(role_id) if role_id else None,
+        'is_staff': bool(jeton[CLAIM_STAFF]),
+        'is_active': True,
+    })
+    if role_id:
+        user.role = _instance_partielle(Role, base, {'id': user.role_id, 'nom': jeton[CLAIM_ROLE]})
+    gare = jeton.get(CLAIM_GARE)
+    # Renseigne la cached_property : pas de requête sur les affectations
+    user.__dict__['gare_principale_id'] = uuid.UUID(gare) if gare else None
+    return user
+
+
+class JWTSansEtatAuthentication(JWTAuthentication):
+    """JWTAuthentication sans lecture de l'utilisateur en base (voir le module)"""
+
+    def get_user(self, validated_token):
+        if CLAIM_EPOQUE not in validated_token or CLAIM_STAFF not in validated_token:
+            # Jeton émis avant les claims de profil
+            return super().get_user(validated_token)
+
+        try:
+            user = utilisateur_depuis_jeton(validated_token)
+            revoque = validated_token[CLAIM_EPOQUE] < epoque_courante(user.pk)
+        except (KeyError, TypeError, ValueError):
+            raise AuthenticationFailed('Jeton invalide', code='token_not_valid')
+        if revoque:
+            raise AuthenticationFailed('Jeton révoqué', code='token_revoked')
+        return user
@@ -5,7 +5,11 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from apps.users.models import User, Role
+from .jetons import JetonRafraichissement, claims_utilisateur
 
 
 class RegisterSerializer(serializers.Serializer):
@@ -136,4 +140,40 @@ class UserInfoSerializer(serializers.ModelSerializer):
             'is_active', 
             'created_at'
         ]
-        read_only_fields = fields
\ No newline at end of file
+        read_only_fields = fields
+
+
+class RafraichissementSerializer(TokenRefreshSerializer):
+    """
+    Rafraîchissement des jetons (SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'])
+    
+    Les claims de profil (gare et époque comprises) sont relus en base : un
+    rafraîchissement après une révocation par changement d'époque émet des
+    jetons d'accès à jour. La rotation ne révoque pas les jetons d'accès déjà
+    émis.
+    """
+    token_class = JetonRafraichissement
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        
+        user = User.objects.select_related('role').filter(
+            pk=refresh[api_settings.USER_ID_CLAIM], is_active=True
+        ).first()
+        if user is None:
+            raise AuthenticationFailed('Utilisateur introuvable ou désactivé', code='user_inactive')
+        
+        data = {}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+        refresh.payload.update(claims_utilisateur(user))
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.enregistrer(user)
+            data['refresh'] = str(refresh)
+        
+        data['access'] = str(refresh.access_token)
+        return data
@@ -0,0 +1,43 @@
+"""
+Authentication signals - Révocation des jetons quand les claims de profil deviennent faux
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.users.models import AffectationGare, User
+
+from .jetons import changer_epoque, revoquer_jetons_utilisateur
+
+
+@receiver(pre_save, sender=User)
+def revoquer_si_profil_modifie(sender, instance, raw=False, **kwargs):
+    """
+    Désactivation, changement de rôle ou de statut staff : les jetons émis
+    portent l'ancien profil, ils sont révoqués (après le commit)
+    """
+    if raw or instance._state.adding:
+        return
+    ancien = User.objects.filter(pk=instance.pk).values(
+        'is_active', 'role_id', 'is_staff', 'epoque_jetons'
+    ).first()
+    if ancien is None:
+        return
+    # Une instance lue avant une révocation ne ramène pas l'époque en arrière
+    instance.epoque_jetons = max(instance.epoque_jetons, ancien['epoque_jetons'])
+    if (
+        ancien['is_active'] and not instance.is_active
+        or ancien['role_id'] != instance.role_id
+        or ancien['is_staff'] != instance.is_staff
+    ):
+        user_id = instance.pk
+        transaction.on_commit(lambda: revoquer_jetons_utilisateur(user_id))
+
+
+@receiver([post_save, post_delete], sender=AffectationGare)
+def changer_epoque_si_affectation_modifiee(sender, instance, raw=False, **kwargs):
+    """Le claim gare des jetons d'accès émis peut être faux : ils sont refusés (après le commit)"""
+    if raw:
+        return
+    user_id = instance.user_id
+    transaction.on_commit(lambda: changer_epoque(user_id))
@@ -3,7 +3,7 @@ Authentication URLs
 """
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import RegisterView, LoginView, MeView
+from .views import RegisterView, LoginView, LogoutView, MeView
 
 urlpatterns = [
     # Inscription
@@ -12,6 +12,7 @@ urlpatterns = [
     # Connexion
     path('login/', LoginView.as_view(), name='login'),
     path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     
     # User info
     path('me/', MeView.as_view(), name='me'),
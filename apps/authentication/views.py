@@ -4,8 +4,9 @@ Authentication views
 from rest_framework import status, generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
+from apps.users.models import User
+from .jetons import JetonRafraichissement, revoquer_jetons_utilisateur
 from .serializers import RegisterSerializer, LoginSerializer, UserInfoSerializer
 
 
@@ -32,8 +33,8 @@ class RegisterView(generics.CreateAPIView):
         if serializer.is_valid():
             user = serializer.save()
             
-            # Générer les tokens JWT
-            refresh = RefreshToken.for_user(user)
+            # Générer les tokens JWT (claims de profil : voir jetons.py)
+            refresh = JetonRafraichissement.for_user(user)
             
             # Données utilisateur
             user_data = UserInfoSerializer(user).data
@@ -72,8 +73,8 @@ class LoginView(TokenObtainPairView):
         if serializer.is_valid():
             user = serializer.validated_data['user']
             
-            # Générer les tokens JWT
-            refresh = RefreshToken.for_user(user)
+            # Générer les tokens JWT (claims de profil : voir jetons.py)
+            refresh = JetonRafraichissement.for_user(user)
             
             # Données utilisateur
             user_data = UserInfoSerializer(user).data
@@ -94,6 +95,22 @@ class LoginView(TokenObtainPairView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+class LogoutView(APIView):
+    """
+    Déconnexion : révoque tous les jetons de l'utilisateur (tous ses appareils)
+    
+    POST /api/v1/auth/logout/
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        revoquer_jetons_utilisateur(request.user.pk)
+        return Response({
+            'success': True,
+            'message': 'Déconnexion effectuée'
+        })
+
+
 class MeView(APIView):
     """
     Récupérer les infos de l'utilisateur connecté
@@ -103,7 +120,9 @@ class MeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        serializer = UserInfoSerializer(request.user)
+        # request.user est construit depuis le jeton : le profil complet est lu en base
+        user = User.objects.select_related('role').get(pk=request.user.pk)
+        serializer = UserInfoSerializer(user)
         return Response({
             'success': True,
             'user': serializer.data
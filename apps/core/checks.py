@@ -0,0 +1,28 @@
+"""
+Core checks - Vérifications au démarrage (manage.py check, runserver, migrate...)
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends dont le contenu n'est pas partagé entre processus
+CACHES_NON_PARTAGES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def verifier_cache_partage(app_configs, **kwargs):
+    """Les index en mémoire (apps.core.index_local) s'invalident via le cache"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend not in CACHES_NON_PARTAGES:
+        return []
+    return [Warning(
+        f'Le cache par défaut ({backend}) n\'est pas partagé entre processus.',
+        hint=(
+            'Les index en mémoire (correspondances, gares proches) des autres workers ne voient '
+            f'les modifications qu\'après INDEX_LOCAL_TIMEOUT ({settings.INDEX_LOCAL_TIMEOUT} s). '
+            'Définissez REDIS_URL en production.'
+        ),
+        id='core.W001',
+    )]
@@ -0,0 +1,171 @@
+"""
+Core identifiants - Numéros lisibles uniques (codes de suivi, tickets)
+
+Chaque générateur tire ses numéros d'une séquence en base
+(SequenceIdentifiants), par blocs : un processus réserve IDENTIFIANTS_TAILLE_BLOC
+valeurs en un UPDATE puis les distribue en mémoire, sans requête par
+identifiant. Les workers gunicorn ne peuvent pas obtenir le même bloc.
+Le bloc est réservé sur la connexion 'identifiants' quand elle existe :
+la ligne de la séquence n'est verrouillée que le temps de l'UPDATE, pas
+jusqu'à la fin de la transaction de l'appelant.
+
+SQLite (développement, tests) n'a pas de connexion 'identifiants' et
+l'allocation par blocs n'y est pas prise en charge dans une transaction :
+une seconde connexion attendrait le verrou d'écriture que l'appelant
+garde jusqu'à son commit. Un identifiant généré dans un bloc atomic y
+coûte donc un UPDATE (une valeur réservée par appel) ; hors transaction,
+les blocs fonctionnent comme ailleurs.
+
+Les numéros sont croissants dans chaque processus et de largeur fixe :
+les insertions dans l'index unique se font en fin de quelques blocs
+actifs au lieu d'être dispersées comme avec des valeurs aléatoires.
+
+Format : préfixe + numéro sur `largeur` chiffres + chiffre de contrôle
+(algorithme de Damm, qui détecte toute erreur sur un chiffre et toute
+inversion de deux chiffres voisins), ex. COL-0000012340.
+
+Les générateurs sont déclarés dans settings.IDENTIFIANTS ; la clé
+'classe' permet de brancher une autre implémentation.
+"""
+import itertools
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from .models import SequenceIdentifiants
+
+
+_DAMM = (
+    (0, 3, 1, 7, 5, 9, 8, 6, 4, 2),
+    (7, 0, 9, 2, 1, 5, 4, 8, 6, 3),
+    (4, 2, 0, 6, 8, 7, 1, 3, 5, 9),
+    (1, 7, 5, 0, 9, 8, 3, 4, 2, 6),
+    (6, 1, 2, 3, 0, 4, 5, 9, 7, 8),
+    (3, 6, 7, 4, 2, 0, 9, 5, 8, 1),
+    (5, 8, 6, 9, 7, 2, 0, 1, 3, 4),
+    (8, 9, 4, 5, 3, 6, 2, 0, 1, 7),
+    (9, 4, 3, 8, 6, 1, 7, 2, 0, 5),
+    (2, 5, 8, 1, 4, 3, 6, 7, 9, 0),
+)
+
+
+def chiffre_controle(chiffres):
+    """Chiffre de contrôle de Damm d'une chaîne de chiffres"""
+    interim = 0
+    for chiffre in chiffres:
+        interim = _DAMM[interim][ord(chiffre) - 48]
+    return str(interim)
+
+
+ALIAS_SEQUENCES = 'identifiants'
+
+
+def alias_sequences():
+    """Connexion des séquences : 'identifiants' si déclarée, sinon celle du routeur"""
+    if ALIAS_SEQUENCES in settings.DATABASES:
+        return ALIAS_SEQUENCES
+    return router.db_for_write(SequenceIdentifiants)
+
+
+def reserver_bloc(sequence, taille, alias=None):
+    """
+    Réserve `taille` valeurs de la séquence ; retourne (première, dernière).
+    L'UPDATE verrouille la ligne : deux processus ne reçoivent jamais
+    des blocs qui se chevauchent.
+    """
+    alias = alias or alias_sequences()
+    with transaction.atomic(using=alias):
+        lignes = SequenceIdentifiants.objects.using(alias).filter(nom=sequence)
+        if not lignes.update(valeur=F('valeur') + taille):
+            SequenceIdentifiants.objects.using(alias).get_or_create(nom=sequence)
+            lignes.update(valeur=F('valeur') + taille)
+        fin = lignes.values_list('valeur', flat=True).get()
+    return fin - taille + 1, fin
+
+
+class _Bloc:
+    """Valeurs réservées (et validées) par le processus courant"""
+
+    def __init__(self, debut, fin):
+        self.compteur = itertools.count(debut)
+        self.fin = fin
+        self.pid = os.getpid()
+
+    def utilisable(self):
+        return self.pid == os.getpid()  # sinon bloc hérité du processus parent (fork)
+
+
+class GenerateurSequentiel:
+    """Identifiants préfixe + numéro de largeur fixe + chiffre de contrôle"""
+
+    def __init__(self, nom, prefixe='', sequence=None, largeur=9, taille_bloc=None):
+        self.nom = nom
+        self.prefixe = prefixe
+        self.sequence = sequence or nom
+        self.largeur = largeur
+        self.taille_bloc = taille_bloc or settings.IDENTIFIANTS_TAILLE_BLOC
+        self._verrou = threading.Lock()
+        self._bloc = None
+
+    def _numero(self):
+        bloc = self._bloc
+        if bloc is not None and bloc.utilisable():
+            numero = next(bloc.compteur)
+            if numero <= bloc.fin:
+                return numero
+        with self._verrou:
+            bloc = self._bloc
+            if bloc is not None and bloc.utilisable():
+                numero = next(bloc.compteur)
+                if numero <= bloc.fin:
+                    return numero
+            alias = alias_sequences()
+            if connections[alias].in_atomic_block:
+                # Pas de connexion séparée (SQLite, voir le module) : la réservation suit
+                # la transaction de l'appelant et peut être annulée avec elle, on n'en
+                # garde rien et on ne réserve qu'une valeur
+                return reserver_bloc(self.sequence, 1, alias)[0]
+            debut, fin = reserver_bloc(self.sequence, self.taille_bloc, alias)
+            self._bloc = _Bloc(debut + 1, fin)
+            return debut
+
+    def suivant(self):
+        chiffres = str(self._numero()).zfill(self.largeur)
+        return f'{self.prefixe}{chiffres}{chiffre_controle(chiffres)}'
+
+    def est_valide(self, identifiant):
+        """Vérifie le préfixe, la longueur et le chiffre de contrôle"""
+        if not identifiant or not identifiant.startswith(self.prefixe):
+            return False
+        chiffres = identifiant[len(self.prefixe):]
+        return (
+            len(chiffres) == self.largeur + 1
+            and chiffres.isdigit()
+            and chiffre_controle(chiffres[:-1]) == chiffres[-1]
+        )
+
+
+_generateurs = {}
+_verrou_generateurs = threading.Lock()
+
+
+def generateur(nom):
+    """Générateur déclaré sous `nom` dans settings.IDENTIFIANTS"""
+    instance = _generateurs.get(nom)
+    if instance is None:
+        with _verrou_generateurs:
+            instance = _generateurs.get(nom)
+            if instance is None:
+                options = dict(settings.IDENTIFIANTS[nom])
+                classe = import_string(options.pop('classe', 'apps.core.identifiants.GenerateurSequentiel'))
+                instance = _generateurs[nom] = classe(nom, **options)
+    return instance
+
+
+def generer(nom):
+    """Nouvel identifiant du générateur `nom`"""
+    return generateur(nom).suivant()
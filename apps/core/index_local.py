@@ -0,0 +1,99 @@
+"""
+Core index local - Structures en mémoire par processus
+
+Certaines recherches (correspondances, gares proches) s'appuient sur une
+structure construite en mémoire dans chaque worker plutôt que sur une
+requête SQL par appel. Un compteur de version partagé dans le cache
+indique aux autres workers qu'ils doivent reconstruire : il faut un cache
+partagé entre processus (Redis). Avec locmem, chaque processus a son propre
+compteur et ne voit que ses propres modifications ; l'index est alors
+seulement reconstruit après INDEX_LOCAL_TIMEOUT secondes (voir
+apps.core.checks).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class IndexLocal:
+    """
+    Index construit paresseusement par `construire()` et gardé en mémoire.
+
+    - obtenir() : retourne l'index, reconstruit si la version partagée a changé
+      ou s'il a plus de INDEX_LOCAL_TIMEOUT secondes
+    - modifier(fn) : applique une mise à jour incrémentale après le commit
+    - invalider() : force la reconstruction dans tous les processus
+    """
+
+    def __init__(self, nom, construire):
+        self.nom = nom
+        self.construire = construire
+        self._cle_version = f'index_local:{nom}:version'
+        self._verrou = threading.RLock()
+        self._donnees = None
+        self._version = None
+        self._construit_le = None
+
+    def _version_partagee(self):
+        version = cache.get(self._cle_version)
+        if version is None:
+            cache.add(self._cle_version, 0, timeout=None)
+            version = cache.get(self._cle_version, 0)
+        return version
+
+    def _incrementer(self):
+        try:
+            return cache.incr(self._cle_version)
+        except ValueError:
+            # Clé expirée ou évincée : on repart d'une nouvelle version
+            cache.add(self._cle_version, 1, timeout=None)
+            return None
+
+    def _a_jour(self, version):
+        return (
+            self._donnees is not None
+            and self._version == version
+            and time.monotonic() - self._construit_le < settings.INDEX_LOCAL_TIMEOUT
+        )
+
+    def obtenir(self):
+        version = self._version_partagee()
+        if self._a_jour(version):
+            return self._donnees
+        with self._verrou:
+            if not self._a_jour(version):
+                self._donnees = self.construire()
+                self._version = version
+                self._construit_le = time.monotonic()
+            return self._donnees
+
+    def modifier(self, fonction):
+        """
+        Applique fonction(index) localement si l'index est à jour, puis publie
+        une nouvelle version pour que les autres processus reconstruisent.
+        """
+        def appliquer():
+            with self._verrou:
+                version = self._version_partagee()
+                a_jour = self._a_jour(version)
+                if a_jour:
+                    fonction(self._donnees)
+                nouvelle = self._incrementer()
+                if a_jour and nouvelle == version + 1:
+                    self._version = nouvelle
+                else:
+                    # Un autre processus a modifié entre-temps : reconstruction
+                    self._donnees = None
+
+        transaction.on_commit(appliquer)
+
+    def invalider(self):
+        def appliquer():
+            with self._verrou:
+                self._donnees = None
+                self._incrementer()
+
+        transaction.on_commit(appliquer)
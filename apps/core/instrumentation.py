@@ -0,0 +1,235 @@
+"""
+Core instrumentation - Où passe le temps de chaque requête HTTP
+
+InstrumentationMiddleware ouvre une MesureRequete par requête :
+- temps SQL et nombre de requêtes (execute_wrapper sur chaque connexion) ;
+- temps de sérialisation DRF (BaseSerializer.data chronométré), hors SQL
+  exécuté pendant la sérialisation (querysets paresseux) ;
+- temps de la vue (rendu compris) et temps total (middlewares compris).
+
+Les mesures sont renvoyées dans l'en-tête Server-Timing, écrites dans le
+journal 'apps.core.instrumentation' et cumulées par route dans le registre
+du processus, exposé au format texte Prometheus par MetricsView. Chaque
+worker gunicorn a son propre registre : les compteurs sont cumulatifs et
+Prometheus calcule les fenêtres glissantes (rate, histogram_quantile).
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+
+# Bornes des histogrammes, en secondes
+BORNES_SECONDES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_mesure_courante = ContextVar('mesure_requete', default=None)
+
+
+class MesureRequete:
+    """Temps passé par une requête HTTP ; sert aussi d'execute_wrapper"""
+
+    __slots__ = ('debut', 'debut_vue', 'fin', 'db', 'requetes', 'serialisation', '_profondeur')
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.debut_vue = None
+        self.fin = None
+        self.db = 0.0
+        self.requetes = 0
+        self.serialisation = 0.0
+        self._profondeur = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - debut
+            self.requetes += 1
+
+    @property
+    def total(self):
+        return (self.fin or time.perf_counter()) - self.debut
+
+    @property
+    def vue(self):
+        if self.debut_vue is None:
+            return 0.0
+        return (self.fin or time.perf_counter()) - self.debut_vue
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+        return ', '.join([
+            f'db;dur={self.db * 1000:.1f};desc="{self.requetes} requetes SQL"',
+            f'ser;dur={self.serialisation * 1000:.1f};desc="Serialisation"',
+            f'vue;dur={self.vue * 1000:.1f};desc="Vue"',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+
+@contextmanager
+def mesurer_requete():
+    """Mesure le bloc : SQL de toutes les connexions, sérialisation, durée totale"""
+    mesure = MesureRequete()
+    jeton = _mesure_courante.set(mesure)
+    try:
+        with ExitStack() as pile:
+            for connexion in connections.all():
+                pile.enter_context(connexion.execute_wrapper(mesure))
+            yield mesure
+    finally:
+        mesure.fin = time.perf_counter()
+        _mesure_courante.reset(jeton)
+
+
+def mesure_courante():
+    """MesureRequete de la requête en cours, ou None hors requête instrumentée"""
+    return _mesure_courante.get()
+
+
+def instrumenter_serializers():
+    """Chronomètre BaseSerializer.data (appelé une fois par processus)"""
+    propriete = BaseSerializer.data
+    if getattr(propriete.fget, 'instrumente', False):
+        return
+    data = propriete.fget
+
+    @functools.wraps(data)
+    def data_chronometree(serializer):
+        mesure = _mesure_courante.get()
+        # Serializer.data et ListSerializer.data appellent super().data : seul l'appel externe compte
+        if mesure is None or mesure._profondeur:
+            return data(serializer)
+        mesure._profondeur += 1
+        debut, db_avant = time.perf_counter(), mesure.db
+        try:
+            return data(serializer)
+        finally:
+            mesure._profondeur -= 1
+            mesure.serialisation += time.perf_counter() - debut - (mesure.db - db_avant)
+
+    data_chronometree.instrumente = True
+    BaseSerializer.data = property(data_chronometree, propriete.fset, propriete.fdel, propriete.__doc__)
+
+
+class Histogramme:
+    """Histogramme cumulatif à bornes fixes, au sens de Prometheus"""
+
+    __slots__ = ('bornes', 'compteurs', 'somme', 'nombre')
+
+    def __init__(self, bornes=BORNES_SECONDES):
+        self.bornes = bornes
+        self.compteurs = [0] * (len(bornes) + 1)
+        self.somme = 0.0
+        self.nombre = 0
+
+    def observer(self, valeur):
+        self.compteurs[bisect_left(self.bornes, valeur)] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+    def cumuls(self):
+        """[(borne 'le', nombre de valeurs <= borne)], jusqu'à +Inf"""
+        total = 0
+        resultat = []
+        for borne, compteur in zip((*self.bornes, '+Inf'), self.compteurs):
+            total += compteur
+            resultat.append((borne, total))
+        return resultat
+
+
+class StatistiquesRoute:
+    __slots__ = ('duree', 'db', 'serialisation', 'requetes_sql', 'statuts')
+
+    def __init__(self):
+        self.duree = Histogramme()
+        self.db = Histogramme()
+        self.serialisation = Histogramme()
+        self.requetes_sql = 0
+        self.statuts = {}
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RegistreMetriques:
+    """Mesures cumulées par (méthode, route) dans le processus courant"""
+
+    HISTOGRAMMES = [
+        ('colisso_http_request_duration_seconds', 'duree', 'Durée totale des requêtes HTTP'),
+        ('colisso_http_db_duration_seconds', 'db', 'Temps SQL par requête HTTP'),
+        ('colisso_http_serializer_duration_seconds', 'serialisation', 'Temps de sérialisation par requête HTTP'),
+    ]
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._routes = {}
+
+    def enregistrer(self, methode, route, statut, mesure):
+        with self._verrou:
+            stats = self._routes.get((methode, route))
+            if stats is None:
+                stats = self._routes[(methode, route)] = StatistiquesRoute()
+            stats.duree.observer(mesure.total)
+            stats.db.observer(mesure.db)
+            stats.serialisation.observer(mesure.serialisation)
+            stats.requetes_sql += mesure.requetes
+            stats.statuts[statut] = stats.statuts.get(statut, 0) + 1
+
+    def vider(self):
+        with self._verrou:
+            self._routes.clear()
+
+    def exposition(self):
+        """Toutes les métriques au format texte Prometheus (version 0.0.4)"""
+        with self._verrou:
+            routes = sorted(self._routes.items())
+            lignes = []
+            for nom, attribut, aide in self.HISTOGRAMMES:
+                lignes += [f'# HELP {nom} {aide}', f'# TYPE {nom} histogram']
+                for (methode, route), stats in routes:
+                    histogramme = getattr(stats, attribut)
+                    etiquettes = f'method="{_echapper(methode)}",route="{_echapper(route)}"'
+                    for borne, cumul in histogramme.cumuls():
+                        lignes.append(f'{nom}_bucket{{{etiquettes},le="{borne}"}} {cumul}')
+                    lignes.append(f'{nom}_sum{{{etiquettes}}} {histogramme.somme:.6f}')
+                    lignes.append(f'{nom}_count{{{etiquettes}}} {histogramme.nombre}')
+
+            lignes += [
+                '# HELP colisso_http_db_queries_total Requêtes SQL exécutées par les requêtes HTTP',
+                '# TYPE colisso_http_db_queries_total counter',
+            ]
+            for (methode, route), stats in routes:
+                lignes.append(
+                    f'colisso_http_db_queries_total{{method="{_echapper(methode)}",route="{_echapper(route)}"}} '
+                    f'{stats.requetes_sql}'
+                )
+
+            lignes += [
+                '# HELP colisso_http_responses_total Réponses HTTP par code de statut',
+                '# TYPE colisso_http_responses_total counter',
+            ]
+            for (methode, route), stats in routes:
+                for statut, nombre in sorted(stats.statuts.items()):
+                    lignes.append(
+                        f'colisso_http_responses_total{{method="{_echapper(methode)}",route="{_echapper(route)}",'
+                        f'status="{statut}"}} {nombre}'
+                    )
+        return '\n'.join(lignes) + '\n'
+
+
+registre = RegistreMetriques()
+
+
+def nom_route(request):
+    """Nom de la route résolue (cardinalité bornée), pas le chemin brut"""
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None:
+        return 'non_resolue'
+    return resolver_match.view_name or resolver_match.route
@@ -0,0 +1,448 @@
+"""
+Commande de benchmark HTTP de l'API : latences, débit et requêtes SQL par endpoint
+"""
+import http.client
+import json
+import logging
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.utils import timezone
+
+from apps.authentication.jetons import JetonRafraichissement
+from apps.core.requetes import enregistrer_requetes
+from apps.locations.models import Gare
+from apps.parcels.models import Colis
+from apps.trips import allocation
+from apps.trips.models import Trajet, Reservation
+from apps.users.models import User
+
+
+PREFIXE_API = '/api/v1'
+NOM_BENCH = 'Bench-API'
+
+# Répartition du scénario mixte
+POIDS_MIXTE = {'suivi': 50, 'recherche': 30, 'gare': 15, 'reservation': 5}
+SCENARIOS = ['suivi', 'recherche', 'reservation', 'gare', 'mixte']
+
+
+def centile(valeurs_triees, p):
+    """Centile p (0-100) par la méthode du rang le plus proche"""
+    if not valeurs_triees:
+        return None
+    rang = max(0, min(len(valeurs_triees) - 1, round(p / 100 * len(valeurs_triees) + 0.5) - 1))
+    return valeurs_triees[rang]
+
+
+def version_git():
+    """Commit courant, pour comparer les résultats d'un commit à l'autre"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class TransportLocal:
+    """Appels en processus via le client de test Django (sans réseau)"""
+
+    nom = 'local'
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def appeler(self, methode, chemin, corps, entetes):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(raise_request_exception=False, HTTP_HOST='localhost')
+        with enregistrer_requetes() as enregistreur:
+            debut = time.perf_counter()
+            response = client.generic(
+                methode, chemin,
+                data=json.dumps(corps) if corps is not None else '',
+                content_type='application/json',
+                headers=entetes,
+            )
+            duree = time.perf_counter() - debut
+        return response.status_code, response.headers, response.content, duree, enregistreur.nombre
+
+    def fermer(self):
+        connections.close_all()
+
+
+class TransportHTTP:
+    """Appels vers un serveur lancé à part (runserver, gunicorn), connexions keep-alive"""
+
+    def __init__(self, url):
+        morceaux = urlsplit(url)
+        if morceaux.scheme not in ('http', 'https') or not morceaux.hostname:
+            raise CommandError(f'URL invalide : {url}')
+        self.nom = url
+        self.classe = http.client.HTTPSConnection if morceaux.scheme == 'https' else http.client.HTTPConnection
+        self.hote, self.port = morceaux.hostname, morceaux.port
+        self.local = threading.local()
+
+    def appeler(self, methode, chemin, corps, entetes):
+        entetes = dict(entetes)
+        donnees = None
+        if corps is not None:
+            donnees = json.dumps(corps).encode()
+            entetes['Content-Type'] = 'application/json'
+        for tentative in range(2):
+            connexion = getattr(self.local, 'connexion', None)
+            if connexion is None:
+                connexion = self.local.connexion = self.classe(self.hote, self.port, timeout=30)
+            try:
+                debut = time.perf_counter()
+                connexion.request(methode, chemin, body=donnees, headers=entetes)
+                response = connexion.getresponse()
+                contenu = response.read()
+                duree = time.perf_counter() - debut
+                break
+            except (OSError, http.client.HTTPException):
+                # Connexion keep-alive fermée par le serveur : une seule reconnexion
+                connexion.close()
+                self.local.connexion = None
+                if tentative:
+                    raise
+        # Nombre de requêtes SQL fourni par BudgetRequetesMiddleware (QUERY_BUDGET_ENABLED)
+        requetes = response.headers.get('X-Query-Count')
+        return response.status, response.headers, contenu, duree, int(requetes) if requetes else None
+
+    def fermer(self):
+        connexion = getattr(self.local, 'connexion', None)
+        if connexion is not None:
+            connexion.close()
+
+
+class Mesures:
+    """Latences, statuts et requêtes SQL par endpoint"""
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.par_endpoint = {}
+
+    def ajouter(self, endpoint, statut, duree, requetes):
+        with self.verrou:
+            mesure = self.par_endpoint.setdefault(endpoint, {'durees': [], 'statuts': {}, 'requetes': []})
+            mesure['durees'].append(duree * 1000)
+            mesure['statuts'][statut] = mesure['statuts'].get(statut, 0) + 1
+            if requetes is not None:
+                mesure['requetes'].append(requetes)
+
+    def resume(self, duree_totale):
+        resultats = {}
+        for endpoint, mesure in sorted(self.par_endpoint.items()):
+            durees = sorted(mesure['durees'])
+            requetes = mesure['requetes']
+            # 0 : pas de réponse (exception côté client ou connexion perdue)
+            erreurs = sum(n for statut, n in mesure['statuts'].items() if statut == 0 or statut >= 500)
+            resultats[endpoint] = {
+                'appels': len(durees),
+                'erreurs': erreurs,
+                'statuts': {str(statut): n for statut, n in sorted(mesure['statuts'].items())},
+                'debit_rps': round(len(durees) / duree_totale, 1) if duree_totale else None,
+                'latence_ms': {
+                    'p50': round(centile(durees, 50), 2),
+                    'p95': round(centile(durees, 95), 2),
+                    'p99': round(centile(durees, 99), 2),
+                    'moyenne': round(sum(durees) / len(durees), 2),
+                    'max': round(durees[-1], 2),
+                },
+                'requetes_sql': {
+                    'moyenne': round(sum(requetes) / len(requetes), 1),
+                    'max': max(requetes),
+                } if requetes else None,
+            }
+        return resultats
+
+
+class Command(BaseCommand):
+    help = (
+        'Rejoue des mélanges réalistes de requêtes (suivi de colis, recherche de trajets, '
+        'rafales de réservations, consultation des colis d\'une gare) en processus ou contre '
+        'un serveur local (--url) ; affiche p50/p95/p99, débit et requêtes SQL par endpoint '
+        'et enregistre les résultats en JSON pour comparer deux commits (--comparer)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS, dest='scenarios',
+            help='Scénario à lancer, répétable (défaut : tous)'
+        )
+        parser.add_argument('--url', help='Serveur à tester, ex. http://127.0.0.1:8000 (défaut : en processus)')
+        parser.add_argument('--operations', type=int, default=500, help='Opérations par scénario')
+        parser.add_argument('--concurrence', type=int, default=4, help='Clients simultanés')
+        parser.add_argument('--echauffement', type=int, default=20, help='Opérations non mesurées en début de scénario')
+        parser.add_argument('--seed', type=int, default=42, help='Graine du choix des opérations')
+        parser.add_argument('--telephone', help='Utilisateur authentifié (défaut : premier superuser)')
+        parser.add_argument('--sortie', help='Fichier JSON des résultats (défaut : bench_api-<commit>.json)')
+        parser.add_argument('--comparer', help='Résultats JSON de référence : signale les régressions de p95')
+        parser.add_argument('--seuil', type=float, default=20, help='Régression signalée au-delà de ce % sur p95')
+
+    def handle(self, *args, **options):
+        if options['telephone']:
+            user = User.objects.filter(telephone=options['telephone']).first()
+        else:
+            user = User.objects.filter(is_superuser=True, is_active=True).first()
+        if user is None:
+            raise CommandError('Aucun utilisateur pour authentifier les requêtes')
+        self.auth = {'Authorization': f'Bearer {JetonRafraichissement.for_user(user).access_token}'}
+        self.transport = TransportHTTP(options['url']) if options['url'] else TransportLocal()
+
+        self.preparer_donnees()
+        self.etags = {}
+        self.reservations_creees = []
+
+        commit = version_git()
+        resultats = {
+            'date': timezone.now().isoformat(),
+            'commit': commit,
+            'cible': self.transport.nom,
+            'base': connections['default'].vendor,
+            'concurrence': options['concurrence'],
+            'seed': options['seed'],
+            'donnees': {
+                'colis': Colis.objects.count(),
+                'trajets': Trajet.objects.count(),
+                'reservations': Reservation.objects.count(),
+                'utilisateurs': User.objects.count(),
+            },
+            'scenarios': {},
+        }
+        # Les 400 (trajet complet) et 404 (code inconnu) font partie des scénarios
+        journal = logging.getLogger('django.request')
+        niveau = journal.level
+        journal.setLevel(logging.ERROR)
+        try:
+            for scenario in options['scenarios'] or SCENARIOS:
+                resultats['scenarios'][scenario] = self.lancer(scenario, options)
+                self.afficher(scenario, resultats['scenarios'][scenario])
+        finally:
+            journal.setLevel(niveau)
+            self.nettoyer()
+
+        sortie = options['sortie'] or f'bench_api-{commit or "local"}.json'
+        with open(sortie, 'w', encoding='utf-8') as fichier:
+            json.dump(resultats, fichier, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f'✓ Résultats enregistrés dans {sortie}'))
+
+        if options['comparer']:
+            self.comparer(options['comparer'], resultats, options['seuil'])
+
+    def preparer_donnees(self):
+        """Échantillons de valeurs réelles pour construire les requêtes"""
+        self.codes = list(
+            Colis.actifs.order_by('-date_expedition').values_list('code_suivi', flat=True)[:2000]
+        )
+        self.gares = list(Gare.actifs.order_by('nom').values_list('id', flat=True))
+        aujourd_hui = timezone.localdate()
+        self.trajets = list(
+            Trajet.objects.filter(statut='planifie', date_depart__gte=aujourd_hui)
+            .order_by('date_depart', 'heure_depart', 'id')
+            .values_list('id', 'ville_depart', 'ville_arrivee', 'date_depart')[:2000]
+        )
+        # Rafales de réservations : quelques départs proches concentrent la demande
+        self.trajets_chauds = list(
+            Trajet.objects.filter(
+                statut='planifie', date_depart__range=(aujourd_hui, aujourd_hui + timedelta(days=3))
+            ).order_by('places_reservees', 'date_depart', 'id').values_list('id', flat=True)[:5]
+        )
+        if not (self.codes and self.gares and self.trajets):
+            raise CommandError('Pas assez de données : lancer generate_dataset (ou les commandes load_*)')
+
+    # Opérations : une action d'un utilisateur, une ou plusieurs requêtes HTTP
+
+    def appeler(self, endpoint, methode, chemin, params=None, corps=None, entetes=None):
+        if params:
+            chemin = f'{chemin}?{urlencode(params)}'
+        try:
+            statut, entetes_reponse, contenu, duree, requetes = self.transport.appeler(
+                methode, PREFIXE_API + chemin, corps, entetes or {}
+            )
+        except Exception:
+            self.mesures.ajouter(endpoint, 0, 0, None)
+            return 0, None, None
+        self.mesures.ajouter(endpoint, statut, duree, requetes)
+        try:
+            donnees = json.loads(contenu) if contenu else None
+        except ValueError:
+            donnees = None
+        return statut, entetes_reponse, donnees
+
+    def suivi(self, rnd):
+        """Suivi public d'un colis, souvent repris avec l'ETag de la consultation précédente"""
+        tirage = rnd.random()
+        if tirage < 0.03:
+            code = f'COL-INCONNU{rnd.randrange(10 ** 6)}'
+        else:
+            # Les colis en route sont suivis par beaucoup de clients à la fois
+            code = rnd.choice(self.codes[:200] if tirage < 0.8 else self.codes)
+        entetes = {}
+        etag = self.etags.get(code)
+        if etag and rnd.random() < 0.7:
+            entetes['If-None-Match'] = etag
+        statut, entetes_reponse, _ = self.appeler(
+            'colis.tracking', 'GET', '/parcels/colis/tracking/', {'code': code}, entetes=entetes
+        )
+        if statut == 200:
+            self.etags[code] = entetes_reponse.get('ETag')
+
+    def recherche(self, rnd):
+        """Recherche de trajets entre deux villes, puis plan des sièges d'un résultat"""
+        trajet_id, ville_depart, ville_arrivee, date_depart = rnd.choice(self.trajets)
+        params = {'ville_depart': ville_depart, 'ville_arrivee': ville_arrivee, 'date_depart': date_depart.isoformat()}
+        tirage = rnd.random()
+        if tirage < 0.15:
+            self.appeler('trajets.correspondances', 'GET', '/trips/trajets/correspondances/', params)
+            return
+        if tirage < 0.30:
+            params['disponible'] = 'true'
+        self.appeler('trajets.list', 'GET', '/trips/trajets/', params)
+        if rnd.random() < 0.3:
+            self.appeler('trajets.plan_sieges', 'GET', f'/trips/trajets/{trajet_id}/plan_sieges/')
+
+    def reservation(self, rnd):
+        """Réservation de 1 à 3 places sur un départ très demandé"""
+        if not self.trajets_chauds:
+            return
+        trajet_id = rnd.choice(self.trajets_chauds)
+        if rnd.random() < 0.2:
+            self.appeler(
+                'reservations.list', 'GET', '/trips/reservations/', {'trajet_id': trajet_id}, entetes=self.auth
+            )
+            return
+        passagers = [
+            {
+                'client_telephone': f'+2266{rnd.randrange(10 ** 7):07d}',
+                'client_nom': NOM_BENCH,
+                'client_prenom': f'Passager {i + 1}',
+            }
+            for i in range(rnd.choice([1, 1, 1, 2, 3]))
+        ]
+        statut, _, donnees = self.appeler(
+            'reservations.reserver_groupe', 'POST', '/trips/reservations/reserver_groupe/',
+            corps={'trajet_id': str(trajet_id), 'passagers': passagers}, entetes=self.auth
+        )
+        if statut == 201 and donnees:
+            self.reservations_creees.extend(r['id'] for r in donnees['reservations'])
+
+    def gare(self, rnd):
+        """Colis d'une gare par statut, parcourus page par page (curseur)"""
+        params = {
+            rnd.choice(['gare_depart', 'gare_arrivee']): rnd.choice(self.gares),
+            'statut': rnd.choice([Colis.EN_ATTENTE, Colis.EN_COURS, Colis.ARRIVE]),
+            'cursor': '',
+        }
+        if rnd.random() < 0.1:
+            self.appeler('colis.statistiques', 'GET', '/parcels/colis/statistiques/', entetes=self.auth)
+            return
+        for _ in range(rnd.randint(1, 3)):
+            statut, _, donnees = self.appeler('colis.list', 'GET', '/parcels/colis/', params, entetes=self.auth)
+            suivante = donnees.get('next') if statut == 200 and isinstance(donnees, dict) else None
+            if not suivante:
+                break
+            params = dict(params, cursor=suivante.split('cursor=', 1)[1].split('&', 1)[0])
+
+    def mixte(self, rnd):
+        operation = rnd.choices(list(POIDS_MIXTE), weights=list(POIDS_MIXTE.values()))[0]
+        getattr(self, operation)(rnd)
+
+    # Exécution
+
+    def lancer(self, scenario, options):
+        operation = getattr(self, scenario)
+        seed = options['seed']
+
+        def executer(indices):
+            try:
+                for i in indices:
+                    operation(random.Random(f'{seed}-{scenario}-{i}'))
+            finally:
+                self.transport.fermer()
+
+        concurrence = max(1, options['concurrence'])
+        # Échauffement : connexions, caches, premières compilations de requêtes
+        self.mesures = Mesures()
+        executer(range(-options['echauffement'], 0))
+
+        self.mesures = Mesures()
+        indices = range(options['operations'])
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrence) as executor:
+            list(executor.map(executer, [indices[i::concurrence] for i in range(concurrence)]))
+        duree = time.perf_counter() - debut
+
+        endpoints = self.mesures.resume(duree)
+        appels = sum(e['appels'] for e in endpoints.values())
+        return {
+            'operations': options['operations'],
+            'duree_s': round(duree, 3),
+            'appels': appels,
+            'debit_rps': round(appels / duree, 1) if duree else None,
+            'endpoints': endpoints,
+        }
+
+    def afficher(self, scenario, resultat):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{scenario} : {resultat['appels']} appels en {resultat['duree_s']:.1f}s "
+            f"({resultat['debit_rps']} req/s)"
+        ))
+        for endpoint, mesure in resultat['endpoints'].items():
+            latence = mesure['latence_ms']
+            sql = mesure['requetes_sql']
+            ligne = (
+                f"  {endpoint:<32} n={mesure['appels']:<6} p50={latence['p50']:>8.2f} "
+                f"p95={latence['p95']:>8.2f} p99={latence['p99']:>8.2f} ms"
+            )
+            if sql:
+                ligne += f"  sql={sql['moyenne']}/{sql['max']}"
+            ligne += '  ' + ' '.join(f'{statut}:{n}' for statut, n in sorted(mesure['statuts'].items()))
+            self.stdout.write(self.style.ERROR(ligne) if mesure['erreurs'] else ligne)
+
+    def nettoyer(self):
+        """Annule puis supprime les réservations créées, pour laisser les données intactes"""
+        if not self.reservations_creees:
+            return
+        reservations = Reservation.objects.filter(id__in=self.reservations_creees)
+        for reservation in reservations:
+            allocation.annuler(reservation)
+        nombre, _ = reservations.delete()
+        self.stdout.write(f'{nombre} réservation(s) de test annulée(s) et supprimée(s)')
+
+    def comparer(self, chemin, resultats, seuil):
+        try:
+            with open(chemin, encoding='utf-8') as fichier:
+                reference = json.load(fichier)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Référence illisible : {e}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Comparaison avec {chemin} (commit {reference.get('commit')}) : p95 en ms"
+        ))
+        regressions = 0
+        for scenario, resultat in resultats['scenarios'].items():
+            endpoints_reference = reference.get('scenarios', {}).get(scenario, {}).get('endpoints', {})
+            for endpoint, mesure in resultat['endpoints'].items():
+                if endpoint not in endpoints_reference:
+                    continue
+                avant = endpoints_reference[endpoint]['latence_ms']['p95']
+                apres = mesure['latence_ms']['p95']
+                ecart = (apres - avant) / avant * 100 if avant else 0
+                # Moins d'une milliseconde d'écart : bruit de mesure
+                regression = ecart > seuil and apres - avant > 1
+                regressions += regression
+                ligne = f"  {scenario + '/' + endpoint:<44} {avant:>8.2f} -> {apres:>8.2f} ({ecart:+.0f} %)"
+                self.stdout.write(self.style.ERROR(ligne) if regression else ligne)
+        if regressions:
+            raise CommandError(f'{regressions} endpoint(s) en régression de plus de {seuil:.0f} % sur p95')
+        self.stdout.write(self.style.SUCCESS('✓ Aucune régression de p95'))
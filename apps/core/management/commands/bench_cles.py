@@ -0,0 +1,84 @@
+"""
+Commande de benchmark d'insertion : clés uuid4 aléatoires contre UUIDv7 ordonnés
+"""
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from apps.core.utils import uuid7
+
+
+GENERATEURS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Insère N lignes dans deux tables temporaires (clé uuid4 / clé UUIDv7) et compare '
+        'le débit d\'insertion et la taille de l\'index de clé primaire'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=1000000, help='Lignes par table (ex. 10000000)')
+        parser.add_argument('--lot', type=int, default=10000, help='Lignes par INSERT multiple / transaction')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'Base {connection.vendor} non prise en charge')
+
+        resultats = {}
+        for nom, generer in GENERATEURS.items():
+            table = f'bench_cles_{nom}'
+            self._creer_table(table)
+            try:
+                duree = self._inserer(table, generer, options['lignes'], options['lot'])
+                resultats[nom] = (duree, self._taille_index(table))
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {table}')
+
+        self.stdout.write(f"{options['lignes']} lignes par table ({connection.vendor})")
+        for nom, (duree, taille) in resultats.items():
+            taille_affichee = f'{taille / 1024 / 1024:.1f} Mo' if taille is not None else 'n/d'
+            self.stdout.write(
+                f'{nom:>6} : {duree:.1f}s ({options["lignes"] / duree:,.0f} lignes/s) - '
+                f'index de clé primaire : {taille_affichee}'
+            )
+
+    def _creer_table(self, table):
+        type_cle = 'uuid' if connection.vendor == 'postgresql' else 'char(32)'
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            cursor.execute(
+                f'CREATE TABLE {table} (id {type_cle} PRIMARY KEY, created_at bigint NOT NULL, donnees varchar(64))'
+            )
+
+    def _inserer(self, table, generer, lignes, lot):
+        # Même représentation que UUIDField : uuid natif sous PostgreSQL, hex ailleurs
+        convertir = str if connection.vendor == 'postgresql' else (lambda u: u.hex)
+        sql = f'INSERT INTO {table} (id, created_at, donnees) VALUES (%s, %s, %s)'
+        debut = time.perf_counter()
+        for depart in range(0, lignes, lot):
+            valeurs = [
+                (convertir(generer()), time.time_ns(), 'x' * 32)
+                for _ in range(min(lot, lignes - depart))
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, valeurs)
+        return time.perf_counter() - debut
+
+    def _taille_index(self, table):
+        """Taille en octets de l'index de clé primaire"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_relation_size(%s)', [f'{table}_pkey'])
+                return cursor.fetchone()[0]
+            try:
+                cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [f'sqlite_autoindex_{table}_1'])
+            except DatabaseError:
+                return None  # SQLite compilé sans dbstat
+            return cursor.fetchone()[0]
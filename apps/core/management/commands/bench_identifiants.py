@@ -0,0 +1,89 @@
+"""
+Commande de benchmark des générateurs d'identifiants
+"""
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.core.identifiants import GenerateurSequentiel
+from apps.core.models import SequenceIdentifiants
+
+
+SEQUENCE_BENCH = 'bench_identifiants'
+
+
+def _generer_processus(arguments):
+    """Exécuté dans un processus fils : génère `nombre` identifiants"""
+    nombre, taille_bloc = arguments
+    connections.close_all()
+    generateur = GenerateurSequentiel('bench', prefixe='BN', sequence=SEQUENCE_BENCH, taille_bloc=taille_bloc)
+    return [generateur.suivant() for _ in range(nombre)]
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit des générateurs d\'identifiants et vérifie leur unicité (threads et processus)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nombre', type=int, default=500000, help='Identifiants générés par scénario')
+        parser.add_argument('--threads', type=int, default=8, help='Threads du scénario concurrent')
+        parser.add_argument('--processus', type=int, default=4, help='Processus du scénario multi-workers')
+        parser.add_argument('--taille-bloc', type=int, default=1000, help='Valeurs réservées par bloc')
+
+    def handle(self, *args, **options):
+        nombre, taille_bloc = options['nombre'], options['taille_bloc']
+        SequenceIdentifiants.objects.filter(nom=SEQUENCE_BENCH).delete()
+        tous = []
+        try:
+            # 1. Un thread
+            generateur = GenerateurSequentiel('bench', prefixe='BN', sequence=SEQUENCE_BENCH, taille_bloc=taille_bloc)
+            debut = time.perf_counter()
+            identifiants = [generateur.suivant() for _ in range(nombre)]
+            self._afficher('1 thread', nombre, time.perf_counter() - debut)
+            tous += identifiants
+
+            # 2. Plusieurs threads sur le même générateur
+            par_thread = nombre // options['threads']
+
+            def generer_thread(_):
+                try:
+                    return [generateur.suivant() for _ in range(par_thread)]
+                finally:
+                    connections.close_all()
+
+            debut = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                lots = list(executor.map(generer_thread, range(options['threads'])))
+            self._afficher(f"{options['threads']} threads", par_thread * options['threads'], time.perf_counter() - debut)
+            tous += [identifiant for lot in lots for identifiant in lot]
+
+            # 3. Plusieurs processus (comme des workers gunicorn), chacun son générateur
+            par_processus = nombre // options['processus']
+            connections.close_all()
+            contexte = multiprocessing.get_context('fork')
+            debut = time.perf_counter()
+            with contexte.Pool(options['processus']) as pool:
+                lots = pool.map(_generer_processus, [(par_processus, taille_bloc)] * options['processus'])
+            self._afficher(
+                f"{options['processus']} processus", par_processus * options['processus'], time.perf_counter() - debut
+            )
+            tous += [identifiant for lot in lots for identifiant in lot]
+
+            blocs = SequenceIdentifiants.objects.get(nom=SEQUENCE_BENCH).valeur // taille_bloc
+        finally:
+            SequenceIdentifiants.objects.filter(nom=SEQUENCE_BENCH).delete()
+
+        doublons = len(tous) - len(set(tous))
+        invalides = sum(1 for identifiant in tous if not generateur.est_valide(identifiant))
+        self.stdout.write(
+            f'Identifiants : {len(tous)} - Blocs réservés : {blocs} - '
+            f'Doublons : {doublons} - Chiffres de contrôle invalides : {invalides}'
+        )
+        if doublons or invalides:
+            raise CommandError('Identifiants en double ou invalides')
+        self.stdout.write(self.style.SUCCESS('✓ Identifiants uniques'))
+
+    def _afficher(self, scenario, nombre, duree):
+        self.stdout.write(f'{scenario:>12} : {nombre} identifiants en {duree:.2f}s ({nombre / duree:,.0f} ids/s)')
@@ -0,0 +1,206 @@
+"""
+Commande de benchmark des index : plans EXPLAIN et latences avant / après
+"""
+import random
+import statistics
+import time
+from datetime import time as heure, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.locations.models import Gare
+from apps.parcels.models import Colis, HistoriqueEtat, Livraison
+from apps.trips.models import Trajet, Reservation
+from apps.users.models import User
+
+
+PREFIXE = 'BENCH-'
+VILLE_BENCH = 'Bench'
+MODELES_INDEXES = [Colis, HistoriqueEtat, Livraison, Reservation]
+
+
+class Command(BaseCommand):
+    help = (
+        'Génère un jeu de données de test, puis compare pour chaque requête des ViewSets '
+        'le plan EXPLAIN et la latence sans puis avec les index déclarés dans Meta.indexes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--colis', type=int, default=100000, help='Colis à générer (0 : données existantes)')
+        parser.add_argument('--repetitions', type=int, default=20, help='Exécutions par requête et par mesure')
+        parser.add_argument('--garder', action='store_true', help='Ne pas supprimer les données générées')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Lancer même si DEBUG est désactivé (supprime et recrée les index de la base configurée)'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError(
+                'DEBUG est désactivé : ce benchmark supprime des index et génère des données '
+                'dans la base configurée. Relancer avec --force pour confirmer.'
+            )
+        if not Gare.objects.exists() or not User.objects.exists():
+            raise CommandError('Il faut au moins une gare et un utilisateur (load_locations, load_users)')
+
+        if options['colis']:
+            self.stdout.write(f"Génération de {options['colis']} colis...")
+            self.generer(options['colis'])
+        try:
+            requetes = self.requetes()
+            avant = self.mesurer(requetes, options['repetitions'], sans_index=True)
+            apres = self.mesurer(requetes, options['repetitions'], sans_index=False)
+            for nom in requetes:
+                self.afficher(nom, avant[nom], apres[nom])
+        finally:
+            if options['colis'] and not options['garder']:
+                self.nettoyer()
+
+    def generer(self, nombre):
+        rnd = random.Random(42)
+        gares = list(Gare.objects.values_list('id', flat=True))
+        users = list(User.objects.values_list('id', flat=True))
+        statuts = [statut for statut, _ in Colis.STATUT_CHOICES]
+        statuts_livraison = [statut for statut, _ in Livraison.STATUT_CHOICES]
+
+        for debut in range(0, nombre, 5000):
+            with transaction.atomic():
+                colis = Colis.objects.bulk_create([
+                    Colis(
+                        code_suivi=f'{PREFIXE}{i:09d}',
+                        description='Colis de benchmark',
+                        poids=1,
+                        valeur_declaree=0,
+                        expediteur_id=rnd.choice(users),
+                        destinataire_nom='Bench',
+                        destinataire_telephone='+22600000000',
+                        destinataire_adresse='-',
+                        gare_depart_id=rnd.choice(gares),
+                        gare_arrivee_id=rnd.choice(gares),
+                        statut=rnd.choice(statuts),
+                        prix=1000,
+                        # La majorité de l'historique est désactivée (soft delete)
+                        is_active=rnd.random() < 0.3,
+                    )
+                    for i in range(debut, min(debut + 5000, nombre))
+                ], batch_size=1000)
+                HistoriqueEtat.objects.bulk_create([
+                    HistoriqueEtat(colis=c, nouveau_statut=statut, is_active=c.is_active)
+                    for c in colis
+                    for statut in statuts[:3]
+                ], batch_size=1000)
+                Livraison.objects.bulk_create([
+                    Livraison(
+                        colis=c,
+                        livreur_id=rnd.choice(users),
+                        statut=rnd.choice(statuts_livraison),
+                        is_active=c.is_active,
+                    )
+                    for c in colis if rnd.random() < 0.2
+                ], batch_size=1000)
+
+        # Réservations : 50 places occupées par trajet
+        demain = timezone.localdate() + timedelta(days=1)
+        for debut in range(0, max(nombre // 50, 1), 100):
+            with transaction.atomic():
+                trajets = Trajet.objects.bulk_create([
+                    Trajet(
+                        ville_depart=VILLE_BENCH, ville_arrivee=VILLE_BENCH,
+                        date_depart=demain, heure_depart=heure(8), duree_estimee=60,
+                        prix_base=1000, capacite_max=50, places_reservees=50,
+                    )
+                    for _ in range(debut, min(debut + 100, max(nombre // 50, 1)))
+                ])
+                Reservation.objects.bulk_create([
+                    Reservation(
+                        trajet_id=trajet.id,
+                        client_telephone=f'+2267{rnd.randrange(10 ** 7):07d}',
+                        client_nom='Bench', client_prenom='Bench',
+                        numero_ticket=f'{PREFIXE}{trajet.id.hex[:12]}-{siege}',
+                        numero_siege=siege,
+                        statut=rnd.choice(['en_attente', 'confirmee', 'payee', 'validee']),
+                    )
+                    for trajet in trajets
+                    for siege in range(1, 51)
+                ], batch_size=1000)
+
+    def nettoyer(self):
+        self.stdout.write('Suppression des données générées...')
+        Reservation.objects.filter(numero_ticket__startswith=PREFIXE).delete()
+        Trajet.objects.filter(ville_depart=VILLE_BENCH).delete()
+        Colis.objects.filter(code_suivi__startswith=PREFIXE).delete()
+
+    def requetes(self):
+        """Requêtes des ViewSets, avec des valeurs présentes dans les données"""
+        colis = Colis.actifs.order_by('-date_expedition').first()
+        reservation = Reservation.objects.order_by('-date_reservation').first()
+        livraison = Livraison.actifs.exclude(livreur=None).first()
+        if not (colis and reservation and livraison):
+            raise CommandError('Pas assez de données (utiliser --colis)')
+        return {
+            'ColisViewSet ?statut=': Colis.actifs.filter(statut=colis.statut).order_by('-date_expedition')[:20],
+            'ColisViewSet ?expediteur=': Colis.actifs.filter(expediteur_id=colis.expediteur_id).order_by('-date_expedition')[:20],
+            'ColisViewSet ?gare_depart=&statut=': Colis.actifs.filter(
+                gare_depart_id=colis.gare_depart_id, statut=colis.statut
+            ).order_by('-date_expedition')[:20],
+            'ColisViewSet ?gare_arrivee=&statut=': Colis.actifs.filter(
+                gare_arrivee_id=colis.gare_arrivee_id, statut=colis.statut
+            ).order_by('-date_expedition')[:20],
+            'HistoriqueEtatViewSet ?colis=': HistoriqueEtat.actifs.filter(colis_id=colis.id).order_by('-created_at')[:20],
+            'ReservationViewSet ?trajet_id=&statut=': Reservation.objects.filter(
+                trajet_id=reservation.trajet_id, statut=reservation.statut
+            ).order_by('-date_reservation')[:20],
+            'ReservationViewSet ?telephone=': Reservation.objects.filter(
+                client_telephone=reservation.client_telephone
+            ).order_by('-date_reservation')[:20],
+            'ReservationViewSet ?statut=': Reservation.objects.filter(statut=reservation.statut).order_by('-date_reservation')[:20],
+            'ReservationViewSet (/reservations/, client)': Reservation.objects.filter(
+                client_id=reservation.client_id
+            ).order_by('-date_reservation')[:20],
+            'LivraisonViewSet ?livreur=&statut=': Livraison.actifs.filter(
+                livreur_id=livraison.livreur_id, statut=livraison.statut
+            ).order_by('-date_assignation')[:20],
+        }
+
+    def mesurer(self, requetes, repetitions, sans_index):
+        """{nom: (plan, latence médiane en ms)}, index de Meta.indexes retirés si sans_index"""
+        retires = []
+        try:
+            if sans_index:
+                with connection.schema_editor() as schema_editor:
+                    for modele in MODELES_INDEXES:
+                        for index in modele._meta.indexes:
+                            schema_editor.remove_index(modele, index)
+                            retires.append((modele, index))
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+            resultats = {}
+            for nom, queryset in requetes.items():
+                plan = queryset.explain()
+                durees = []
+                for _ in range(repetitions):
+                    debut = time.perf_counter()
+                    list(queryset.all())
+                    durees.append((time.perf_counter() - debut) * 1000)
+                resultats[nom] = (plan, statistics.median(durees))
+            return resultats
+        finally:
+            if retires:
+                with connection.schema_editor() as schema_editor:
+                    for modele, index in retires:
+                        schema_editor.add_index(modele, index)
+
+    def afficher(self, nom, avant, apres):
+        plan_avant, latence_avant = avant
+        plan_apres, latence_apres = apres
+        gain = latence_avant / latence_apres if latence_apres else 0
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{nom} : {latence_avant:.2f} ms -> {latence_apres:.2f} ms (x{gain:.1f})'
+        ))
+        self.stdout.write('  avant : ' + plan_avant.replace('\n', '\n          '))
+        self.stdout.write('  après : ' + plan_apres.replace('\n', '\n          '))
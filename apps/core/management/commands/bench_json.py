@@ -0,0 +1,112 @@
+"""
+Commande de benchmark du rendu et de la lecture JSON : DRF contre orjson
+"""
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.core.renderers import OrjsonParser, OrjsonRenderer, orjson
+from apps.parcels.models import Colis, Livraison
+from apps.parcels.serializers import ColisSerializer, LivraisonSerializer
+from apps.reservations.serializers import ReservationSerializer as ReservationClientSerializer
+from apps.trips.models import Reservation
+from apps.trips.serializers import ReservationListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare le temps CPU du rendu et de la lecture JSON (JSONRenderer / JSONParser de DRF '
+        'contre OrjsonRenderer / OrjsonParser) sur les réponses des listes volumineuses'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=1000, help='Éléments par liste rendue')
+        parser.add_argument('--repetitions', type=int, default=50, help='Rendus par mesure')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson n\'est pas installé (pip install orjson)')
+
+        charges = self.charges(options['lignes'])
+        if not charges:
+            raise CommandError('Aucune donnée à rendre (load_parcels, generate_dataset)')
+
+        repetitions = options['repetitions']
+        total_drf = total_orjson = 0.0
+        for nom, donnees in charges.items():
+            contenu = JSONRenderer().render(donnees)
+            rendu_drf = self.mesurer(lambda: JSONRenderer().render(donnees), repetitions)
+            rendu_orjson = self.mesurer(lambda: OrjsonRenderer().render(donnees), repetitions)
+            lecture_drf = self.mesurer(lambda: JSONParser().parse(io.BytesIO(contenu)), repetitions)
+            lecture_orjson = self.mesurer(lambda: OrjsonParser().parse(io.BytesIO(contenu)), repetitions)
+            total_drf += rendu_drf
+            total_orjson += rendu_orjson
+
+            identique = OrjsonRenderer().render(donnees) == contenu
+            relu = OrjsonParser().parse(io.BytesIO(contenu)) == JSONParser().parse(io.BytesIO(contenu))
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{nom} : {len(donnees)} éléments, {len(contenu) / 1024:.0f} Ko'
+            ))
+            self.afficher('rendu', rendu_drf, rendu_orjson, identique)
+            self.afficher('lecture', lecture_drf, lecture_orjson, relu)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'CPU de rendu économisé : {(1 - total_orjson / total_drf) * 100:.0f} % '
+            f'({total_drf:.2f} ms -> {total_orjson:.2f} ms pour une réponse de chaque type)'
+        ))
+
+    def charges(self, lignes):
+        """Données des listes volumineuses telles que les vues les passent au renderer"""
+        requetes = {
+            'LivraisonViewSet.disponibles': (
+                LivraisonSerializer,
+                Livraison.actifs.select_related('colis', 'livreur'),
+            ),
+            'TrajetViewSet.reservations': (
+                ReservationListSerializer,
+                Reservation.objects.all(),
+            ),
+            'ReservationViewSet.par_trajet': (
+                ReservationClientSerializer,
+                Reservation.objects.filter(client__isnull=False).select_related('client', 'trajet', 'valide_par'),
+            ),
+            'ColisViewSet.list (page)': (
+                ColisSerializer,
+                Colis.actifs.select_related('expediteur', 'gare_depart', 'gare_arrivee'),
+            ),
+        }
+        charges = {}
+        for nom, (serializer_class, queryset) in requetes.items():
+            taille = 20 if nom.endswith('(page)') else lignes
+            donnees = list(serializer_class(queryset[:taille], many=True).data)
+            if not donnees:
+                self.stdout.write(self.style.WARNING(f'{nom} : aucune donnée, ignoré'))
+                continue
+            # Pas assez de lignes en base : les éléments sont répétés jusqu'à la taille voulue
+            charges[nom] = (donnees * (taille // len(donnees) + 1))[:taille]
+
+        # Valeurs brutes (UUID, Decimal, datetime non convertis par un serializer)
+        valeurs = list(Colis.actifs.values(
+            'id', 'code_suivi', 'poids', 'prix', 'statut', 'date_expedition', 'gare_depart_id'
+        )[:lignes])
+        if valeurs:
+            charges['Colis.values()'] = (valeurs * (lignes // len(valeurs) + 1))[:lignes]
+        return charges
+
+    def mesurer(self, fonction, repetitions):
+        """Temps CPU moyen d'un appel, en millisecondes"""
+        fonction()
+        debut = time.process_time()
+        for _ in range(repetitions):
+            fonction()
+        return (time.process_time() - debut) * 1000 / repetitions
+
+    def afficher(self, etape, drf, rapide, conforme):
+        gain = drf / rapide if rapide else 0
+        verification = 'identique' if conforme else self.style.ERROR('DIFFÉRENT')
+        self.stdout.write(
+            f'  {etape:<8} DRF {drf:8.3f} ms   orjson {rapide:8.3f} ms   x{gain:5.1f}   {verification}'
+        )
@@ -0,0 +1,144 @@
+"""
+Commande de benchmark de la liste des réservations restreinte aux gares d'un utilisateur
+"""
+import random
+import statistics
+import time
+from datetime import time as heure, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.management.commands.generate_dataset import dates_libres, poids_zipf
+from apps.locations.models import Gare
+from apps.trips.models import Reservation, Trajet
+from apps.users.models import User
+
+
+PREFIXE = 'BENCHP-'
+VILLE_BENCH = 'Bench portee'
+PAR_TRAJET = 40
+LOT = 20000
+
+
+class Command(BaseCommand):
+    help = (
+        'Génère des réservations sur des trajets rattachés à des gares, puis compare le plan '
+        'EXPLAIN et la latence de la liste restreinte aux gares : OU sur la jointure (ancienne '
+        'forme) contre sous-requête sur les index de gare des trajets (ReservationViewSet)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=2000000, help='Réservations à générer (0 : données existantes)')
+        parser.add_argument('--gares', type=int, default=1, help='Nombre de gares de l\'utilisateur simulé')
+        parser.add_argument('--repetitions', type=int, default=10, help='Exécutions par requête')
+        parser.add_argument('--garder', action='store_true', help='Ne pas supprimer les données générées')
+
+    def handle(self, *args, **options):
+        gares = list(Gare.actifs.order_by('nom', 'id').values_list('id', flat=True))
+        if len(gares) < 2 or not User.objects.exists():
+            raise CommandError('Il faut au moins deux gares et un utilisateur (load_locations, load_users)')
+
+        if options['reservations']:
+            self.stdout.write(f"Génération de {options['reservations']} réservations...")
+            debut = time.perf_counter()
+            self.generer(options['reservations'], gares)
+            self.stdout.write(f'  {time.perf_counter() - debut:.0f} s')
+        try:
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            # Gares médianes : ni la plus fréquentée, ni une gare vide
+            gares_portee = gares[len(gares) // 2:len(gares) // 2 + options['gares']]
+            for nom, queryset in self.requetes(gares_portee).items():
+                self.mesurer(nom, queryset, options['repetitions'])
+        finally:
+            if options['reservations'] and not options['garder']:
+                self.nettoyer()
+
+    def generer(self, nombre, gares):
+        rnd = random.Random(42)
+        clients = list(User.objects.values_list('id', flat=True)[:1000])
+        cumuls = poids_zipf(len(gares))
+        maintenant = timezone.now()
+        nombre_trajets = max(nombre // PAR_TRAJET, 1)
+
+        numero = 0
+        with dates_libres(Reservation):
+            for debut in range(0, nombre_trajets, LOT // PAR_TRAJET):
+                with transaction.atomic():
+                    trajets = []
+                    for _ in range(debut, min(debut + LOT // PAR_TRAJET, nombre_trajets)):
+                        depart, arrivee = rnd.choices(gares, cum_weights=cumuls, k=2)
+                        trajets.append(Trajet(
+                            ville_depart=VILLE_BENCH, ville_arrivee=VILLE_BENCH,
+                            gare_depart_id=depart, gare_arrivee_id=arrivee,
+                            date_depart=(maintenant - timedelta(days=rnd.randrange(365))).date(),
+                            heure_depart=heure(8), duree_estimee=60,
+                            prix_base=1000, capacite_max=PAR_TRAJET, places_reservees=PAR_TRAJET,
+                        ))
+                    Trajet.objects.bulk_create(trajets)
+
+                    reservations = []
+                    for trajet in trajets:
+                        for siege in range(1, PAR_TRAJET + 1):
+                            if numero >= nombre:
+                                break
+                            date = maintenant - timedelta(seconds=rnd.randrange(365 * 86400))
+                            reservations.append(Reservation(
+                                numero_ticket=f'{PREFIXE}{numero:010d}',
+                                client_id=rnd.choice(clients),
+                                client_telephone='+22600000000',
+                                client_nom='Bench', client_prenom='Bench',
+                                trajet_id=trajet.id,
+                                numero_siege=siege,
+                                statut=rnd.choice(['en_attente', 'confirmee', 'validee', 'annulee']),
+                                prix=Decimal(1000),
+                                date_reservation=date,
+                                created_at=date,
+                                updated_at=date,
+                            ))
+                            numero += 1
+                    Reservation.objects.bulk_create(reservations, batch_size=2000)
+
+    def nettoyer(self):
+        self.stdout.write('Suppression des données générées...')
+        with transaction.atomic():
+            Reservation.objects.filter(numero_ticket__startswith=PREFIXE).delete()
+            Trajet.objects.filter(ville_depart=VILLE_BENCH).delete()
+
+    def requetes(self, gares):
+        avant = (
+            Reservation.objects.filter(trajet__gare_depart__in=gares)
+            | Reservation.objects.filter(trajet__gare_arrivee__in=gares)
+        )
+        # Forme de ReservationViewSet.get_queryset (Portee.filtre_gares)
+        trajets = Trajet.objects.filter(
+            Q(gare_depart__in=gares) | Q(gare_arrivee__in=gares)
+        ).order_by().values('id')
+        apres = Reservation.objects.filter(trajet_id__in=trajets)
+        return {
+            'OU sur la jointure, page 1': avant.order_by('-date_reservation')[:20],
+            'Sous-requête des trajets, page 1': apres.order_by('-date_reservation')[:20],
+            'OU sur la jointure, COUNT': avant.order_by(),
+            'Sous-requête des trajets, COUNT': apres.order_by(),
+        }
+
+    def mesurer(self, nom, queryset, repetitions):
+        compter = nom.endswith('COUNT')
+        executer = queryset.count if compter else (lambda: list(queryset.all()))
+        plan = queryset.explain()
+        resultat = executer()
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            executer()
+            durees.append((time.perf_counter() - debut) * 1000)
+        taille = resultat if compter else len(resultat)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{nom} : {statistics.median(durees):.2f} ms (médiane), {taille} lignes'
+        ))
+        self.stdout.write('  ' + plan.replace('\n', '\n  '))
@@ -0,0 +1,95 @@
+"""
+Commande de conversion des clés primaires uuid4 existantes en UUIDv7
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+
+from apps.core.utils import uuid7
+
+
+CHAMPS_DATE = ['created_at', 'date_reservation', 'date_demande', 'date_ajout']
+
+# Tables dont la clé est reprise hors de la base : la réécrire casserait ces copies
+MODELES_EXCLUS = {
+    'trips.Reservation': 'sa clé est signée dans les billets émis (apps.trips.billets)',
+}
+
+
+def est_feuille(modele):
+    """Aucune clé étrangère ni relation many-to-many ne pointe vers ce modèle"""
+    return not modele._meta.related_objects
+
+
+def modeles_convertibles():
+    """Modèles du projet à clé UUID qui ne sont référencés par aucune table"""
+    return [
+        modele for modele in apps.get_models()
+        if modele.__module__.startswith('apps.')
+        and isinstance(modele._meta.pk, models.UUIDField)
+        and not modele._meta.proxy
+        and est_feuille(modele)
+        and modele._meta.label not in MODELES_EXCLUS
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Réécrit les clés primaires uuid4 en UUIDv7 datés de la création de chaque ligne, '
+        'pour les tables feuilles uniquement (aucune clé étrangère entrante). '
+        'Les entrées du journal de l\'admin gardent les anciennes clés. '
+        'trips.Reservation n\'est jamais convertie : sa clé est signée dans les billets, '
+        'qui deviendraient invalides.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('modeles', nargs='*', help='app_label.Modele (défaut : toutes les tables feuilles)')
+        parser.add_argument('--lot', type=int, default=1000, help='Lignes par transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Compter sans modifier')
+
+    def handle(self, *args, **options):
+        if options['modeles']:
+            try:
+                modeles = [apps.get_model(nom) for nom in options['modeles']]
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+            for modele in modeles:
+                if not isinstance(modele._meta.pk, models.UUIDField):
+                    raise CommandError(f'{modele._meta.label} n\'a pas de clé UUID')
+                if modele._meta.label in MODELES_EXCLUS:
+                    raise CommandError(
+                        f'{modele._meta.label} ne peut pas être converti : {MODELES_EXCLUS[modele._meta.label]}'
+                    )
+                if not est_feuille(modele):
+                    raise CommandError(
+                        f'{modele._meta.label} est référencé par d\'autres tables : '
+                        'ses clés ne peuvent pas être réécrites sans mettre à jour les références'
+                    )
+        else:
+            modeles = modeles_convertibles()
+
+        for modele in modeles:
+            self.convertir(modele, options['lot'], options['dry_run'])
+
+    def convertir(self, modele, lot, dry_run):
+        noms_champs = {champ.name for champ in modele._meta.get_fields()}
+        champ_date = next((champ for champ in CHAMPS_DATE if champ in noms_champs), None)
+        if champ_date is None:
+            self.stdout.write(self.style.WARNING(f'{modele._meta.label} : aucun champ de date, ignoré'))
+            return
+
+        # Les UUIDv7 existants (version 7) sont laissés tels quels
+        lignes = [
+            (pk, date) for pk, date in modele.objects.order_by(champ_date, 'pk').values_list('pk', champ_date)
+            if pk.version != 7
+        ]
+        if dry_run:
+            self.stdout.write(f'{modele._meta.label} : {len(lignes)} clé(s) à convertir')
+            return
+
+        for debut in range(0, len(lignes), lot):
+            with transaction.atomic():
+                for ancienne, date in lignes[debut:debut + lot]:
+                    nouvelle = uuid7(int(date.timestamp() * 1000)) if date else uuid7()
+                    modele.objects.filter(pk=ancienne).update(**{modele._meta.pk.attname: nouvelle})
+        self.stdout.write(self.style.SUCCESS(f'✓ {modele._meta.label} : {len(lignes)} clé(s) converties'))
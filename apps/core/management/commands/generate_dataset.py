@@ -0,0 +1,563 @@
+"""
+Commande de génération d'un jeu de données volumineux pour les tests de charge
+"""
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, time as heure, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from apps.core.identifiants import generer
+from apps.core.utils import normaliser_cle, uuid7
+from apps.locations.models import Gare, Ville
+from apps.parcels.models import Colis, HistoriqueEtat, Livraison
+from apps.parcels.transitions import DATES_COLIS
+from apps.trips import plan_sieges
+from apps.trips.models import Trajet, Reservation
+from apps.users.models import Role, User, AffectationGare
+
+
+# Numéros réservés aux utilisateurs générés : +2265 suivi de 7 chiffres
+PREFIXE_TELEPHONE = '+2265'
+
+NOMS = [
+    'OUEDRAOGO', 'KABORE', 'SAWADOGO', 'ZOUNGRANA', 'COMPAORE', 'TRAORE', 'SANOGO', 'KONATE',
+    'DIARRA', 'COULIBALY', 'TOURE', 'ZONGO', 'YAMEOGO', 'NIKIEMA', 'BARRO', 'ILBOUDO',
+    'OUATTARA', 'SOME', 'KAFANDO', 'TAPSOBA', 'BAMBARA', 'DIALLO', 'KIENDREBEOGO', 'ROAMBA',
+]
+PRENOMS = [
+    'Jean', 'Marie', 'Paul', 'Aïcha', 'Amadou', 'Fatou', 'Ibrahim', 'Moussa', 'Seydou', 'Lassane',
+    'Souleymane', 'Aminata', 'Clarisse', 'Michel', 'Sophie', 'Jacques', 'Salif', 'Awa',
+    'Issouf', 'Mariam', 'Boureima', 'Rasmata', 'Adama', 'Alizèta',
+]
+DESCRIPTIONS = [
+    'Vêtements', 'Documents administratifs', 'Pièces détachées', 'Produits alimentaires',
+    'Téléphone portable', 'Électroménager', 'Médicaments', 'Tissus et pagnes', 'Livres',
+]
+COMPAGNIES = ['TSR', 'STAF', 'Rakieta', 'TCV', 'Elitis Express', 'SOGEBAF']
+
+# Répartition des rôles des utilisateurs générés
+POIDS_ROLES = {
+    Role.CLIENT: 70,
+    Role.EXPEDITEUR: 23,
+    Role.LIVREUR: 3.5,
+    Role.GUICHETIER: 1.5,
+    Role.COLISSIER: 1.5,
+    Role.GERANT: 0.5,
+}
+ROLES_AFFECTES = {Role.GERANT, Role.GUICHETIER, Role.COLISSIER, Role.LIVREUR}
+
+# Heures de départ des cars, surtout le matin
+HEURES_DEPART = [heure(h, m) for h in range(5, 23) for m in (0, 30)]
+POIDS_HEURES = [6 if h.hour < 10 else 3 if h.hour < 16 else 1 for h in HEURES_DEPART]
+
+EA, EC, AR, EL, LI, PR, AN = (
+    Colis.EN_ATTENTE, Colis.EN_COURS, Colis.ARRIVE, Colis.EN_LIVRAISON,
+    Colis.LIVRE, Colis.PROBLEME, Colis.ANNULE,
+)
+
+# Statut actuel d'un colis selon son âge en jours : (âge maximal, {statut: poids})
+STATUTS_SELON_AGE = [
+    (2, {EA: 35, EC: 40, AR: 15, EL: 5, AN: 5}),
+    (10, {LI: 50, AR: 20, EL: 8, EC: 10, PR: 5, AN: 7}),
+    (None, {LI: 86, AR: 5, PR: 4, AN: 5}),
+]
+
+# Parcours possibles jusqu'au statut actuel (transitions de machine_colis) : (poids, statuts)
+PARCOURS = {
+    EA: [(1, [EA])],
+    EC: [(1, [EA, EC])],
+    AR: [(9, [EA, EC, AR]), (1, [EA, EC, AR, EL, AR])],
+    EL: [(1, [EA, EC, AR, EL])],
+    LI: [(6, [EA, EC, AR, EL, LI]), (4, [EA, EC, AR, LI])],
+    PR: [(3, [EA, EC, PR]), (2, [EA, EC, AR, EL, PR]), (1, [EA, PR])],
+    AN: [(1, [EA, AN])],
+}
+
+# Délai en heures entre deux statuts (minimum, maximum)
+DELAIS = {
+    (EA, EC): (1, 24),
+    (EC, AR): (3, 12),
+    (AR, EL): (1, 36),
+    (AR, LI): (2, 96),
+    (EL, LI): (1, 6),
+    (EL, AR): (4, 10),
+}
+DELAI_DEFAUT = (1, 48)
+
+# Statut de la livraison selon ce qui suit le passage en livraison
+LIVRAISON_SELON_SUITE = {
+    None: Livraison.EN_COURS,
+    LI: Livraison.LIVREE,
+    AR: Livraison.ECHEC,
+    PR: Livraison.ECHEC,
+}
+
+
+@contextmanager
+def dates_libres(*modeles):
+    """Désactive auto_now / auto_now_add : les dates générées sont enregistrées telles quelles"""
+    champs = [
+        (champ, champ.auto_now, champ.auto_now_add)
+        for modele in modeles
+        for champ in modele._meta.concrete_fields
+        if getattr(champ, 'auto_now', False) or getattr(champ, 'auto_now_add', False)
+    ]
+    for champ, _, _ in champs:
+        champ.auto_now = champ.auto_now_add = False
+    try:
+        yield
+    finally:
+        for champ, auto_now, auto_now_add in champs:
+            champ.auto_now, champ.auto_now_add = auto_now, auto_now_add
+
+
+def poids_zipf(nombre, exposant=1.0):
+    """Poids cumulés d'une loi de Zipf : quelques éléments concentrent l'activité"""
+    return list(accumulate(1 / (rang + 1) ** exposant for rang in range(nombre)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Génère un jeu de données réaliste et cohérent (utilisateurs, colis avec leur historique '
+        'et leurs livraisons, trajets, réservations) par bulk_create en lots. '
+        'Le résultat ne dépend que de --seed et des données déjà présentes : '
+        'à lancer sur une base dédiée, après load_locations.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Utilisateurs à générer')
+        parser.add_argument('--colis', type=int, default=1000000, help='Colis à générer (historique et livraisons en plus)')
+        parser.add_argument('--trajets', type=int, default=100000, help='Trajets à générer')
+        parser.add_argument('--reservations', type=int, default=5000000, help='Réservations à répartir sur les trajets')
+        parser.add_argument('--jours', type=int, default=365, help='Période couverte, en jours avant aujourd\'hui')
+        parser.add_argument('--seed', type=int, default=42, help='Graine du générateur aléatoire')
+        parser.add_argument(
+            '--date', type=datetime.fromisoformat,
+            help='Date de référence, fin de la période (AAAA-MM-JJ[THH:MM]) ; défaut : maintenant'
+        )
+        parser.add_argument('--lot', type=int, default=10000, help='Lignes principales par transaction')
+        parser.add_argument('--mot-de-passe', default='dataset123', help='Mot de passe des utilisateurs générés')
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options['seed'])
+        self.lot = options['lot']
+        # Avec --date et --seed fixés, deux exécutions produisent exactement les mêmes lignes
+        self.maintenant = options['date'] or timezone.now()
+        if timezone.is_naive(self.maintenant):
+            self.maintenant = timezone.make_aware(self.maintenant)
+        self.debut_periode = self.maintenant - timedelta(days=options['jours'])
+
+        self.gares = list(Gare.actifs.select_related('quartier__ville').order_by('nom', 'id'))
+        if not self.gares:
+            raise CommandError('Aucune gare : lancer d\'abord load_locations')
+        if options['users'] and User.objects.filter(telephone__startswith=PREFIXE_TELEPHONE).exists():
+            raise CommandError(
+                f'Des utilisateurs {PREFIXE_TELEPHONE}... ont déjà été générés : utiliser une base vide'
+            )
+        # Quelques gares concentrent l'essentiel du trafic
+        self.rnd.shuffle(self.gares)
+        self.poids_gares = poids_zipf(len(self.gares))
+
+        with self.session_rapide(), dates_libres(
+            User, AffectationGare, Colis, HistoriqueEtat, Livraison, Trajet, Reservation
+        ):
+            try:
+                if options['users']:
+                    self.mesurer('Utilisateurs', self.generer_utilisateurs, options['users'], options['mot_de_passe'])
+                self.charger_utilisateurs()
+                if options['colis']:
+                    self.mesurer('Colis', self.generer_colis, options['colis'], options['jours'])
+                if options['trajets']:
+                    self.mesurer(
+                        'Trajets', self.generer_trajets, options['trajets'], options['reservations'], options['jours']
+                    )
+            except IntegrityError as e:
+                # Même graine sur une base déjà remplie : mêmes clés, mêmes numéros
+                raise CommandError(f'Données déjà présentes ({e}) : utiliser une base vide ou une autre --seed')
+
+    @contextmanager
+    def session_rapide(self):
+        """
+        Écritures non synchrones pour cette connexion uniquement : une coupure
+        peut perdre les derniers lots, qu'il suffit de régénérer
+        """
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('PRAGMA synchronous = OFF')
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SET synchronous_commit TO OFF')
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute('PRAGMA synchronous = FULL')
+                elif connection.vendor == 'postgresql':
+                    cursor.execute('SET synchronous_commit TO DEFAULT')
+
+    def mesurer(self, nom, generateur, *args):
+        self.stdout.write(f'{nom}...')
+        debut = time.perf_counter()
+        comptes = generateur(*args)
+        duree = time.perf_counter() - debut
+        total = sum(comptes.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {nom} : ' + ', '.join(f'{n} {table}' for table, n in comptes.items())
+            + f' en {duree:.1f}s ({total / duree:,.0f} lignes/s)'
+        ))
+
+    def cle(self, date):
+        """Clé primaire reproductible, datée comme nouvel_uuid() l'aurait fait"""
+        if settings.UUID_ORDONNES:
+            return uuid7(int(date.timestamp() * 1000), aleatoire=self.rnd)
+        return uuid.UUID(int=self.rnd.getrandbits(128), version=4)
+
+    def date_entre(self, debut, fin):
+        return debut + (fin - debut) * self.rnd.random()
+
+    def telephone_aleatoire(self):
+        return f'+2267{self.rnd.randrange(10 ** 7):07d}'
+
+    def gare(self):
+        return self.rnd.choices(self.gares, cum_weights=self.poids_gares)[0]
+
+    def choisir(self, poids):
+        """Clé d'un dictionnaire {valeur: poids}"""
+        return self.rnd.choices(list(poids), weights=list(poids.values()))[0]
+
+    # Utilisateurs
+
+    def generer_utilisateurs(self, nombre, mot_de_passe):
+        roles = {role.nom: role for role in Role.objects.all()}
+        for nom, libelle in Role.ROLE_CHOICES:
+            if nom not in roles:
+                roles[nom] = Role.objects.create(nom=nom, description=libelle)
+        # Un seul hachage pour tous les comptes générés
+        mot_de_passe = make_password(mot_de_passe)
+        noms_roles, poids_roles = list(POIDS_ROLES), list(POIDS_ROLES.values())
+
+        comptes = {'utilisateurs': 0, 'affectations': 0}
+        for debut in range(0, nombre, self.lot):
+            users, affectations = [], []
+            for i in range(debut, min(debut + self.lot, nombre)):
+                role = self.rnd.choices(noms_roles, weights=poids_roles)[0]
+                inscription = self.date_entre(self.debut_periode - timedelta(days=365), self.maintenant)
+                prenom, nom = self.rnd.choice(PRENOMS), self.rnd.choice(NOMS)
+                user = User(
+                    id=self.cle(inscription),
+                    telephone=f'{PREFIXE_TELEPHONE}{i:07d}',
+                    nom=nom,
+                    prenom=prenom,
+                    email=f'{normaliser_cle(prenom)}.{normaliser_cle(nom)}{i}@example.com' if self.rnd.random() < 0.3 else None,
+                    role_id=roles[role].id,
+                    password=mot_de_passe,
+                    created_at=inscription,
+                    updated_at=inscription,
+                )
+                users.append(user)
+                if role in ROLES_AFFECTES:
+                    affectations.append(AffectationGare(
+                        id=self.cle(inscription),
+                        user_id=user.id,
+                        gare_id=self.gare().id,
+                        date_debut=inscription.date(),
+                        est_principale=True,
+                        created_at=inscription,
+                        updated_at=inscription,
+                    ))
+            with transaction.atomic():
+                User.objects.bulk_create(users, batch_size=1000)
+                AffectationGare.objects.bulk_create(affectations, batch_size=1000)
+            comptes['utilisateurs'] += len(users)
+            comptes['affectations'] += len(affectations)
+        return comptes
+
+    def charger_utilisateurs(self):
+        """Utilisateurs existants (générés ou non) auxquels rattacher colis et réservations"""
+        clients = list(
+            User.actifs.filter(role__nom__in=[Role.CLIENT, Role.EXPEDITEUR])
+            .order_by('telephone')
+            .values_list('id', 'telephone', 'nom', 'prenom', 'email')
+        )
+        self.rnd.shuffle(clients)
+        self.clients = [(id, str(telephone), nom, prenom, email) for id, telephone, nom, prenom, email in clients]
+        self.poids_clients = poids_zipf(len(self.clients), exposant=0.8)
+
+        # Personnel par gare, selon les affectations principales
+        self.personnel = {}
+        affectations = (
+            AffectationGare.actifs.filter(est_principale=True, user__is_active=True)
+            .order_by('user__telephone')
+            .values_list('user__role__nom', 'gare_id', 'user_id')
+        )
+        for role, gare_id, user_id in affectations:
+            self.personnel.setdefault((role, gare_id), []).append(user_id)
+        self.livreurs = list(
+            User.actifs.filter(role__nom=Role.LIVREUR).order_by('telephone').values_list('id', flat=True)
+        )
+
+    def client(self):
+        return self.rnd.choices(self.clients, cum_weights=self.poids_clients)[0]
+
+    def agent(self, role, gare_id):
+        agents = self.personnel.get((role, gare_id))
+        return self.rnd.choice(agents) if agents else None
+
+    # Colis
+
+    def generer_colis(self, nombre, jours):
+        if not self.clients:
+            raise CommandError('Aucun client ni expéditeur : générer des utilisateurs (--users)')
+        comptes = {'colis': 0, 'historiques': 0, 'livraisons': 0}
+        for debut in range(0, nombre, self.lot):
+            colis, historiques, livraisons = [], [], []
+            for _ in range(debut, min(debut + self.lot, nombre)):
+                self.preparer_colis(jours, colis, historiques, livraisons)
+            with transaction.atomic():
+                Colis.objects.bulk_create(colis, batch_size=1000)
+                HistoriqueEtat.objects.bulk_create(historiques, batch_size=1000)
+                Livraison.objects.bulk_create(livraisons, batch_size=1000)
+            comptes['colis'] += len(colis)
+            comptes['historiques'] += len(historiques)
+            comptes['livraisons'] += len(livraisons)
+        return comptes
+
+    def preparer_colis(self, jours, colis_lot, historiques_lot, livraisons_lot):
+        rnd = self.rnd
+        # Activité croissante : les colis récents sont plus nombreux
+        age = rnd.triangular(0, jours, 0)
+        statuts = next(poids for age_max, poids in STATUTS_SELON_AGE if age_max is None or age <= age_max)
+        statut = self.choisir(statuts)
+        poids_parcours, parcours_possibles = zip(*PARCOURS[statut])
+        parcours = rnd.choices(parcours_possibles, weights=poids_parcours)[0]
+
+        # Dates des étapes ; le colis est expédié assez tôt pour que la dernière soit passée
+        delais = [timedelta()]
+        for precedent, nouveau in zip(parcours, parcours[1:]):
+            minimum, maximum = DELAIS.get((precedent, nouveau), DELAI_DEFAUT)
+            delais.append(delais[-1] + timedelta(hours=rnd.uniform(minimum, maximum)))
+        expedition = min(self.maintenant - timedelta(days=age), self.maintenant - delais[-1])
+
+        depart = self.gare()
+        arrivee = self.gare()
+        while arrivee is depart and len(self.gares) > 1:
+            arrivee = self.gare()
+
+        poids = min(max(rnd.lognormvariate(1.0, 0.9), 0.1), 500)
+        prix = max(500, round((300 + 250 * poids) / 50) * 50)
+        colis = Colis(
+            id=self.cle(expedition),
+            code_suivi=generer('colis'),
+            description=rnd.choice(DESCRIPTIONS),
+            poids=Decimal(f'{poids:.2f}'),
+            valeur_declaree=None if rnd.random() < 0.6 else Decimal(round(rnd.lognormvariate(10, 1), -2)),
+            expediteur_id=self.client()[0],
+            destinataire_nom=f'{rnd.choice(PRENOMS)} {rnd.choice(NOMS)}',
+            destinataire_telephone=self.telephone_aleatoire(),
+            destinataire_adresse=f'Secteur {rnd.randint(1, 55)}, {arrivee.quartier.ville.nom}',
+            gare_depart_id=depart.id,
+            gare_arrivee_id=arrivee.id,
+            statut=statut,
+            prix=prix,
+            montant_paye=prix if rnd.random() < 0.9 else 0,
+            date_expedition=expedition,
+            date_arrivee_prevue=(expedition + timedelta(days=rnd.randint(1, 3))).date(),
+            created_at=expedition,
+        )
+
+        # Historique : une ligne par étape du parcours, à des dates croissantes
+        precedent = None
+        livraison = None
+        for etape, (nouveau, delai) in enumerate(zip(parcours, delais)):
+            date = expedition + delai
+            # Création et première étape en gare de départ, la suite en gare d'arrivée
+            gare = depart if precedent in (None, EA) else arrivee
+            historiques_lot.append(HistoriqueEtat(
+                id=self.cle(date),
+                colis_id=colis.id,
+                ancien_statut=precedent,
+                nouveau_statut=nouveau,
+                utilisateur_id=self.agent(Role.COLISSIER, gare.id),
+                commentaire='Colis créé' if precedent is None else '',
+                localisation_id=gare.id,
+                created_at=date,
+                updated_at=date,
+            ))
+            if nouveau in DATES_COLIS:
+                setattr(colis, DATES_COLIS[nouveau], date)
+
+            if livraison is not None and livraison.date_fin is None and livraison.statut != Livraison.EN_COURS:
+                livraison.date_fin = livraison.updated_at = date
+            if nouveau == EL:
+                suite = parcours[etape + 1] if etape + 1 < len(parcours) else None
+                livreur = self.agent(Role.LIVREUR, arrivee.id) or (rnd.choice(self.livreurs) if self.livreurs else None)
+                if livreur is not None:
+                    assignation = date - timedelta(minutes=rnd.randint(10, 120))
+                    livraison = Livraison(
+                        id=self.cle(assignation),
+                        colis_id=colis.id,
+                        livreur_id=livreur,
+                        statut=LIVRAISON_SELON_SUITE[suite],
+                        date_assignation=assignation,
+                        date_debut=date,
+                        raison_echec='Destinataire absent' if suite in (AR, PR) else '',
+                        created_at=assignation,
+                        updated_at=date,
+                    )
+                    livraisons_lot.append(livraison)
+            precedent = nouveau
+
+        colis.updated_at = date
+        colis_lot.append(colis)
+
+    # Trajets et réservations
+
+    def generer_trajets(self, nombre, reservations, jours):
+        rnd = self.rnd
+        villes = list(Ville.actifs.order_by('nom', 'id').values_list('nom', 'population'))
+        if len(villes) < 2:
+            raise CommandError('Il faut au moins deux villes : lancer d\'abord load_locations')
+        # Lignes les plus fréquentées entre les villes les plus peuplées
+        lignes = [(a, b) for a, _ in villes for b, _ in villes if a != b]
+        population = dict(villes)
+        poids_lignes = [((population[a] or 50000) * (population[b] or 50000)) ** 0.5 for a, b in lignes]
+        durees = {ligne: rnd.randint(90, 600) for ligne in lignes}
+        gares_par_ville = {}
+        for gare in self.gares:
+            gares_par_ville.setdefault(gare.quartier.ville.nom, []).append(gare.id)
+
+        aujourd_hui = timezone.localdate(self.maintenant)
+        premier_jour = aujourd_hui - timedelta(days=jours)
+        plages = (aujourd_hui + timedelta(days=14) - premier_jour).days
+
+        # Première passe : caractéristiques des trajets, pour répartir exactement les réservations
+        trajets = []
+        for _ in range(nombre):
+            ligne = rnd.choices(lignes, weights=poids_lignes)[0]
+            vip = rnd.random() < 0.2
+            capacite = rnd.choice([30, 40]) if vip else rnd.choice([50, 60, 70])
+            trajets.append((ligne, vip, capacite, rnd.betavariate(2, 1.5)))
+
+        capacite_totale = sum(capacite for _, _, capacite, _ in trajets)
+        if reservations > capacite_totale:
+            raise CommandError(
+                f'{reservations} réservations pour {capacite_totale} places : augmenter --trajets'
+            )
+        remplissage = [capacite * taux for _, _, capacite, taux in trajets]
+        facteur = reservations / sum(remplissage) if remplissage else 0
+        nombres = [min(capacite, int(r * facteur)) for (_, _, capacite, _), r in zip(trajets, remplissage)]
+        manque = reservations - sum(nombres)
+        while manque > 0:
+            for i, (_, _, capacite, _) in enumerate(trajets):
+                if manque and nombres[i] < capacite:
+                    nombres[i] += 1
+                    manque -= 1
+
+        comptes = {'trajets': 0, 'reservations': 0}
+        lot_trajets, lot_reservations = [], []
+        for (ligne, vip, capacite, _), nombre_reservations in zip(trajets, nombres):
+            date_depart = premier_jour + timedelta(days=rnd.randrange(plages))
+            heure_depart = rnd.choices(HEURES_DEPART, weights=POIDS_HEURES)[0]
+            depart = timezone.make_aware(datetime.combine(date_depart, heure_depart))
+            creation = min(depart - timedelta(days=rnd.uniform(7, 30)), self.maintenant)
+            duree = durees[ligne]
+            prix = max(1000, round(duree * (20 if vip else 12) / 500) * 500)
+
+            if depart + timedelta(minutes=duree) < self.maintenant:
+                statut = 'annule' if rnd.random() < 0.02 else 'termine'
+            elif depart < self.maintenant:
+                statut = 'en_cours'
+            else:
+                statut = 'planifie'
+
+            trajet = Trajet(
+                id=self.cle(creation),
+                ville_depart=ligne[0],
+                ville_arrivee=ligne[1],
+                ville_depart_cle=normaliser_cle(ligne[0]),
+                ville_arrivee_cle=normaliser_cle(ligne[1]),
+                gare_depart_id=rnd.choice(gares_par_ville[ligne[0]]) if ligne[0] in gares_par_ville else None,
+                gare_arrivee_id=rnd.choice(gares_par_ville[ligne[1]]) if ligne[1] in gares_par_ville else None,
+                date_depart=date_depart,
+                heure_depart=heure_depart,
+                duree_estimee=duree,
+                prix_base=prix,
+                capacite_max=capacite,
+                type_trajet='vip' if vip else 'ordinaire',
+                is_vip=vip,
+                statut=statut,
+                compagnie_nom=rnd.choice(COMPAGNIES),
+                bus_immatriculation=f'11 {rnd.choice("ABCDEFGHJK")}{rnd.choice("ABCDEFGHJK")} {rnd.randint(1000, 9999)}',
+                created_at=creation,
+                updated_at=creation,
+            )
+            occupes = self.preparer_reservations(trajet, depart, nombre_reservations, lot_reservations)
+            trajet.places_reservees = len(occupes)
+            trajet.plan_sieges = plan_sieges.depuis_sieges(occupes, capacite)
+            trajet.places_contigues_max = plan_sieges.plus_longue_serie_libre(trajet.plan_sieges, capacite)
+            lot_trajets.append(trajet)
+
+            if len(lot_reservations) >= self.lot or len(lot_trajets) >= self.lot:
+                self.enregistrer_trajets(lot_trajets, lot_reservations, comptes)
+                lot_trajets, lot_reservations = [], []
+        self.enregistrer_trajets(lot_trajets, lot_reservations, comptes)
+        return comptes
+
+    def preparer_reservations(self, trajet, depart, nombre, lot):
+        """Réservations d'un trajet sur des sièges distincts ; retourne les sièges occupés"""
+        rnd = self.rnd
+        if trajet.statut == 'annule':
+            statuts = {'annulee': 1}
+        elif trajet.statut in ('termine', 'en_cours'):
+            statuts = {'validee': 82, 'payee': 8, 'annulee': 6, 'confirmee': 4}
+        else:
+            statuts = {'en_attente': 20, 'confirmee': 25, 'payee': 50, 'annulee': 5}
+
+        occupes = []
+        for siege in rnd.sample(range(1, trajet.capacite_max + 1), nombre):
+            statut = self.choisir(statuts)
+            # La plupart des réservations sont faites dans les jours qui précèdent le départ
+            date = depart - timedelta(hours=min(rnd.expovariate(1 / 72), 24 * 21))
+            date = min(max(date, trajet.created_at), self.maintenant)
+            if self.clients and rnd.random() < 0.6:
+                client_id, telephone, nom, prenom, email = self.client()
+            else:
+                client_id = None
+                telephone, nom, prenom, email = self.telephone_aleatoire(), rnd.choice(NOMS), rnd.choice(PRENOMS), None
+            lot.append(Reservation(
+                id=self.cle(date),
+                trajet_id=trajet.id,
+                client_id=client_id,
+                client_telephone=telephone,
+                client_nom=nom,
+                client_prenom=prenom,
+                client_email=email,
+                numero_ticket=generer('ticket_trajet'),
+                numero_siege=siege,
+                statut=statut,
+                prix=trajet.prix_base,
+                montant_paye=trajet.prix_base if statut in ('payee', 'validee') else 0,
+                date_reservation=date,
+                date_validation=depart if statut == 'validee' else None,
+                created_at=date,
+                updated_at=date,
+            ))
+            if statut != 'annulee':
+                occupes.append(siege)
+        return occupes
+
+    def enregistrer_trajets(self, trajets, reservations, comptes):
+        with transaction.atomic():
+            Trajet.objects.bulk_create(trajets, batch_size=1000)
+            Reservation.objects.bulk_create(reservations, batch_size=1000)
+        comptes['trajets'] += len(trajets)
+        comptes['reservations'] += len(reservations)
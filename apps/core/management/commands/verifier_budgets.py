@@ -0,0 +1,102 @@
+"""
+Commande de vérification des budgets de requêtes de tous les ViewSets
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import NoReverseMatch, reverse
+
+from apps.authentication.jetons import JetonRafraichissement
+from apps.core.requetes import budget_de_la_vue, enregistrer_requetes, forme_requete
+from apps.core.testing import routes_viewsets
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Appelle en GET chaque route de liste (et le détail du premier objet) de '
+        'chaque ViewSet de config/urls.py et compare le nombre de requêtes au budget'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--telephone', help='Utilisateur authentifié (défaut : premier superuser)')
+        parser.add_argument('--details', action='store_true', help='Afficher les requêtes des routes en échec')
+
+    def handle(self, *args, **options):
+        if options['telephone']:
+            user = User.objects.filter(telephone=options['telephone']).first()
+        else:
+            user = User.objects.filter(is_superuser=True, is_active=True).first()
+        if user is None:
+            raise CommandError('Aucun utilisateur pour authentifier les requêtes')
+
+        client = Client(
+            HTTP_HOST='localhost',
+            HTTP_AUTHORIZATION=f'Bearer {JetonRafraichissement.for_user(user).access_token}',
+        )
+        routes = routes_viewsets()
+        ids_par_viewset = {}
+        echecs = 0
+        non_verifiees = 0
+
+        # Routes sans paramètre d'abord : elles fournissent un id pour les routes de détail
+        routes.sort(key=lambda route: route[0].endswith('-detail') or not route[0].endswith('-list'))
+        for nom, classe, actions in routes:
+            if 'get' not in actions:
+                continue
+            try:
+                url = reverse(nom)
+            except NoReverseMatch:
+                pk = ids_par_viewset.get(classe)
+                if pk is None:
+                    continue
+                try:
+                    url = reverse(nom, kwargs={'pk': pk})
+                except NoReverseMatch:
+                    continue
+
+            with enregistrer_requetes() as enregistreur:
+                response = client.get(url)
+
+            if nom.endswith('-list') and response.status_code == 200:
+                data = response.json()
+                resultats = data.get('results', data) if isinstance(data, dict) else data
+                if resultats and isinstance(resultats[0], dict) and 'id' in resultats[0]:
+                    ids_par_viewset[classe] = resultats[0]['id']
+
+            if response.status_code >= 400:
+                # Une réponse en erreur (paramètre requis, objet introuvable) ne dit rien du budget
+                non_verifiees += 1
+                self.stdout.write(self.style.WARNING(
+                    f'– {classe.__name__}.{actions["get"]} {url} [{response.status_code}] non vérifiée'
+                ))
+                continue
+
+            budget = budget_de_la_vue(response.resolver_match, 'GET')
+            declare = budget is not None
+            if not declare:
+                budget = settings.QUERY_BUDGET_DEFAULT
+            repetees = enregistreur.formes_repetees()
+            ok = enregistreur.nombre <= budget and not repetees and declare
+
+            ligne = (
+                f'{"✓" if ok else "✗"} {classe.__name__}.{actions["get"]} {url} '
+                f'[{response.status_code}] {enregistreur.nombre}/{budget}'
+            )
+            if not declare:
+                ligne += ' (pas de budget déclaré)'
+            if repetees:
+                ligne += f' N+1 : {max(repetees.values())} requêtes identiques'
+            self.stdout.write(self.style.SUCCESS(ligne) if ok else self.style.ERROR(ligne))
+
+            if not ok:
+                echecs += 1
+                if options['details']:
+                    for sql, _ in enregistreur.requetes:
+                        self.stdout.write(f'      {forme_requete(sql)[:200]}')
+
+        if non_verifiees:
+            self.stdout.write(self.style.WARNING(f'{non_verifiees} route(s) non vérifiée(s) : réponse en erreur'))
+        if echecs:
+            raise CommandError(f'{echecs} route(s) hors budget')
+        self.stdout.write(self.style.SUCCESS('✓ Toutes les routes vérifiées respectent leur budget'))
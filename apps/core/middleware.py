@@ -0,0 +1,102 @@
+"""
+Core middleware
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .instrumentation import instrumenter_serializers, mesure_courante, mesurer_requete, nom_route, registre
+from .requetes import BudgetRequetesDepasse, budget_de_la_vue, enregistrer_requetes, forme_requete
+
+
+logger = logging.getLogger('apps.core.requetes')
+logger_instrumentation = logging.getLogger('apps.core.instrumentation')
+
+
+class InstrumentationMiddleware:
+    """
+    Mesure chaque requête (apps.core.instrumentation) : en-tête Server-Timing
+    (SERVER_TIMING_ENABLED), ligne de journal clé=valeur et histogrammes par
+    route exposés sur /api/v1/metrics/. À placer en tête de MIDDLEWARE pour
+    que le temps total inclue les autres middlewares.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrumenter_serializers()
+
+    def __call__(self, request):
+        with mesurer_requete() as mesure:
+            response = self.get_response(request)
+
+        route = nom_route(request)
+        registre.enregistrer(request.method, route, response.status_code, mesure)
+        if settings.SERVER_TIMING_ENABLED:
+            response['Server-Timing'] = mesure.server_timing()
+
+        valeurs = {
+            'methode': request.method,
+            'route': route,
+            'statut': response.status_code,
+            'total_ms': round(mesure.total * 1000, 1),
+            'vue_ms': round(mesure.vue * 1000, 1),
+            'db_ms': round(mesure.db * 1000, 1),
+            'requetes_sql': mesure.requetes,
+            'serialisation_ms': round(mesure.serialisation * 1000, 1),
+        }
+        logger_instrumentation.info(
+            ' '.join(f'{cle}={valeur}' for cle, valeur in valeurs.items()),
+            extra={'instrumentation': valeurs},
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        mesure = mesure_courante()
+        if mesure is not None:
+            mesure.debut_vue = time.perf_counter()
+
+
+class BudgetRequetesMiddleware:
+    """
+    Développement / tests : compte les requêtes SQL de chaque requête HTTP,
+    signale les formes répétées (N+1) et le dépassement du budget déclaré
+    par la vue (`budget_requetes`, sinon QUERY_BUDGET_DEFAULT).
+
+    Ajoute les en-têtes X-Query-Count et X-Query-Budget. Avec
+    QUERY_BUDGET_STRICT, un dépassement lève BudgetRequetesDepasse.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with enregistrer_requetes() as enregistreur:
+            response = self.get_response(request)
+
+        budget = budget_de_la_vue(request.resolver_match, request.method)
+        if budget is None:
+            budget = settings.QUERY_BUDGET_DEFAULT
+        response['X-Query-Count'] = str(enregistreur.nombre)
+        response['X-Query-Budget'] = str(budget)
+
+        repetees = enregistreur.formes_repetees()
+        for forme, nombre in repetees.items():
+            logger.warning('N+1 probable sur %s %s : %d x %s', request.method, request.path, nombre, forme)
+
+        if enregistreur.nombre > budget:
+            message = (
+                f'{request.method} {request.path} : {enregistreur.nombre} requêtes '
+                f'pour un budget de {budget}'
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                details = '\n'.join(forme_requete(sql) for sql, _ in enregistreur.requetes)
+                raise BudgetRequetesDepasse(f'{message}\n{details}')
+            logger.warning(message)
+
+        return response
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenceIdentifiants',
+            fields=[
+                ('nom', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Nom')),
+                ('valeur', models.BigIntegerField(default=0, verbose_name='Dernière valeur réservée')),
+            ],
+            options={
+                'verbose_name': "Séquence d'identifiants",
+                'verbose_name_plural': "Séquences d'identifiants",
+            },
+        ),
+    ]
@@ -3,16 +3,31 @@ Core models - Base model for all other models
 """
 from django.db import models
 from django.utils import timezone
-import uuid
+from .utils import nouvel_uuid
+
+
+class AllObjectsManager(models.Manager):
+    """Toutes les lignes, y compris les objets désactivés (soft delete)"""
+
+
+class ActiveManager(models.Manager):
+    """Seulement les lignes actives (is_active=True)"""
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
 
 
 class BaseModel(models.Model):
     """
     Base model with common fields for all models
+    
+    - objects : manager par défaut, toutes les lignes (admin, relations)
+    - actifs : lignes actives seulement, couvertes par les index partiels
+      `WHERE is_active` des modèles les plus sollicités
     """
     id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=nouvel_uuid,
         editable=False,
         verbose_name="ID"
     )
@@ -29,6 +44,9 @@ class BaseModel(models.Model):
         verbose_name="Actif"
     )
     
+    objects = AllObjectsManager()
+    actifs = ActiveManager()
+    
     class Meta:
         abstract = True
         ordering = ['-created_at']
@@ -45,3 +63,26 @@ class BaseModel(models.Model):
         """Restore a soft-deleted object"""
         self.is_active = True
         self.save()
+
+
+class SequenceIdentifiants(models.Model):
+    """
+    Compteur partagé d'une séquence d'identifiants (apps.core.identifiants).
+    Chaque processus réserve un bloc de valeurs à la fois.
+    """
+    nom = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name="Nom"
+    )
+    valeur = models.BigIntegerField(
+        default=0,
+        verbose_name="Dernière valeur réservée"
+    )
+    
+    class Meta:
+        verbose_name = "Séquence d'identifiants"
+        verbose_name_plural = "Séquences d'identifiants"
+    
+    def __str__(self):
+        return f"{self.nom} ({self.valeur})"
@@ -0,0 +1,128 @@
+"""
+Core pagination - Pagination par curseur (keyset) pour les gros flux
+
+La pagination par numéro de page exécute un COUNT(*) et un OFFSET qui
+ralentissent à mesure que la table grossit. En mode curseur, chaque page
+est lue à partir de la position (champ, id) du dernier élément renvoyé :
+le coût d'une page ne dépend plus de sa profondeur.
+
+Activation par ViewSet :
+
+    pagination_class = PaginationCurseur
+    champ_curseur = 'date_expedition'
+
+Le mode curseur est utilisé dès que le paramètre `cursor` est présent
+(`?cursor=` pour la première page) ; sinon la pagination par numéro de
+page habituelle s'applique, les clients existants ne changent pas.
+`?ordering=<champ_curseur>` parcourt le flux du plus ancien au plus
+récent (synchronisation incrémentale), l'ordre par défaut est décroissant.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PaginationCurseur(PageNumberPagination):
+    """
+    PageNumberPagination avec un mode curseur sur (champ_curseur, id).
+    Les deux colonnes doivent être couvertes par un index composite.
+    """
+    cursor_query_param = 'cursor'
+    champ_curseur = 'created_at'
+    message_curseur_invalide = 'Curseur invalide'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.mode_curseur = self.cursor_query_param in request.query_params
+        if not self.mode_curseur:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.champ = getattr(view, 'champ_curseur', self.champ_curseur)
+        self.taille = self.get_page_size(request)
+        position, croissant = self.decoder_curseur(
+            request.query_params[self.cursor_query_param], queryset.model
+        )
+        if position is None:
+            croissant = request.query_params.get('ordering') == self.champ
+        self.croissant = croissant
+
+        if croissant:
+            queryset = queryset.order_by(self.champ, 'id')
+        else:
+            queryset = queryset.order_by(f'-{self.champ}', '-id')
+
+        if position is not None:
+            # (champ, id) après la position, écrit champ >= x AND NOT (champ = x AND id <= y) :
+            # la borne sur champ seul délimite le parcours de l'index, alors que la forme
+            # OU (champ > x OR (champ = x AND id > y)) peut ne pas l'utiliser
+            valeur, pk = position
+            inclus, exclus = ('gte', 'lte') if croissant else ('lte', 'gte')
+            queryset = queryset.filter(
+                Q(**{f'{self.champ}__{inclus}': valeur})
+                & ~Q(**{self.champ: valeur, f'id__{exclus}': pk})
+            )
+
+        # Un élément de plus pour savoir s'il existe une page suivante
+        elements = list(queryset[:self.taille + 1])
+        self.page_suivante = len(elements) > self.taille
+        elements = elements[:self.taille]
+        self.dernier = elements[-1] if elements else None
+        return elements
+
+    def decoder_curseur(self, curseur, modele):
+        """Retourne ((valeur, id), croissant), ou (None, None) pour la première page"""
+        if not curseur:
+            return None, None
+        try:
+            donnees = json.loads(base64.urlsafe_b64decode(curseur.encode('ascii')).decode('utf-8'))
+            champ = modele._meta.get_field(self.champ)
+            valeur = champ.to_python(donnees['v'])
+            pk = modele._meta.pk.to_python(donnees['id'])
+            return (valeur, pk), bool(donnees['asc'])
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError) as e:
+            raise NotFound(self.message_curseur_invalide) from e
+
+    def encoder_curseur(self, element):
+        valeur = getattr(element, self.champ)
+        donnees = {
+            'v': valeur.isoformat() if hasattr(valeur, 'isoformat') else valeur,
+            'id': str(element.pk),
+            'asc': self.croissant,
+        }
+        brut = json.dumps(donnees, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(brut).decode('ascii')
+
+    def get_next_link(self):
+        if not self.mode_curseur:
+            return super().get_next_link()
+        if not self.page_suivante or self.dernier is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encoder_curseur(self.dernier))
+
+    def get_paginated_response(self, data):
+        if not self.mode_curseur:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_schema_operation_parameters(self, view):
+        parametres = super().get_schema_operation_parameters(view)
+        parametres.append({
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Curseur de pagination (vide pour la première page, puis le lien `next`)',
+            'schema': {'type': 'string'},
+        })
+        return parametres
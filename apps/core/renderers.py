@@ -0,0 +1,75 @@
+"""
+Core renderers - Rendu et lecture JSON rapides avec orjson
+
+JSONRenderer de DRF passe par le module json de la bibliothèque standard
+et par rest_framework.utils.encoders.JSONEncoder, appelé en Python pour
+chaque UUID, Decimal ou date de la réponse. orjson sérialise en code natif
+les dict, list, str, int, float et UUID ; les autres types (Decimal, dates,
+chaînes paresseuses, querysets...) sont confiés à l'encodeur de DRF, ce qui
+garde la sortie de JSONRenderer (format des dates, échappements).
+
+Activation dans REST_FRAMEWORK (voir config/settings.py, JSON_RAPIDE) :
+
+    'DEFAULT_RENDERER_CLASSES': ['apps.core.renderers.OrjsonRenderer', ...],
+    'DEFAULT_PARSER_CLASSES': ['apps.core.renderers.OrjsonParser', ...],
+
+Sans orjson installé, ou pour les cas qu'il ne couvre pas (indentation
+demandée par l'API navigable, entier de plus de 64 bits à rendre, corps
+de requête invalide ou dans un encodage autre qu'UTF-8), les classes de
+DRF prennent le relais.
+"""
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+
+class OrjsonRenderer(JSONRenderer):
+    """JSONRenderer servi par orjson, même sortie que celui de DRF"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # orjson ne sait indenter que de 2 espaces : l'API navigable (indent=4) garde DRF
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Dates confiées à l'encodeur DRF : millisecondes et suffixe "Z" comme JSONRenderer
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Comme JSONRenderer : U+2028 et U+2029 échappés pour l'inclusion dans du JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class OrjsonParser(JSONParser):
+    """JSONParser servi par orjson ; erreurs et cas limites laissés à DRF"""
+
+    renderer_class = OrjsonRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encodage = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if codecs.lookup(encodage).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        contenu = stream.read()
+        try:
+            return orjson.loads(contenu)
+        except orjson.JSONDecodeError:
+            # JSON invalide (ou BOM, NaN...) : message d'erreur et règles de DRF
+            return super().parse(io.BytesIO(contenu), media_type, parser_context)
@@ -0,0 +1,86 @@
+"""
+Core requêtes - Enregistrement des requêtes SQL et budgets par vue
+
+Utilisé par BudgetRequetesMiddleware, par les helpers de test
+(apps.core.testing) et par la commande verifier_budgets.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+class BudgetRequetesDepasse(Exception):
+    """Une vue a exécuté plus de requêtes que son budget déclaré"""
+
+
+_LITTERAUX = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTES_IN = re.compile(r'\bIN \([^()]*\)', re.IGNORECASE)
+
+
+def forme_requete(sql):
+    """
+    Forme d'une requête, indépendante des valeurs : deux requêtes qui ne
+    diffèrent que par leurs paramètres ont la même forme.
+    """
+    forme = _LITTERAUX.sub('?', sql)
+    forme = _LISTES_IN.sub('IN (...)', forme)
+    return ' '.join(forme.split())
+
+
+class EnregistreurRequetes:
+    """execute_wrapper qui garde le SQL et la durée de chaque requête"""
+
+    def __init__(self):
+        self.requetes = []
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.requetes.append((sql, time.perf_counter() - debut))
+
+    @property
+    def nombre(self):
+        return len(self.requetes)
+
+    @property
+    def duree(self):
+        return sum(duree for _, duree in self.requetes)
+
+    def formes_repetees(self, seuil=None):
+        """Formes exécutées au moins `seuil` fois : symptôme typique d'un N+1"""
+        if seuil is None:
+            seuil = settings.QUERY_BUDGET_N_PLUS_ONE
+        compteur = Counter(forme_requete(sql) for sql, _ in self.requetes)
+        return {forme: n for forme, n in compteur.items() if n >= seuil}
+
+
+@contextmanager
+def enregistrer_requetes():
+    """Enregistre les requêtes exécutées sur toutes les connexions"""
+    enregistreur = EnregistreurRequetes()
+    with ExitStack() as pile:
+        for connexion in connections.all():
+            pile.enter_context(connexion.execute_wrapper(enregistreur))
+        yield enregistreur
+
+
+def budget_de_la_vue(resolver_match, methode):
+    """
+    Budget déclaré par la vue résolue : attribut `budget_requetes` de la
+    classe, entier ou dict {action: entier}. Retourne None si aucun.
+    """
+    if resolver_match is None:
+        return None
+    fonction = resolver_match.func
+    classe = getattr(fonction, 'cls', None) or getattr(fonction, 'view_class', None)
+    budget = getattr(classe, 'budget_requetes', None)
+    if isinstance(budget, dict):
+        actions = getattr(fonction, 'actions', None) or {}
+        budget = budget.get(actions.get(methode.lower()), budget.get('*'))
+    return budget
@@ -0,0 +1,54 @@
+"""
+Core testing - Helpers de test pour les budgets de requêtes
+"""
+from contextlib import contextmanager
+
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.viewsets import ViewSetMixin
+
+from .requetes import enregistrer_requetes, forme_requete
+
+
+@contextmanager
+def budget_requetes(maximum, seuil_n_plus_un=None):
+    """
+    Échoue (AssertionError) si le bloc exécute plus de `maximum` requêtes
+    ou répète une même forme de requête (N+1).
+
+        with budget_requetes(3):
+            client.get('/api/v1/locations/villes/')
+    """
+    with enregistrer_requetes() as enregistreur:
+        yield enregistreur
+
+    repetees = enregistreur.formes_repetees(seuil_n_plus_un)
+    if enregistreur.nombre > maximum or repetees:
+        lignes = [f'{enregistreur.nombre} requêtes pour un budget de {maximum}']
+        lignes += [f'  N+1 ({n} x) : {forme}' for forme, n in repetees.items()]
+        lignes += [f'  {i}. {forme_requete(sql)}' for i, (sql, _) in enumerate(enregistreur.requetes, 1)]
+        raise AssertionError('\n'.join(lignes))
+
+
+def routes_viewsets(urlconf=None):
+    """
+    Routes de tous les ViewSets enregistrés dans l'urlconf :
+    liste de (nom de route complet, classe du ViewSet, {méthode: action}).
+    """
+    routes = []
+
+    def parcourir(patterns, namespace):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                ns = ':'.join(filter(None, [namespace, pattern.namespace]))
+                parcourir(pattern.url_patterns, ns or None)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                classe = getattr(pattern.callback, 'cls', None)
+                if classe is None or not issubclass(classe, ViewSetMixin):
+                    continue
+                nom = f'{namespace}:{pattern.name}' if namespace else pattern.name
+                if any(nom == r[0] for r in routes):
+                    continue  # variantes avec suffixe de format
+                routes.append((nom, classe, dict(pattern.callback.actions)))
+
+    parcourir(get_resolver(urlconf).url_patterns, None)
+    return routes
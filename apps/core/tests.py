@@ -0,0 +1,193 @@
+"""
+Core tests - Budgets de requêtes des ViewSets (apps.core.testing),
+pagination par curseur (apps.core.pagination)
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import NoReverseMatch, resolve, reverse
+from django.utils import timezone
+
+from apps.authentication.jetons import JetonRafraichissement
+from apps.locations.models import Quartier, Ville
+from apps.parcels.models import Colis
+from apps.trips.allocation import reserver
+from apps.trips.models import Reservation, Trajet
+from apps.users.models import Role, User
+
+from .requetes import budget_de_la_vue
+from .testing import budget_requetes, routes_viewsets
+
+
+class BudgetsRequetesTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        for commande in ('load_locations', 'load_users', 'load_parcels'):
+            call_command(commande, stdout=StringIO())
+
+        cls.demain = timezone.localdate() + timedelta(days=1)
+        cls.trajets = []
+        for i, (depart, arrivee) in enumerate([
+            ('Ouagadougou', 'Koudougou'),
+            ('Koudougou', 'Bobo-Dioulasso'),
+            ('Ouagadougou', 'Bobo-Dioulasso'),
+        ]):
+            trajet = Trajet.objects.create(
+                ville_depart=depart,
+                ville_arrivee=arrivee,
+                date_depart=cls.demain,
+                heure_depart=f'{8 + 3 * i:02d}:00',
+                duree_estimee=120,
+                prix_base=5000,
+                capacite_max=20,
+            )
+            reserver(trajet.id, [
+                {'client_telephone': f'+2267600{i}{j:03d}', 'client_nom': 'Test', 'client_prenom': str(j)}
+                for j in range(8)
+            ])
+            cls.trajets.append(trajet)
+
+        cls.admin = User.objects.filter(is_superuser=True).first()
+        cls.code_suivi = Colis.objects.values_list('code_suivi', flat=True).first()
+
+    def setUp(self):
+        self.client = Client(
+            HTTP_HOST='localhost',
+            HTTP_AUTHORIZATION=f'Bearer {JetonRafraichissement.for_user(self.admin).access_token}',
+        )
+
+    def parametres(self, nom):
+        return {
+            'gare-proches': {'lat': 12.37, 'lon': -1.52},
+            'gare-nearby': {'lat': 12.37, 'lon': -1.52},
+            'colis-tracking': {'code': self.code_suivi},
+            'trips:trajet-correspondances': {
+                'ville_depart': 'Ouagadougou',
+                'ville_arrivee': 'Bobo-Dioulasso',
+                'date_depart': self.demain.isoformat(),
+            },
+            'reservation-par-trajet': {'trajet_id': self.trajets[0].id},
+        }.get(nom, {})
+
+    def get_dans_budget(self, url, params=None):
+        """GET sous le budget déclaré par le ViewSet pour cette action"""
+        budget = budget_de_la_vue(resolve(url), 'GET')
+        self.assertIsNotNone(budget, f'{url} : pas de budget déclaré')
+        with budget_requetes(budget):
+            response = self.client.get(url, params or {})
+        self.assertLess(response.status_code, 400, f'{url} : {response.content[:200]}')
+        return response
+
+    def test_routes_get_dans_leur_budget(self):
+        routes = [route for route in routes_viewsets() if 'get' in route[2]]
+        # Routes sans paramètre d'abord : elles fournissent un id pour les routes de détail
+        routes.sort(key=lambda route: route[0].endswith('-detail') or not route[0].endswith('-list'))
+        ids_par_viewset = {}
+        verifiees = 0
+
+        for nom, classe, actions in routes:
+            try:
+                url = reverse(nom)
+            except NoReverseMatch:
+                pk = ids_par_viewset.get(classe)
+                if pk is None:
+                    continue
+                try:
+                    url = reverse(nom, kwargs={'pk': pk})
+                except NoReverseMatch:
+                    continue
+
+            with self.subTest(route=nom):
+                response = self.get_dans_budget(url, self.parametres(nom))
+                verifiees += 1
+                if nom.endswith('-list'):
+                    data = response.json()
+                    resultats = data.get('results', data) if isinstance(data, dict) else data
+                    if resultats and 'id' in resultats[0]:
+                        ids_par_viewset[classe] = resultats[0]['id']
+
+        self.assertGreater(verifiees, 20)
+
+    def test_comptes_annotes_sans_n_plus_un(self):
+        """Les listes de pays, villes, quartiers et rôles annotent leurs compteurs"""
+        ville = Ville.objects.first()
+        for i in range(settings.QUERY_BUDGET_N_PLUS_ONE + 2):
+            Quartier.objects.create(nom=f'Quartier {i}', ville=ville)
+            Ville.objects.create(nom=f'Ville {i}', pays=ville.pays)
+            Role.objects.get_or_create(nom=f'role_test_{i}')
+
+        for nom in ('pays-list', 'ville-list', 'quartier-list', 'role-list'):
+            with self.subTest(route=nom):
+                self.get_dans_budget(reverse(nom))
+
+    def test_statistiques_colis_en_une_requete_groupee(self):
+        url = reverse('colis-statistiques')
+        for par in (None, 'gare_depart', 'gare_arrivee', 'jour', 'mois'):
+            with self.subTest(par=par):
+                response = self.get_dans_budget(url, {'par': par} if par else {})
+                self.assertEqual(response.json()['total'], Colis.objects.count())
+
+
+class PaginationCurseurTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('load_users', stdout=StringIO())
+        cls.admin = User.objects.filter(is_superuser=True).first()
+        trajet = Trajet.objects.create(
+            ville_depart='Ouagadougou',
+            ville_arrivee='Bobo-Dioulasso',
+            date_depart=timezone.localdate() + timedelta(days=1),
+            heure_depart='08:00',
+            duree_estimee=300,
+            prix_base=5000,
+            capacite_max=60,
+        )
+        reserver(trajet.id, [
+            {'client_telephone': f'+2267610{i:04d}', 'client_nom': 'Test', 'client_prenom': str(i)}
+            for i in range(50)
+        ])
+        # Trois horodatages seulement : les pages coupent des groupes de dates égales
+        maintenant = timezone.now()
+        ids = list(Reservation.objects.order_by('id').values_list('id', flat=True))
+        for i, date in enumerate([maintenant, maintenant - timedelta(hours=1), maintenant - timedelta(days=1)]):
+            Reservation.objects.filter(id__in=ids[i::3]).update(date_reservation=date)
+        cls.ids = {str(pk) for pk in ids}
+
+    def setUp(self):
+        self.client = Client(
+            HTTP_HOST='localhost',
+            HTTP_AUTHORIZATION=f'Bearer {JetonRafraichissement.for_user(self.admin).access_token}',
+        )
+
+    def parcourir(self, **params):
+        url = reverse('trips:reservation-list')
+        response = self.client.get(url, {'cursor': '', **params})
+        vus = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            vus += [element['id'] for element in data['results']]
+            if not data['next']:
+                return vus
+            response = self.client.get(data['next'])
+
+    def test_dates_egales_ni_doublon_ni_oubli(self):
+        for params in ({}, {'ordering': 'date_reservation'}):
+            with self.subTest(**params):
+                vus = self.parcourir(**params)
+                self.assertEqual(len(vus), len(set(vus)))
+                self.assertEqual(set(vus), self.ids)
+
+    def test_ordre_par_date_puis_id(self):
+        vus = self.parcourir(ordering='date_reservation')
+        attendus = [
+            str(pk) for pk in Reservation.objects.order_by('date_reservation', 'id').values_list('id', flat=True)
+        ]
+        self.assertEqual(vus, attendus)
@@ -0,0 +1,72 @@
+"""
+Core utils - Fonctions utilitaires partagées
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+
+from django.conf import settings
+
+
+def normaliser_cle(valeur):
+    """
+    Clé de recherche indexable : minuscules, sans accents, mots séparés par '-'
+    ("Bobo Dioulasso", "BOBO-DIOULASSO" -> "bobo-dioulasso")
+    """
+    texte = unicodedata.normalize('NFKD', valeur or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return re.sub(r'[^a-z0-9]+', '-', texte.lower()).strip('-')
+
+
+_verrou_uuid7 = threading.Lock()
+_dernier_uuid7 = [0, 0]  # [milliseconde, compteur sur 12 bits]
+
+
+def uuid7(milliseconde=None, aleatoire=None):
+    """
+    UUID version 7 (RFC 9562) : 48 bits d'horodatage en millisecondes, puis
+    un compteur sur 12 bits et 62 bits aléatoires. Les clés générées par un
+    même processus sont strictement croissantes ; entre processus elles
+    restent triées à la milliseconde près.
+
+    `milliseconde` (horodatage Unix en ms) permet de dater une clé a posteriori ;
+    `aleatoire` (random.Random) remplace os.urandom pour des clés reproductibles.
+    """
+    octets = aleatoire.randbytes if aleatoire is not None else os.urandom
+    if milliseconde is None:
+        with _verrou_uuid7:
+            maintenant = time.time_ns() // 1_000_000
+            if maintenant > _dernier_uuid7[0]:
+                _dernier_uuid7[0], _dernier_uuid7[1] = maintenant, int.from_bytes(os.urandom(2), 'big') & 0x3FF
+            else:
+                # Même milliseconde (ou horloge qui recule) : on incrémente le compteur
+                _dernier_uuid7[1] += 1
+                if _dernier_uuid7[1] > 0xFFF:
+                    _dernier_uuid7[0] += 1
+                    _dernier_uuid7[1] = 0
+            milliseconde, compteur = _dernier_uuid7
+    else:
+        compteur = int.from_bytes(octets(2), 'big') & 0xFFF
+
+    bits_aleatoires = int.from_bytes(octets(8), 'big') & 0x3FFFFFFFFFFFFFFF
+    valeur = (
+        (milliseconde & 0xFFFFFFFFFFFF) << 80
+        | 0x7 << 76
+        | compteur << 64
+        | 0x2 << 62
+        | bits_aleatoires
+    )
+    return uuid.UUID(int=valeur)
+
+
+def nouvel_uuid():
+    """
+    Clé primaire par défaut des modèles : UUIDv7 ordonné dans le temps si
+    settings.UUID_ORDONNES, sinon uuid4 aléatoire
+    """
+    if settings.UUID_ORDONNES:
+        return uuid7()
+    return uuid.uuid4()
@@ -1,8 +1,18 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.permissions import BasePermission
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.db import connection
 
+from apps.authentication.jetons import JWTSansEtatAuthentication
+
+from .instrumentation import registre
+
 
 class HealthCheckView(APIView):
     """
@@ -24,3 +34,46 @@ class HealthCheckView(APIView):
             "database": db_status,
             "module": "CORE",
         }, status=status.HTTP_200_OK)
+
+
+class JetonMetriquesAuthentication(BaseAuthentication):
+    """
+    Jeton statique du scrapeur Prometheus (settings.METRICS_TOKEN).
+    Tout autre en-tête Authorization est laissé à l'authentification JWT.
+    """
+    
+    def authenticate(self, request):
+        jeton = settings.METRICS_TOKEN
+        morceaux = get_authorization_header(request).split()
+        if not jeton or len(morceaux) != 2 or morceaux[0].lower() != b'bearer':
+            return None
+        if not hmac.compare_digest(morceaux[1], jeton.encode()):
+            return None
+        return None, 'metriques'
+    
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
+
+
+class AccesMetriques(BasePermission):
+    """Scrapeur muni du jeton de métriques, ou membre du staff"""
+    
+    def has_permission(self, request, view):
+        if request.auth == 'metriques':
+            return True
+        return bool(request.user and request.user.is_staff)
+
+
+class MetricsView(APIView):
+    """
+    Histogrammes par route du processus courant (apps.core.instrumentation),
+    au format texte Prometheus
+    """
+    authentication_classes = [JetonMetriquesAuthentication, JWTSansEtatAuthentication]
+    permission_classes = [AccesMetriques]
+    
+    def get(self, request):
+        return HttpResponse(
+            registre.exposition(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -5,3 +5,6 @@ class LocationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.locations'
     verbose_name = 'Locations'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
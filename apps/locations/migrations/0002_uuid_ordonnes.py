@@ -0,0 +1,34 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:24
+
+import apps.core.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gare',
+            name='id',
+            field=models.UUIDField(default=apps.core.utils.nouvel_uuid, editable=False, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='pays',
+            name='id',
+            field=models.UUIDField(default=apps.core.utils.nouvel_uuid, editable=False, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='quartier',
+            name='id',
+            field=models.UUIDField(default=apps.core.utils.nouvel_uuid, editable=False, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='ville',
+            name='id',
+            field=models.UUIDField(default=apps.core.utils.nouvel_uuid, editable=False, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+    ]
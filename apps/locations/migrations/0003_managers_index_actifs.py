@@ -0,0 +1,21 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0002_uuid_ordonnes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gare',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['nom'], name='locations_gare_nom_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gare',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['quartier', 'nom'], name='locations_gare_quart_actif_idx'),
+        ),
+    ]
@@ -101,6 +101,19 @@ class Gare(BaseModel):
         verbose_name = "Gare"
         verbose_name_plural = "Gares"
         ordering = ['nom']
+        indexes = [
+            # Index partiels : seules les gares actives sont indexées
+            models.Index(
+                fields=['nom'],
+                condition=models.Q(is_active=True),
+                name='locations_gare_nom_actif_idx',
+            ),
+            models.Index(
+                fields=['quartier', 'nom'],
+                condition=models.Q(is_active=True),
+                name='locations_gare_quart_actif_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"Gare {self.nom}"
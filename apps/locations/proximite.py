@@ -0,0 +1,101 @@
+"""
+Locations proximité - Index spatial des gares actives
+
+Les gares sont projetées sur la sphère unité (x, y, z) et rangées dans un
+arbre k-d. La distance euclidienne (corde) entre deux points de la sphère
+croît avec la distance orthodromique : les k plus proches voisins et les
+recherches par rayon se font donc sans PostGIS, en quelques microsecondes.
+"""
+import heapq
+import math
+
+from apps.core.index_local import IndexLocal
+from .models import Gare
+
+
+RAYON_TERRE_KM = 6371.0088
+
+
+def vecteur(latitude, longitude):
+    lat, lon = math.radians(float(latitude)), math.radians(float(longitude))
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def corde_vers_km(corde):
+    return 2 * RAYON_TERRE_KM * math.asin(min(1.0, corde / 2))
+
+
+def km_vers_corde(distance_km):
+    return 2 * math.sin(min(math.pi / 2, distance_km / (2 * RAYON_TERRE_KM)))
+
+
+def _distance2(a, b):
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+class ArbreKD:
+    """Arbre k-d en 3 dimensions ; chaque nœud est (point, identifiant, axe, gauche, droite)"""
+
+    def __init__(self, points):
+        self.taille = len(points)
+        self.racine = self._construire(list(points), 0)
+
+    def _construire(self, points, profondeur):
+        if not points:
+            return None
+        axe = profondeur % 3
+        points.sort(key=lambda p: p[0][axe])
+        milieu = len(points) // 2
+        point, identifiant = points[milieu]
+        return (
+            point, identifiant, axe,
+            self._construire(points[:milieu], profondeur + 1),
+            self._construire(points[milieu + 1:], profondeur + 1),
+        )
+
+    def plus_proches(self, cible, k, corde_max=None):
+        """Les k points les plus proches de cible : liste de (corde, identifiant) triée"""
+        if k < 1:
+            return []
+        limite2 = corde_max ** 2 if corde_max is not None else math.inf
+        tas = []  # tas max via distances négatives
+
+        def visiter(noeud):
+            if noeud is None:
+                return
+            point, identifiant, axe, gauche, droite = noeud
+            d2 = _distance2(point, cible)
+            if d2 <= limite2:
+                if len(tas) < k:
+                    heapq.heappush(tas, (-d2, identifiant))
+                elif d2 < -tas[0][0]:
+                    heapq.heapreplace(tas, (-d2, identifiant))
+
+            ecart = cible[axe] - point[axe]
+            proche, loin = (gauche, droite) if ecart < 0 else (droite, gauche)
+            visiter(proche)
+            borne2 = -tas[0][0] if len(tas) == k else limite2
+            if ecart ** 2 <= borne2:
+                visiter(loin)
+
+        visiter(self.racine)
+        return sorted((math.sqrt(-d2), identifiant) for d2, identifiant in tas)
+
+
+def construire_index():
+    """Arbre k-d des gares actives ayant des coordonnées"""
+    gares = Gare.actifs.filter(
+        latitude__isnull=False,
+        longitude__isnull=False
+    ).values_list('id', 'latitude', 'longitude')
+    return ArbreKD([(vecteur(lat, lon), gare_id) for gare_id, lat, lon in gares])
+
+
+index_gares = IndexLocal('locations:gares', construire_index)
+
+
+def gares_proches(latitude, longitude, k=5, rayon_km=None):
+    """Liste de (identifiant de gare, distance en km), de la plus proche à la plus lointaine"""
+    corde_max = km_vers_corde(rayon_km) if rayon_km is not None else None
+    voisins = index_gares.obtenir().plus_proches(vecteur(latitude, longitude), k, corde_max)
+    return [(identifiant, corde_vers_km(corde)) for corde, identifiant in voisins]
@@ -14,6 +14,9 @@ class PaysSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_nombre_villes(self, obj):
+        # Annoté par le viewset ; requête COUNT seulement hors liste
+        if hasattr(obj, 'nombre_villes'):
+            return obj.nombre_villes
         return obj.villes.filter(is_active=True).count()
 
 
@@ -27,6 +30,9 @@ class VilleSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_nombre_quartiers(self, obj):
+        # Annoté par le viewset ; requête COUNT seulement hors liste
+        if hasattr(obj, 'nombre_quartiers'):
+            return obj.nombre_quartiers
         return obj.quartiers.filter(is_active=True).count()
 
 
@@ -40,6 +46,9 @@ class QuartierSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_nombre_gares(self, obj):
+        # Annoté par le viewset ; requête COUNT seulement hors liste
+        if hasattr(obj, 'nombre_gares'):
+            return obj.nombre_gares
         return obj.gares.filter(is_active=True).count()
 
 
@@ -0,0 +1,14 @@
+"""
+Locations signals - Rafraîchissement de l'index spatial des gares
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Gare
+from .proximite import index_gares
+
+
+@receiver([post_save, post_delete], sender=Gare)
+def invalider_index_gares(sender, instance, **kwargs):
+    """L'index est reconstruit (dans chaque processus) à la prochaine recherche"""
+    index_gares.invalider()
@@ -1,8 +1,12 @@
 """
 Locations viewsets
 """
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.db.models import Count, Q
 from django_filters.rest_framework import DjangoFilterBackend
+from .proximite import gares_proches
 from .models import Pays, Ville, Quartier, Gare
 from .serializers import (
     PaysSerializer, VilleSerializer, QuartierSerializer,
@@ -14,46 +18,55 @@ class PaysViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les Pays
     """
-    queryset = Pays.objects.filter(is_active=True)
+    queryset = Pays.actifs.annotate(
+        nombre_villes=Count('villes', filter=Q(villes__is_active=True))
+    )
     serializer_class = PaysSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['code']
     search_fields = ['nom', 'code']
     ordering_fields = ['nom', 'created_at']
     ordering = ['nom']
+    budget_requetes = {'list': 4, 'retrieve': 3, '*': 8}
 
 
 class VilleViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les Villes
     """
-    queryset = Ville.objects.filter(is_active=True).select_related('pays')
+    queryset = Ville.actifs.select_related('pays').annotate(
+        nombre_quartiers=Count('quartiers', filter=Q(quartiers__is_active=True))
+    )
     serializer_class = VilleSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['pays']
     search_fields = ['nom']
     ordering_fields = ['nom', 'population', 'created_at']
     ordering = ['nom']
+    budget_requetes = {'list': 4, 'retrieve': 3, '*': 8}
 
 
 class QuartierViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les Quartiers
     """
-    queryset = Quartier.objects.filter(is_active=True).select_related('ville', 'ville__pays')
+    queryset = Quartier.actifs.select_related('ville', 'ville__pays').annotate(
+        nombre_gares=Count('gares', filter=Q(gares__is_active=True))
+    )
     serializer_class = QuartierSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['ville']
     search_fields = ['nom']
     ordering_fields = ['nom', 'created_at']
     ordering = ['nom']
+    budget_requetes = {'list': 4, 'retrieve': 3, '*': 8}
 
 
 class GareViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les Gares
     """
-    queryset = Gare.objects.filter(is_active=True).select_related(
+    queryset = Gare.actifs.select_related(
         'quartier', 'quartier__ville', 'quartier__ville__pays'
     )
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -61,8 +74,55 @@ class GareViewSet(viewsets.ModelViewSet):
     search_fields = ['nom', 'adresse']
     ordering_fields = ['nom', 'created_at']
     ordering = ['nom']
+    budget_requetes = {'list': 4, 'retrieve': 4, 'proches': 3, 'nearby': 3, '*': 8}
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return GareDetailSerializer
         return GareSerializer
+    
+    @action(detail=False, methods=['get'])
+    def proches(self, request):
+        """
+        Gares les plus proches d'une position
+        
+        Paramètres : lat, lon, k (nombre de gares, défaut 5, max 50),
+        rayon_km (optionnel)
+        """
+        try:
+            latitude = float(request.query_params['lat'])
+            longitude = float(request.query_params['lon'])
+            k = int(request.query_params.get('k', 5))
+            rayon_km = request.query_params.get('rayon_km')
+            rayon_km = float(rayon_km) if rayon_km else None
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'lat et lon requis (nombres), k entier, rayon_km nombre'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return Response(
+                {'error': 'Coordonnées hors limites'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if rayon_km is not None and not rayon_km > 0:
+            return Response(
+                {'error': 'rayon_km doit être strictement positif'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        voisins = gares_proches(latitude, longitude, k=max(1, min(k, 50)), rayon_km=rayon_km)
+        gares = self.get_queryset().in_bulk([gare_id for gare_id, _ in voisins])
+        
+        resultats = []
+        for gare_id, distance in voisins:
+            if gare_id in gares:
+                data = GareSerializer(gares[gare_id]).data
+                data['distance_km'] = round(distance, 3)
+                resultats.append(data)
+        return Response(resultats)
+    
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Alias de proches (/gares/nearby/), mêmes paramètres"""
+        return self.proches(request)
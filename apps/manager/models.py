@@ -1,7 +1,7 @@
 from django.db import models
 from apps.users.models import User
 from apps.locations.models import Gare
-import uuid
+from apps.core.utils import nouvel_uuid
 
 class DemandeFonds(models.Model):
     """Demande de transfert de fonds par un responsable de gare"""
@@ -12,7 +12,7 @@ class DemandeFonds(models.Model):
         ('rejetee', 'Rejetée'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=nouvel_uuid, editable=False)
     responsable = models.ForeignKey(User, on_delete=models.CASCADE, related_name='demandes_fonds')
     gare = models.ForeignKey(Gare, on_delete=models.CASCADE, related_name='demandes_fonds')
     montant = models.DecimalField(max_digits=10, decimal_places=2)
@@ -33,7 +33,7 @@ class DemandeFonds(models.Model):
 class MembreGare(models.Model):
     """Association entre un utilisateur et une gare (pour la gestion des membres)"""
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=nouvel_uuid, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='gares_associees')
     gare = models.ForeignKey(Gare, on_delete=models.CASCADE, related_name='membres')
     date_ajout = models.DateTimeField(auto_now_add=True)
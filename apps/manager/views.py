@@ -1,11 +1,13 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from .models import DemandeFonds, MembreGare
 from .serializers import DemandeSerializer, MembreGareSerializer
-from apps.users.models import User
+from apps.users.models import Role, User
+from apps.users.portee import portee_de
 from apps.locations.models import Gare
 
 
@@ -13,20 +15,27 @@ class DemandeViewSet(viewsets.ModelViewSet):
     """ViewSet pour les demandes de fonds"""
     serializer_class = DemandeSerializer
     permission_classes = [IsAuthenticated]
+    budget_requetes = {'list': 4, 'retrieve': 4, '*': 10}
     
     def get_queryset(self):
-        user = self.request.user
-        # Si responsable, voir seulement ses demandes
-        if user.role and user.role.nom.lower() == 'responsable':
-            return DemandeFonds.objects.filter(responsable=user)
+        portee = portee_de(self.request.user)
+        # Si responsable (gérant), voir seulement ses demandes
+        if portee.role == Role.GERANT:
+            return DemandeFonds.objects.filter(responsable_id=portee.user_id)
         # Si admin, voir toutes les demandes
-        return DemandeFonds.objects.all()
+        if portee.voit_tout:
+            return DemandeFonds.objects.all()
+        return DemandeFonds.objects.none()
     
     def perform_create(self, serializer):
-        # Le responsable crée la demande pour sa gare
+        # Le responsable crée la demande pour sa gare principale (en cache, invalidée
+        # quand ses affectations changent ; le claim du jeton peut être ancien)
+        gare_id = portee_de(self.request.user).gare_principale
+        if gare_id is None:
+            raise ValidationError({'gare': 'Aucune gare principale affectée à cet utilisateur'})
         serializer.save(
             responsable=self.request.user,
-            gare=self.request.user.gare
+            gare_id=gare_id
         )
     
     @action(detail=True, methods=['post'])
@@ -54,14 +63,17 @@ class MembreGareViewSet(viewsets.ModelViewSet):
     """ViewSet pour la gestion des membres de gare"""
     serializer_class = MembreGareSerializer
     permission_classes = [IsAuthenticated]
+    budget_requetes = {'list': 4, 'retrieve': 4, '*': 10}
     
     def get_queryset(self):
-        user = self.request.user
-        # Si responsable, voir seulement les membres de sa gare
-        if user.role and user.role.nom.lower() == 'responsable' and user.gare:
-            return MembreGare.objects.filter(gare=user.gare)
+        portee = portee_de(self.request.user)
+        # Si responsable (gérant), voir seulement les membres de ses gares
+        if portee.role == Role.GERANT:
+            return MembreGare.objects.filter(portee.filtre_gares('gare'))
         # Si admin, voir tous les membres
-        return MembreGare.objects.all()
+        if portee.voit_tout:
+            return MembreGare.objects.all()
+        return MembreGare.objects.none()
     
     def create(self, request, *args, **kwargs):
         """Ajouter un membre à la gare"""
@@ -1,8 +1,31 @@
 """
 Parcels admin
 """
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from .models import Colis, Livraison, HistoriqueEtat
+from . import transitions
+
+
+class StatutAdminForm(forms.ModelForm):
+    """Refuse les changements de statut interdits par la machine à états"""
+    machine = None
+    
+    def clean_statut(self):
+        statut = self.cleaned_data['statut']
+        if self.instance.pk and statut != self.initial.get('statut'):
+            erreur = self.machine.verifier(self.initial.get('statut'), statut)
+            if erreur:
+                raise forms.ValidationError(erreur)
+        return statut
+
+
+class ColisAdminForm(StatutAdminForm):
+    machine = transitions.machine_colis
+
+
+class LivraisonAdminForm(StatutAdminForm):
+    machine = transitions.machine_livraison
 
 
 @admin.register(Colis)
@@ -17,7 +40,8 @@ class ColisAdmin(admin.ModelAdmin):
     ordering = ['-date_expedition']
     date_hierarchy = 'date_expedition'
     readonly_fields = ['code_suivi', 'date_expedition', 'created_at', 'updated_at']
-    
+    form = ColisAdminForm
+    actions = ['marquer_en_cours', 'marquer_arrives']
     fieldsets = (
         ('Informations de base', {
             'fields': ('code_suivi', 'description', 'poids', 'valeur_declaree')
@@ -45,6 +69,47 @@ class ColisAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def save_model(self, request, obj, form, change):
+        # Le statut passe par la machine à états (dates + historique)
+        if not change:
+            super().save_model(request, obj, form, change)
+            transitions.historique_creation(obj, utilisateur=request.user)
+            return
+        nouveau_statut = obj.statut
+        obj.statut = form.initial.get('statut', nouveau_statut)
+        super().save_model(request, obj, form, change)
+        if nouveau_statut != obj.statut:
+            transitions.changer_statut_colis(
+                obj, nouveau_statut,
+                utilisateur=request.user,
+                commentaire="Modifié depuis l'administration"
+            )
+    
+    def _changer_statut(self, request, queryset, statut):
+        resultats = transitions.changer_statut_en_masse(
+            [str(pk) for pk in queryset.values_list('pk', flat=True)],
+            statut,
+            utilisateur=request.user,
+            commentaire="Modifié depuis l'administration",
+            queryset=Colis.objects.all()
+        )
+        modifies = sum(1 for resultat in resultats if resultat['succes'])
+        self.message_user(request, f'{modifies} colis mis à jour')
+        if modifies < len(resultats):
+            self.message_user(
+                request,
+                f'{len(resultats) - modifies} colis ignorés (transition interdite)',
+                messages.WARNING
+            )
+    
+    @admin.action(description='Marquer en cours de transport')
+    def marquer_en_cours(self, request, queryset):
+        self._changer_statut(request, queryset, Colis.EN_COURS)
+    
+    @admin.action(description='Marquer arrivés à destination')
+    def marquer_arrives(self, request, queryset):
+        self._changer_statut(request, queryset, Colis.ARRIVE)
 
 
 @admin.register(Livraison)
@@ -58,6 +123,17 @@ class LivraisonAdmin(admin.ModelAdmin):
     ordering = ['-date_assignation']
     date_hierarchy = 'date_assignation'
     autocomplete_fields = ['colis', 'livreur']
+    form = LivraisonAdminForm
+    
+    def save_model(self, request, obj, form, change):
+        # Le statut passe par la machine à états (dates + statut du colis)
+        if not change:
+            return super().save_model(request, obj, form, change)
+        nouveau_statut = obj.statut
+        obj.statut = form.initial.get('statut', nouveau_statut)
+        super().save_model(request, obj, form, change)
+        if nouveau_statut != obj.statut:
+            transitions.changer_statut_livraison(obj, nouveau_statut, utilisateur=request.user)
 
 
 @admin.register(HistoriqueEtat)
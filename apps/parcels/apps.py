@@ -5,3 +5,6 @@ class ParcelsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.parcels'
     verbose_name = 'Parcels'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -4,7 +4,8 @@ Commande pour charger les colis de test
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
-from apps.parcels.models import Colis, Livraison, HistoriqueEtat
+from apps.parcels.models import Colis, Livraison
+from apps.parcels.transitions import historique_creation
 from apps.users.models import User
 from apps.locations.models import Gare
 
@@ -162,12 +163,9 @@ class Command(BaseCommand):
                 self.stdout.write(f'  + Colis: {colis.code_suivi} - {colis.get_statut_display()}')
                 
                 # Créer l'historique initial
-                HistoriqueEtat.objects.create(
-                    colis=colis,
-                    ancien_statut=None,
-                    nouveau_statut=colis.statut,
-                    commentaire=f"Colis créé - {colis.get_statut_display()}",
-                    localisation=colis.gare_depart
+                historique_creation(
+                    colis,
+                    commentaire=f"Colis créé - {colis.get_statut_display()}"
                 )
         
         self.stdout.write(f'✓ Colis créés: {len(colis_crees)}')
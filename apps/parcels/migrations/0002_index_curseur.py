@@ -0,0 +1,21 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parcels', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='colis',
+            index=models.Index(fields=['date_expedition', 'id'], name='parcels_colis_curseur_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiqueetat',
+            index=models.Index(fields=['created_at', 'id'], name='parcels_historique_curseur_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:24
+
+import apps.core.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parcels', '0002_index_curseur'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='colis',
+            name='id',
+            field=models.UUIDField(default=apps.core.utils.nouvel_uuid, editable=False, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='historiqueetat',
+            name='id',
+            field=models.UUIDField(default=apps.core.utils.nouvel_uuid, editable=False, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='livraison',
+            name='id',
+            field=models.UUIDField(default=apps.core.utils.nouvel_uuid, editable=False, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+    ]
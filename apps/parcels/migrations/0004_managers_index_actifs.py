@@ -0,0 +1,41 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parcels', '0003_uuid_ordonnes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='colis',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['statut', '-date_expedition'], name='parcels_colis_statut_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='colis',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['gare_depart', 'statut'], name='parcels_colis_gdep_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='colis',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['gare_arrivee', 'statut'], name='parcels_colis_garr_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='colis',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['expediteur', '-date_expedition'], name='parcels_colis_exp_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiqueetat',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['colis', '-created_at'], name='parcels_hist_colis_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livraison',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['livreur', 'statut'], name='parcels_livr_livreur_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livraison',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['statut', '-date_assignation'], name='parcels_livr_statut_actif_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parcels', '0004_managers_index_actifs'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='colis',
+            name='parcels_colis_gdep_actif_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='colis',
+            name='parcels_colis_garr_actif_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='livraison',
+            name='parcels_livr_livreur_actif_idx',
+        ),
+        migrations.AddIndex(
+            model_name='colis',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['gare_depart', 'statut', '-date_expedition'], name='parcels_colis_gdep_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='colis',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['gare_arrivee', 'statut', '-date_expedition'], name='parcels_colis_garr_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livraison',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['livreur', 'statut', '-date_assignation'], name='parcels_livr_livreur_actif_idx'),
+        ),
+    ]
@@ -131,6 +131,31 @@ class Colis(BaseModel):
         verbose_name = "Colis"
         verbose_name_plural = "Colis"
         ordering = ['-date_expedition']
+        indexes = [
+            # Pagination par curseur (apps.core.pagination)
+            models.Index(fields=['date_expedition', 'id'], name='parcels_colis_curseur_idx'),
+            # Index partiels : seules les lignes actives sont indexées
+            models.Index(
+                fields=['statut', '-date_expedition'],
+                condition=models.Q(is_active=True),
+                name='parcels_colis_statut_actif_idx',
+            ),
+            models.Index(
+                fields=['gare_depart', 'statut', '-date_expedition'],
+                condition=models.Q(is_active=True),
+                name='parcels_colis_gdep_actif_idx',
+            ),
+            models.Index(
+                fields=['gare_arrivee', 'statut', '-date_expedition'],
+                condition=models.Q(is_active=True),
+                name='parcels_colis_garr_actif_idx',
+            ),
+            models.Index(
+                fields=['expediteur', '-date_expedition'],
+                condition=models.Q(is_active=True),
+                name='parcels_colis_exp_actif_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.code_suivi} - {self.get_statut_display()}"
@@ -222,6 +247,19 @@ class Livraison(BaseModel):
         verbose_name = "Livraison"
         verbose_name_plural = "Livraisons"
         ordering = ['-created_at']
+        indexes = [
+            # Index partiels : seules les lignes actives sont indexées
+            models.Index(
+                fields=['livreur', 'statut', '-date_assignation'],
+                condition=models.Q(is_active=True),
+                name='parcels_livr_livreur_actif_idx',
+            ),
+            models.Index(
+                fields=['statut', '-date_assignation'],
+                condition=models.Q(is_active=True),
+                name='parcels_livr_statut_actif_idx',
+            ),
+        ]
     
     def __str__(self):
         livreur_nom = self.livreur.nom_complet if self.livreur else "Non assigné"
@@ -274,6 +312,16 @@ class HistoriqueEtat(BaseModel):
         verbose_name = "Historique d'état"
         verbose_name_plural = "Historiques d'état"
         ordering = ['-created_at']
+        indexes = [
+            # Pagination par curseur (apps.core.pagination)
+            models.Index(fields=['created_at', 'id'], name='parcels_historique_curseur_idx'),
+            # Index partiel : historique actif d'un colis
+            models.Index(
+                fields=['colis', '-created_at'],
+                condition=models.Q(is_active=True),
+                name='parcels_hist_colis_actif_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.colis.code_suivi} - {self.get_nouveau_statut_display()}"
@@ -2,7 +2,9 @@
 Parcels serializers
 """
 from rest_framework import serializers
+from apps.locations.models import Gare
 from .models import Colis, Livraison, HistoriqueEtat
+from .transitions import machine_colis, machine_livraison
 
 
 class HistoriqueEtatSerializer(serializers.ModelSerializer):
@@ -60,6 +62,14 @@ class LivraisonSerializer(serializers.ModelSerializer):
             'created_at', 'is_active'
         ]
         read_only_fields = ['id', 'created_at']
+    
+    def validate_statut(self, value):
+        """En modification, le nouveau statut doit respecter la machine à états"""
+        if self.instance is not None and value != self.instance.statut:
+            erreur = machine_livraison.verifier(self.instance.statut, value)
+            if erreur:
+                raise serializers.ValidationError(erreur)
+        return value
 
 
 class ColisSerializer(serializers.ModelSerializer):
@@ -96,6 +106,14 @@ class ColisSerializer(serializers.ModelSerializer):
             'notes', 'created_at', 'is_active'
         ]
         read_only_fields = ['id', 'code_suivi', 'date_expedition', 'created_at']
+    
+    def validate_statut(self, value):
+        """En modification, le nouveau statut doit respecter la machine à états"""
+        if self.instance is not None and value != self.instance.statut:
+            erreur = machine_colis.verifier(self.instance.statut, value)
+            if erreur:
+                raise serializers.ValidationError(erreur)
+        return value
 
 
 class ColisDetailSerializer(ColisSerializer):
@@ -123,3 +141,22 @@ class ColisTrackingSerializer(serializers.ModelSerializer):
             'date_arrivee_reelle', 'date_livraison',
             'historique'
         ]
+
+
+class ChangementStatutMasseSerializer(serializers.Serializer):
+    """Serializer pour le changement de statut d'un lot de colis"""
+    colis = serializers.ListField(
+        child=serializers.CharField(max_length=50),
+        allow_empty=False,
+        max_length=1000,
+        help_text="Codes de suivi ou identifiants des colis"
+    )
+    statut = serializers.ChoiceField(choices=Colis.STATUT_CHOICES)
+    commentaire = serializers.CharField(required=False, allow_blank=True, default='')
+    localisation = serializers.PrimaryKeyRelatedField(
+        queryset=Gare.actifs.all(),
+        required=False,
+        allow_null=True,
+        default=None,
+        help_text="Gare où a lieu le changement (par défaut la gare d'arrivée du colis)"
+    )
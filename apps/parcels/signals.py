@@ -0,0 +1,26 @@
+"""
+Parcels signals - Invalidation du cache de tracking
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Colis, HistoriqueEtat
+from .tracking import invalider_tracking
+
+
+@receiver([post_save, post_delete], sender=Colis)
+def invalider_tracking_colis(sender, instance, **kwargs):
+    """Un colis créé, modifié ou supprimé rend son tracking obsolète"""
+    invalider_tracking(instance.code_suivi)
+
+
+@receiver([post_save, post_delete], sender=HistoriqueEtat)
+def invalider_tracking_historique(sender, instance, **kwargs):
+    """Une nouvelle ligne d'historique modifie le tracking du colis"""
+    # Le colis est déjà chargé quand la ligne vient de apps.parcels.transitions ;
+    # sinon seul son code est lu, sans charger l'objet
+    if HistoriqueEtat.colis.is_cached(instance):
+        code_suivi = instance.colis.code_suivi
+    else:
+        code_suivi = Colis.objects.filter(pk=instance.colis_id).values_list('code_suivi', flat=True).first()
+    invalider_tracking(code_suivi)
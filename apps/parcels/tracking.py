@@ -0,0 +1,100 @@
+"""
+Parcels tracking - Modèle de lecture du tracking public mis en cache
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Colis, HistoriqueEtat
+
+
+CLE_TRACKING = 'parcels:tracking:{}:{}'
+CLE_VERSION = 'parcels:tracking:version:{}'
+
+
+def _empreinte(code_suivi):
+    """Empreinte du code (hachée car le code vient d'une requête publique)"""
+    return hashlib.sha1(code_suivi.encode('utf-8')).hexdigest()
+
+
+def _version(empreinte):
+    """
+    Version courante du tracking d'un code, incrémentée à chaque modification.
+    Une version absente (jamais lue ou évincée) repart d'un horodatage : elle
+    ne retombe pas sur une ancienne version encore en cache.
+    """
+    cle = CLE_VERSION.format(empreinte)
+    version = cache.get(cle)
+    if version is None:
+        cache.add(cle, time.time_ns() // 1000, settings.TRACKING_CACHE_TIMEOUT)
+        version = cache.get(cle)
+    return version
+
+
+def construire_tracking(code_suivi):
+    """
+    Construit le payload de tracking depuis la base.
+    Retourne {'data': ..., 'etag': ...}, avec data=None si le colis est inconnu.
+    """
+    from .serializers import ColisTrackingSerializer
+
+    historique = HistoriqueEtat.objects.select_related('utilisateur', 'localisation')
+    try:
+        colis = Colis.objects.select_related('gare_depart', 'gare_arrivee').prefetch_related(
+            Prefetch('historique', queryset=historique)
+        ).get(code_suivi=code_suivi)
+    except Colis.DoesNotExist:
+        return {'data': None, 'etag': None}
+
+    # Données JSON "pures" pour être indépendant du backend de cache
+    contenu = json.dumps(
+        ColisTrackingSerializer(colis).data,
+        cls=JSONEncoder,
+        sort_keys=True
+    )
+    etag = '"{}"'.format(hashlib.sha1(contenu.encode('utf-8')).hexdigest())
+    return {'data': json.loads(contenu), 'etag': etag}
+
+
+def obtenir_tracking(code_suivi):
+    """
+    Retourne le payload de tracking, depuis le cache si possible.
+
+    Le payload est rangé sous la version lue avant la construction : si le
+    colis change pendant la construction, la version est incrémentée et le
+    payload périmé n'est plus jamais relu. Un code inconnu n'est gardé que
+    TRACKING_CACHE_TIMEOUT_INCONNU secondes (colis créé entre-temps).
+    """
+    empreinte = _empreinte(code_suivi)
+    cle = CLE_TRACKING.format(empreinte, _version(empreinte))
+    payload = cache.get(cle)
+    if payload is None:
+        payload = construire_tracking(code_suivi)
+        timeout = (
+            settings.TRACKING_CACHE_TIMEOUT if payload['data'] is not None
+            else settings.TRACKING_CACHE_TIMEOUT_INCONNU
+        )
+        if timeout:
+            cache.set(cle, payload, timeout)
+    return payload
+
+
+def invalider_tracking(*codes_suivi):
+    """Incrémente la version des payloads en cache (après le commit de la transaction en cours)"""
+    cles = [CLE_VERSION.format(_empreinte(code)) for code in codes_suivi if code]
+
+    def incrementer():
+        for cle in cles:
+            try:
+                cache.incr(cle)
+            except ValueError:
+                pass  # Version absente : la prochaine lecture en crée une nouvelle
+
+    if cles:
+        transaction.on_commit(incrementer)
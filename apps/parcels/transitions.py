@@ -0,0 +1,260 @@
+"""
+Parcels transitions - Machine à états des colis et des livraisons
+
+Tous les changements de statut passent par ce module (vues, admin,
+commandes de chargement) :
+- les transitions autorisées sont précalculées en un ensemble de couples
+  (ancien, nouveau) : la vérification est un test d'appartenance O(1),
+  y compris pour des milliers de colis dans une opération en masse ;
+- les effets de bord (dates, ligne d'historique, statut du colis lié à
+  une livraison) sont appliqués au même endroit pour tous les appelants.
+
+Le changement de statut d'un lot de colis (déchargement d'un car en gare)
+se fait en une transaction : une lecture des colis, un bulk_update, un
+bulk_create de l'historique, quel que soit le nombre de colis.
+"""
+import uuid
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Colis, Livraison, HistoriqueEtat
+from .tracking import invalider_tracking
+
+
+class TransitionError(Exception):
+    """Changement de statut interdit par la machine à états"""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class MachineEtats:
+    """Table des transitions autorisées d'un modèle à statut"""
+
+    def __init__(self, nom, statut_choices, transitions):
+        self.nom = nom
+        self.statuts = frozenset(statut for statut, _ in statut_choices)
+        self.libelles = dict(statut_choices)
+        self.autorisees = frozenset(
+            (ancien, nouveau)
+            for ancien, cibles in transitions.items()
+            for nouveau in cibles
+        )
+        self.finaux = frozenset(self.statuts - set(transitions))
+
+    def autorise(self, ancien_statut, nouveau_statut):
+        return (ancien_statut, nouveau_statut) in self.autorisees
+
+    def cibles(self, ancien_statut):
+        """Statuts accessibles depuis ancien_statut"""
+        return [statut for statut in self.libelles if self.autorise(ancien_statut, statut)]
+
+    def verifier(self, ancien_statut, nouveau_statut):
+        """Message d'erreur si la transition est interdite, None sinon"""
+        if (ancien_statut, nouveau_statut) in self.autorisees:
+            return None
+        if nouveau_statut not in self.statuts:
+            return 'Statut invalide'
+        if ancien_statut == nouveau_statut:
+            return f'{self.nom} a déjà le statut "{self.libelles[nouveau_statut]}"'
+        if ancien_statut in self.finaux:
+            return f'{self.nom} au statut "{self.libelles[ancien_statut]}" ne peut plus changer de statut'
+        return (
+            f'Transition interdite pour {self.nom.lower()} : '
+            f'"{self.libelles[ancien_statut]}" → "{self.libelles[nouveau_statut]}"'
+        )
+
+
+machine_colis = MachineEtats('Le colis', Colis.STATUT_CHOICES, {
+    Colis.EN_ATTENTE: [Colis.EN_COURS, Colis.PROBLEME, Colis.ANNULE],
+    Colis.EN_COURS: [Colis.ARRIVE, Colis.PROBLEME],
+    # Retrait en gare (livré) ou remise à un livreur
+    Colis.ARRIVE: [Colis.EN_LIVRAISON, Colis.LIVRE, Colis.PROBLEME],
+    # Retour en gare après une tentative de livraison
+    Colis.EN_LIVRAISON: [Colis.LIVRE, Colis.ARRIVE, Colis.PROBLEME],
+    Colis.PROBLEME: [Colis.EN_ATTENTE, Colis.EN_COURS, Colis.ARRIVE, Colis.EN_LIVRAISON, Colis.ANNULE],
+})
+
+machine_livraison = MachineEtats('La livraison', Livraison.STATUT_CHOICES, {
+    Livraison.EN_ATTENTE: [Livraison.ASSIGNEE],
+    # Réassignation à un autre livreur
+    Livraison.ASSIGNEE: [Livraison.ASSIGNEE, Livraison.EN_COURS, Livraison.EN_ATTENTE],
+    Livraison.EN_COURS: [Livraison.LIVREE, Livraison.ECHEC],
+    # Nouvelle tentative après un échec
+    Livraison.ECHEC: [Livraison.EN_ATTENTE, Livraison.ASSIGNEE],
+})
+
+# Effets de bord : date renseignée à l'entrée dans un statut
+DATES_COLIS = {
+    Colis.ARRIVE: 'date_arrivee_reelle',
+    Colis.LIVRE: 'date_livraison',
+}
+DATES_LIVRAISON = {
+    Livraison.ASSIGNEE: 'date_assignation',
+    Livraison.EN_COURS: 'date_debut',
+    Livraison.LIVREE: 'date_fin',
+    Livraison.ECHEC: 'date_fin',
+}
+
+# Statut du colis suivant celui de sa livraison
+COLIS_SELON_LIVRAISON = {
+    Livraison.EN_COURS: Colis.EN_LIVRAISON,
+    Livraison.LIVREE: Colis.LIVRE,
+    Livraison.ECHEC: Colis.PROBLEME,
+}
+
+
+def _preparer_colis(colis, nouveau_statut, utilisateur, commentaire, localisation, maintenant):
+    """
+    Applique la transition en mémoire (statut, dates) et retourne la ligne
+    d'historique correspondante, non enregistrée
+    """
+    historique = HistoriqueEtat(
+        colis=colis,
+        ancien_statut=colis.statut,
+        nouveau_statut=nouveau_statut,
+        utilisateur=utilisateur,
+        commentaire=commentaire,
+        localisation_id=localisation.id if localisation else colis.gare_arrivee_id,
+    )
+    colis.statut = nouveau_statut
+    colis.updated_at = maintenant
+    if nouveau_statut in DATES_COLIS:
+        setattr(colis, DATES_COLIS[nouveau_statut], maintenant)
+    return historique
+
+
+def historique_creation(colis, utilisateur=None, commentaire='Colis créé'):
+    """Ligne d'historique initiale d'un colis qui vient d'être créé"""
+    return HistoriqueEtat.objects.create(
+        colis=colis,
+        ancien_statut=None,
+        nouveau_statut=colis.statut,
+        utilisateur=utilisateur,
+        commentaire=commentaire,
+        localisation=colis.gare_depart
+    )
+
+
+def changer_statut_colis(colis, nouveau_statut, utilisateur=None, commentaire='', localisation=None):
+    """Change le statut d'un colis et écrit l'historique ; lève TransitionError"""
+    erreur = machine_colis.verifier(colis.statut, nouveau_statut)
+    if erreur:
+        raise TransitionError(erreur)
+
+    with transaction.atomic():
+        historique = _preparer_colis(
+            colis, nouveau_statut, utilisateur, commentaire, localisation, timezone.now()
+        )
+        colis.save(update_fields=['statut', 'updated_at', *DATES_COLIS.values()])
+        historique.save()
+    return historique
+
+
+def changer_statut_livraison(livraison, nouveau_statut, utilisateur=None, commentaire='', **champs):
+    """
+    Change le statut d'une livraison (et les champs associés : livreur,
+    signature, raison d'échec...) puis, si besoin, celui de son colis
+    """
+    erreur = machine_livraison.verifier(livraison.statut, nouveau_statut)
+    if erreur:
+        raise TransitionError(erreur)
+
+    maintenant = timezone.now()
+    with transaction.atomic():
+        livraison.statut = nouveau_statut
+        if nouveau_statut in DATES_LIVRAISON:
+            setattr(livraison, DATES_LIVRAISON[nouveau_statut], maintenant)
+        for champ, valeur in champs.items():
+            setattr(livraison, champ, valeur)
+        livraison.save()
+
+        statut_colis = COLIS_SELON_LIVRAISON.get(nouveau_statut)
+        if statut_colis and livraison.colis.statut != statut_colis:
+            changer_statut_colis(
+                livraison.colis, statut_colis,
+                utilisateur=utilisateur,
+                commentaire=commentaire or f'Livraison : {livraison.get_statut_display()}'
+            )
+    return livraison
+
+
+def _separer_references(references):
+    """Sépare les identifiants (UUID) des codes de suivi"""
+    ids, codes = set(), set()
+    for reference in references:
+        try:
+            ids.add(uuid.UUID(reference))
+        except ValueError:
+            codes.add(reference)
+    return ids, codes
+
+
+def changer_statut_en_masse(references, nouveau_statut, utilisateur=None,
+                            commentaire='', localisation=None, queryset=None):
+    """
+    Passe les colis désignés (codes de suivi ou ids) à nouveau_statut.
+
+    Les colis dont la transition est interdite sont ignorés et signalés ;
+    les autres sont modifiés ensemble. Retourne un résultat par référence,
+    dans l'ordre reçu.
+    """
+    if queryset is None:
+        queryset = Colis.actifs.all()
+    ids, codes = _separer_references(references)
+
+    with transaction.atomic():
+        lignes = queryset.select_related(None).select_for_update().filter(
+            Q(id__in=ids) | Q(code_suivi__in=codes)
+        )
+        par_id = {colis.id: colis for colis in lignes}
+        par_code = {colis.code_suivi: colis for colis in par_id.values()}
+
+        maintenant = timezone.now()
+        resultats = []
+        modifies = []
+        historiques = []
+        traites = set()
+        for reference in references:
+            try:
+                colis = par_id.get(uuid.UUID(reference))
+            except ValueError:
+                colis = par_code.get(reference)
+
+            resultat = {'reference': reference, 'succes': False}
+            resultats.append(resultat)
+            if colis is None:
+                resultat['erreur'] = 'Colis non trouvé'
+                continue
+            resultat.update(id=colis.id, code_suivi=colis.code_suivi, ancien_statut=colis.statut)
+            if colis.id in traites:
+                resultat['erreur'] = 'Colis en double dans la requête'
+                continue
+            traites.add(colis.id)
+
+            erreur = machine_colis.verifier(colis.statut, nouveau_statut)
+            if erreur:
+                resultat['erreur'] = erreur
+                continue
+
+            historiques.append(_preparer_colis(
+                colis, nouveau_statut, utilisateur, commentaire, localisation, maintenant
+            ))
+            modifies.append(colis)
+            resultat.update(succes=True, nouveau_statut=nouveau_statut)
+
+        if modifies:
+            # bulk_update / bulk_create n'émettent pas de signaux :
+            # le cache de tracking est invalidé explicitement
+            Colis.objects.bulk_update(
+                modifies,
+                ['statut', 'updated_at', *DATES_COLIS.values()],
+                batch_size=500
+            )
+            HistoriqueEtat.objects.bulk_create(historiques, batch_size=500)
+            invalider_tracking(*(colis.code_suivi for colis in modifies))
+
+    return resultats
@@ -6,19 +6,40 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
+from datetime import datetime, time, timedelta
+from decimal import Decimal
 from .models import Colis, Livraison, HistoriqueEtat
 from .serializers import (
     ColisSerializer, ColisDetailSerializer, ColisTrackingSerializer,
-    LivraisonSerializer, HistoriqueEtatSerializer
+    LivraisonSerializer, HistoriqueEtatSerializer, ChangementStatutMasseSerializer
 )
+from .tracking import obtenir_tracking
+from . import transitions
+from apps.core.identifiants import generer
+from apps.core.pagination import PaginationCurseur
+
+
+# Regroupements disponibles pour ColisViewSet.statistiques
+REPARTITIONS_STATISTIQUES = {
+    'gare_depart': None,
+    'gare_arrivee': None,
+    'jour': TruncDate,
+    'semaine': TruncWeek,
+    'mois': TruncMonth,
+}
 
 
 class ColisViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les Colis
     """
-    queryset = Colis.objects.filter(is_active=True).select_related(
+    queryset = Colis.actifs.select_related(
         'expediteur', 'gare_depart', 'gare_arrivee'
     )
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -26,6 +47,9 @@ class ColisViewSet(viewsets.ModelViewSet):
     search_fields = ['code_suivi', 'destinataire_nom', 'destinataire_telephone']
     ordering_fields = ['date_expedition', 'date_arrivee_prevue', 'prix']
     ordering = ['-date_expedition']
+    pagination_class = PaginationCurseur
+    champ_curseur = 'date_expedition'
+    budget_requetes = {'list': 4, 'retrieve': 6, 'statistiques': 3, 'tracking': 3, 'changer_statut_en_masse': 6, '*': 12}
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -35,22 +59,27 @@ class ColisViewSet(viewsets.ModelViewSet):
         return ColisSerializer
     
     def perform_create(self, serializer):
-        # Générer un code de suivi unique
-        import uuid
-        code_suivi = f"COL-{uuid.uuid4().hex[:8].upper()}"
-        
-        colis = serializer.save(code_suivi=code_suivi)
+        # Code de suivi unique (séquence + chiffre de contrôle)
+        colis = serializer.save(code_suivi=generer('colis'))
         
         # Créer l'historique initial
-        HistoriqueEtat.objects.create(
-            colis=colis,
-            ancien_statut=None,
-            nouveau_statut=colis.statut,
-            utilisateur=self.request.user if self.request.user.is_authenticated else None,
-            commentaire="Colis créé",
-            localisation=colis.gare_depart
+        transitions.historique_creation(
+            colis,
+            utilisateur=self.request.user if self.request.user.is_authenticated else None
         )
     
+    def perform_update(self, serializer):
+        # Le statut passe par la machine à états (dates + historique)
+        nouveau_statut = serializer.validated_data.pop('statut', None)
+        with transaction.atomic():
+            colis = serializer.save()
+            if nouveau_statut and nouveau_statut != colis.statut:
+                transitions.changer_statut_colis(
+                    colis, nouveau_statut,
+                    utilisateur=self.request.user,
+                    commentaire="Modification du colis"
+                )
+    
     @action(detail=True, methods=['post'])
     def changer_statut(self, request, pk=None):
         """Changer le statut d'un colis"""
@@ -58,34 +87,47 @@ class ColisViewSet(viewsets.ModelViewSet):
         nouveau_statut = request.data.get('statut')
         commentaire = request.data.get('commentaire', '')
         
-        if nouveau_statut not in dict(Colis.STATUT_CHOICES):
+        try:
+            transitions.changer_statut_colis(
+                colis, nouveau_statut,
+                utilisateur=request.user,
+                commentaire=commentaire
+            )
+        except transitions.TransitionError as e:
             return Response(
-                {'error': 'Statut invalide'},
+                {'error': e.message},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        ancien_statut = colis.statut
-        colis.statut = nouveau_statut
-        
-        # Mettre à jour les dates selon le statut
-        if nouveau_statut == Colis.ARRIVE:
-            colis.date_arrivee_reelle = timezone.now()
-        elif nouveau_statut == Colis.LIVRE:
-            colis.date_livraison = timezone.now()
+        return Response({'message': 'Statut changé avec succès'})
+    
+    @action(detail=False, methods=['post'])
+    def changer_statut_en_masse(self, request):
+        """
+        Changer le statut d'un lot de colis (déchargement d'un car en gare)
         
-        colis.save()
+        Corps : colis (codes de suivi ou ids), statut, commentaire, localisation.
+        Les colis en erreur sont signalés sans bloquer les autres.
+        """
+        serializer = ChangementStatutMasseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        # Créer l'historique
-        HistoriqueEtat.objects.create(
-            colis=colis,
-            ancien_statut=ancien_statut,
-            nouveau_statut=nouveau_statut,
+        resultats = transitions.changer_statut_en_masse(
+            serializer.validated_data['colis'],
+            serializer.validated_data['statut'],
             utilisateur=request.user,
-            commentaire=commentaire,
-            localisation=colis.gare_arrivee
+            commentaire=serializer.validated_data['commentaire'],
+            localisation=serializer.validated_data['localisation'],
+            queryset=self.get_queryset()
         )
         
-        return Response({'message': 'Statut changé avec succès'})
+        modifies = sum(1 for resultat in resultats if resultat['succes'])
+        return Response({
+            'message': f'{modifies} colis mis à jour',
+            'modifies': modifies,
+            'erreurs': len(resultats) - modifies,
+            'resultats': resultats
+        })
     
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def tracking(self, request):
@@ -98,38 +140,127 @@ class ColisViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            colis = Colis.objects.prefetch_related('historique').get(
-                code_suivi=code_suivi
-            )
-            serializer = ColisTrackingSerializer(colis)
-            return Response(serializer.data)
-        except Colis.DoesNotExist:
+        payload = obtenir_tracking(code_suivi)
+        if payload['data'] is None:
             return Response(
                 {'error': 'Colis non trouvé'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        
+        # Le client renvoie l'ETag reçu : pas de payload si rien n'a changé
+        etag = payload['etag']
+        etags_client = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in etags_client or '*' in etags_client:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(payload['data'])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
     
     @action(detail=False, methods=['get'])
     def statistiques(self, request):
-        """Statistiques des colis"""
-        total = self.queryset.count()
-        par_statut = {}
+        """
+        Statistiques des colis, calculées en une seule requête groupée
         
-        for statut, _ in Colis.STATUT_CHOICES:
-            par_statut[statut] = self.queryset.filter(statut=statut).count()
+        Paramètres optionnels :
+        - date_debut / date_fin : période sur la date d'expédition (AAAA-MM-JJ)
+        - par : gare_depart, gare_arrivee, jour, semaine ou mois
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
         
-        return Response({
-            'total': total,
-            'par_statut': par_statut
-        })
+        # Période (bornes sur la colonne brute pour rester indexable)
+        periode = {}
+        for param, lookup, decalage in [
+            ('date_debut', 'date_expedition__gte', 0),
+            ('date_fin', 'date_expedition__lt', 1),
+        ]:
+            valeur = request.query_params.get(param)
+            if not valeur:
+                continue
+            try:
+                jour = parse_date(valeur)
+            except ValueError:
+                jour = None
+            if jour is None:
+                return Response(
+                    {'error': f'{param} invalide (format AAAA-MM-JJ)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            borne = datetime.combine(jour + timedelta(days=decalage), time.min)
+            queryset = queryset.filter(**{lookup: timezone.make_aware(borne)})
+            periode[param] = valeur
+        
+        par = request.query_params.get('par')
+        if par and par not in REPARTITIONS_STATISTIQUES:
+            return Response(
+                {'error': f"par invalide (choix : {', '.join(REPARTITIONS_STATISTIQUES)})"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        champs = ['statut']
+        annotations = {}
+        if par in ('gare_depart', 'gare_arrivee'):
+            champs += [par, f'{par}__nom']
+        elif par:
+            annotations['periode'] = REPARTITIONS_STATISTIQUES[par]('date_expedition')
+            champs.append('periode')
+        
+        lignes = queryset.annotate(**annotations).values(*champs).annotate(
+            nombre=Count('id'),
+            prix_total=Sum('prix'),
+            montant_paye_total=Sum('montant_paye'),
+        )
+        
+        def compteurs():
+            return {
+                'total': 0,
+                'par_statut': {statut: 0 for statut, _ in Colis.STATUT_CHOICES},
+                'prix_total': Decimal('0'),
+                'montant_paye_total': Decimal('0'),
+            }
+        
+        def cumuler(cible, ligne):
+            cible['total'] += ligne['nombre']
+            cible['par_statut'][ligne['statut']] = cible['par_statut'].get(ligne['statut'], 0) + ligne['nombre']
+            cible['prix_total'] += ligne['prix_total'] or 0
+            cible['montant_paye_total'] += ligne['montant_paye_total'] or 0
+        
+        global_ = compteurs()
+        repartition = {}
+        for ligne in lignes:
+            cumuler(global_, ligne)
+            if not par:
+                continue
+            if par in ('gare_depart', 'gare_arrivee'):
+                cle, libelle = ligne[par], ligne[f'{par}__nom']
+            else:
+                cle = libelle = ligne['periode'].date() if isinstance(ligne['periode'], datetime) else ligne['periode']
+            if cle not in repartition:
+                repartition[cle] = {'cle': cle, 'libelle': libelle, **compteurs()}
+            cumuler(repartition[cle], ligne)
+        
+        data = {
+            'total': global_['total'],
+            'par_statut': global_['par_statut'],
+            'revenus': {
+                'prix_total': global_['prix_total'],
+                'montant_paye_total': global_['montant_paye_total'],
+            },
+        }
+        if periode:
+            data['periode'] = periode
+        if par:
+            data['par'] = par
+            data['repartition'] = sorted(repartition.values(), key=lambda r: str(r['cle']))
+        return Response(data)
 
 
 class LivraisonViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les Livraisons
     """
-    queryset = Livraison.objects.filter(is_active=True).select_related(
+    queryset = Livraison.actifs.select_related(
         'colis', 'livreur'
     )
     serializer_class = LivraisonSerializer
@@ -138,6 +269,18 @@ class LivraisonViewSet(viewsets.ModelViewSet):
     search_fields = ['colis__code_suivi', 'livreur__nom', 'livreur__prenom']
     ordering_fields = ['date_assignation', 'date_fin']
     ordering = ['-date_assignation']
+    budget_requetes = {'list': 4, 'retrieve': 3, 'disponibles': 3, '*': 12}
+    
+    def perform_update(self, serializer):
+        # Le statut passe par la machine à états (dates + statut du colis)
+        nouveau_statut = serializer.validated_data.pop('statut', None)
+        with transaction.atomic():
+            livraison = serializer.save()
+            if nouveau_statut and nouveau_statut != livraison.statut:
+                transitions.changer_statut_livraison(
+                    livraison, nouveau_statut,
+                    utilisateur=self.request.user
+                )
     
     @action(detail=True, methods=['post'])
     def assigner(self, request, pk=None):
@@ -160,10 +303,17 @@ class LivraisonViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        livraison.livreur = livreur
-        livraison.statut = Livraison.ASSIGNEE
-        livraison.date_assignation = timezone.now()
-        livraison.save()
+        try:
+            transitions.changer_statut_livraison(
+                livraison, Livraison.ASSIGNEE,
+                utilisateur=request.user,
+                livreur=livreur
+            )
+        except transitions.TransitionError as e:
+            return Response(
+                {'error': e.message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({'message': 'Livreur assigné avec succès'})
     
@@ -171,13 +321,18 @@ class LivraisonViewSet(viewsets.ModelViewSet):
     def demarrer(self, request, pk=None):
         """Démarrer la livraison"""
         livraison = self.get_object()
-        livraison.statut = Livraison.EN_COURS
-        livraison.date_debut = timezone.now()
-        livraison.save()
         
-        # Mettre à jour le colis
-        livraison.colis.statut = Colis.EN_LIVRAISON
-        livraison.colis.save()
+        # Le colis passe "en cours de livraison" avec la livraison
+        try:
+            transitions.changer_statut_livraison(
+                livraison, Livraison.EN_COURS,
+                utilisateur=request.user
+            )
+        except transitions.TransitionError as e:
+            return Response(
+                {'error': e.message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({'message': 'Livraison démarrée'})
     
@@ -187,27 +342,29 @@ class LivraisonViewSet(viewsets.ModelViewSet):
         livraison = self.get_object()
         succes = request.data.get('succes', True)
         
-        livraison.date_fin = timezone.now()
-        
-        if succes:
-            livraison.statut = Livraison.LIVREE
-            livraison.signature_destinataire = request.data.get('signature', '')
-            livraison.photo_livraison = request.data.get('photo', '')
-            livraison.commentaire_livreur = request.data.get('commentaire', '')
-            
-            # Mettre à jour le colis
-            livraison.colis.statut = Colis.LIVRE
-            livraison.colis.date_livraison = timezone.now()
-            livraison.colis.save()
-        else:
-            livraison.statut = Livraison.ECHEC
-            livraison.raison_echec = request.data.get('raison', '')
-            
-            # Mettre à jour le colis
-            livraison.colis.statut = Colis.PROBLEME
-            livraison.colis.save()
-        
-        livraison.save()
+        # Le colis passe "livré" ou "problème" avec la livraison (historique compris)
+        try:
+            if succes:
+                transitions.changer_statut_livraison(
+                    livraison, Livraison.LIVREE,
+                    utilisateur=request.user,
+                    signature_destinataire=request.data.get('signature', ''),
+                    photo_livraison=request.data.get('photo', ''),
+                    commentaire_livreur=request.data.get('commentaire', '')
+                )
+            else:
+                raison = request.data.get('raison', '')
+                transitions.changer_statut_livraison(
+                    livraison, Livraison.ECHEC,
+                    utilisateur=request.user,
+                    commentaire=raison,
+                    raison_echec=raison
+                )
+        except transitions.TransitionError as e:
+            return Response(
+                {'error': e.message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({'message': 'Livraison terminée'})
     
@@ -223,7 +380,7 @@ class HistoriqueEtatViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet pour l'Historique (lecture seule)
     """
-    queryset = HistoriqueEtat.objects.filter(is_active=True).select_related(
+    queryset = HistoriqueEtat.actifs.select_related(
         'colis', 'utilisateur', 'localisation'
     )
     serializer_class = HistoriqueEtatSerializer
@@ -231,3 +388,6 @@ class HistoriqueEtatViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['colis', 'nouveau_statut']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    pagination_class = PaginationCurseur
+    champ_curseur = 'created_at'
+    budget_requetes = {'list': 4, 'retrieve': 3}
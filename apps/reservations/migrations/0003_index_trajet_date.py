@@ -0,0 +1,17 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0002_uuid_ordonnes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['trajet', '-date_reservation'], name='reservations_trajet_date_idx'),
+        ),
+    ]
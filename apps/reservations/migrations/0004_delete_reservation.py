@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Les réservations sont reprises dans trips.Reservation (trips 0010)"""
+
+    dependencies = [
+        ('reservations', '0003_index_trajet_date'),
+        ('trips', '0010_fusion_reservations'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='Reservation',
+        ),
+    ]
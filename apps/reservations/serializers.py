@@ -1,31 +1,74 @@
 from rest_framework import serializers
 from .models import Reservation
-from apps.users.serializers import UserSerializer
+from apps.trips import allocation, billets
 from apps.trips.serializers import TrajetSerializer
+from apps.users.models import User
+from apps.users.serializers import UserSerializer
+
+
+# Statuts de trips.Reservation tels que cette API les a toujours renvoyés
+STATUTS_HERITES = {
+    'en_attente': 'en_attente',
+    'confirmee': 'confirme',
+    'payee': 'confirme',
+    'validee': 'valide',
+    'annulee': 'annule',
+}
+
+
+class StatutHeriteField(serializers.ReadOnlyField):
+    """Statut dans le vocabulaire de l'API /api/v1/reservations/"""
+    
+    def to_representation(self, value):
+        return STATUTS_HERITES.get(value, value)
 
 
 class ReservationSerializer(serializers.ModelSerializer):
     client = UserSerializer(read_only=True)
     trajet = TrajetSerializer(read_only=True)
+    # Changements de statut par les actions (valider, confirmer, annuler) : l'annulation libère le siège
+    statut = StatutHeriteField()
     valide_par_nom = serializers.CharField(source='valide_par.nomComplet', read_only=True)
+    code_billet = serializers.SerializerMethodField()
     
     class Meta:
         model = Reservation
         fields = [
-            'id', 'numero_ticket', 'client', 'trajet', 'statut', 'prix',
-            'date_reservation', 'date_validation', 'valide_par', 'valide_par_nom'
+            'id', 'numero_ticket', 'client', 'trajet', 'numero_siege', 'statut', 'prix',
+            'date_reservation', 'date_validation', 'valide_par', 'valide_par_nom', 'code_billet'
         ]
-        read_only_fields = ['id', 'numero_ticket', 'date_reservation', 'date_validation']
+        read_only_fields = [
+            'id', 'numero_ticket', 'numero_siege', 'date_reservation', 'date_validation', 'valide_par'
+        ]
+    
+    def get_code_billet(self, obj):
+        """Code signé du QR code, pour le client de la réservation et les agents (aucun si annulée)"""
+        request = self.context.get('request')
+        return billets.code_billet_pour(obj, request.user if request else None)
 
 
 class ReservationCreateSerializer(serializers.ModelSerializer):
-    """Serializer pour créer une réservation"""
+    """Serializer pour créer une réservation (au prix de base du trajet)"""
     
     class Meta:
         model = Reservation
         fields = ['trajet', 'prix']
+        read_only_fields = ['prix']
     
     def create(self, validated_data):
-        # Le client est l'utilisateur connecté
-        validated_data['client'] = self.context['request'].user
-        return super().create(validated_data)
+        # Le client est l'utilisateur connecté ; sa place est réservée comme au guichet
+        client = User.objects.only('nom', 'prenom', 'telephone', 'email').get(
+            pk=self.context['request'].user.pk
+        )
+        passager = {
+            'client': client,
+            'client_telephone': str(client.telephone),
+            'client_nom': client.nom,
+            'client_prenom': client.prenom,
+            'client_email': client.email or None,
+        }
+        
+        try:
+            return allocation.reserver(validated_data['trajet'].id, [passager])[0]
+        except allocation.AllocationError as e:
+            raise serializers.ValidationError({'error': e.message})
@@ -1,15 +1,26 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.utils import timezone
+from apps.trips import allocation
+from apps.users.permissions import EstAgentGare, EstStaff
+from apps.users.portee import portee_de
 from .models import Reservation
 from .serializers import ReservationSerializer, ReservationCreateSerializer
 
 
 class ReservationViewSet(viewsets.ModelViewSet):
-    """ViewSet pour les réservations/tickets"""
+    """
+    ViewSet pour les réservations/tickets des clients connectés
+    
+    Même table que /api/v1/trips/reservations/ (trips.Reservation) : les
+    places sont prises et libérées par apps.trips.allocation. Modification
+    et suppression (annulation) sont réservées au staff, confirmation et
+    validation aux agents des gares du trajet.
+    """
     permission_classes = [IsAuthenticated]
+    budget_requetes = {'list': 4, 'retrieve': 4, 'par_trajet': 4, '*': 12}
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -17,38 +28,48 @@ class ReservationViewSet(viewsets.ModelViewSet):
         return ReservationSerializer
     
     def get_queryset(self):
-        user = self.request.user
-        
-        # Client : voir seulement ses réservations
-        if user.role and user.role.nom.lower() == 'client':
-            return Reservation.objects.filter(client=user)
-        
-        # Responsable/Guichetier : voir les réservations de leur gare
-        if user.role and user.role.nom.lower() in ['responsable', 'guichetier']:
-            if user.gare:
-                return Reservation.objects.filter(
-                    trajet__gare_depart=user.gare
-                ) | Reservation.objects.filter(
-                    trajet__gare_arrivee=user.gare
-                )
-        
-        # Admin : voir toutes les réservations
-        return Reservation.objects.all()
+        # Client : les siennes ; gérant/guichetier : celles des trajets de leurs gares ;
+        # staff/admin : toutes ; anonyme et autres rôles (livreur...) : aucune
+        return Reservation.objects.select_related(
+            'client__role', 'trajet', 'valide_par'
+        ).visibles_par(portee_de(self.request.user))
     
     def get_permissions(self):
         # Liste publique pour voir les réservations disponibles
         if self.action == 'list':
             return [AllowAny()]
+        if self.action in ('update', 'partial_update', 'destroy'):
+            return [IsAuthenticated(), EstStaff()]
+        if self.action in ('valider', 'confirmer'):
+            return [IsAuthenticated(), EstAgentGare()]
         return super().get_permissions()
     
+    def perform_destroy(self, instance):
+        # La réservation est annulée et sa place libérée, pas supprimée (paiement, historique)
+        try:
+            allocation.annuler(instance)
+        except allocation.AllocationError as e:
+            raise ValidationError({'error': e.message})
+    
     @action(detail=True, methods=['post'])
     def valider(self, request, pk=None):
         """Valider un ticket (guichetier/responsable)"""
         reservation = self.get_object()
-        reservation.statut = 'valide'
-        reservation.date_validation = timezone.now()
-        reservation.valide_par = request.user
-        reservation.save()
+        if reservation.statut == 'annulee':
+            return Response(
+                {'error': 'Cette réservation a été annulée.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if reservation.statut == 'validee':
+            return Response(
+                {'error': 'Cette réservation a déjà été validée.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not reservation.valider(par=request.user):
+            return Response(
+                {'error': 'La réservation a été modifiée entre-temps, elle ne peut plus être validée.'},
+                status=status.HTTP_409_CONFLICT
+            )
         serializer = self.get_serializer(reservation)
         return Response(serializer.data)
     
@@ -56,8 +77,16 @@ class ReservationViewSet(viewsets.ModelViewSet):
     def confirmer(self, request, pk=None):
         """Confirmer un ticket (après paiement)"""
         reservation = self.get_object()
-        reservation.statut = 'confirme'
-        reservation.save()
+        if reservation.statut in ('annulee', 'validee'):
+            return Response(
+                {'error': 'Cette réservation ne peut plus être confirmée.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Déjà confirmée ou payée : rien à changer
+        if reservation.statut == 'en_attente':
+            reservation.statut = 'confirmee'
+            reservation.montant_paye = reservation.prix
+            reservation.save(update_fields=['statut', 'montant_paye', 'updated_at'])
         serializer = self.get_serializer(reservation)
         return Response(serializer.data)
     
@@ -65,9 +94,13 @@ class ReservationViewSet(viewsets.ModelViewSet):
     def annuler(self, request, pk=None):
         """Annuler un ticket"""
         reservation = self.get_object()
-        reservation.statut = 'annule'
-        reservation.save()
-        serializer = self.get_serializer(reservation)
+        # Libère la place du trajet
+        try:
+            allocation.annuler(reservation)
+        except allocation.AllocationError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        # Relations relues en une requête (refresh_from_db les a oubliées)
+        serializer = self.get_serializer(self.get_queryset().get(pk=reservation.pk))
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
@@ -3,6 +3,7 @@ Trips admin
 """
 from django.contrib import admin
 from django.utils.html import format_html
+from .allocation import AllocationError, annuler
 from .models import Trajet, Reservation
 
 
@@ -41,6 +42,7 @@ class ReservationAdmin(admin.ModelAdmin):
         'get_client_display',
         'numero_siege',
         'statut',
+        'prix',
         'montant_paye',
         'date_reservation'
     ]
@@ -51,6 +53,7 @@ class ReservationAdmin(admin.ModelAdmin):
     ordering = ['-date_reservation']
     
     readonly_fields = ['created_at', 'updated_at']
+    raw_id_fields = ['trajet', 'client', 'valide_par']
     
     def get_client_display(self, obj):
         return f'{obj.client_prenom} {obj.client_nom}'
@@ -61,8 +64,13 @@ class ReservationAdmin(admin.ModelAdmin):
     @admin.action(description='Valider')
     def valider_reservations(self, request, queryset):
         for res in queryset:
-            res.valider()
+            res.valider(par=request.user)
     
     @admin.action(description='Annuler')
     def annuler_reservations(self, request, queryset):
-        queryset.update(statut='annulee')
\ No newline at end of file
+        # Passe par le service d'allocation pour libérer les places
+        for res in queryset:
+            try:
+                annuler(res)
+            except AllocationError:
+                pass
\ No newline at end of file
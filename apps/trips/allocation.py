@@ -0,0 +1,196 @@
+"""
+Trips allocation - Attribution atomique des sièges
+
+Toutes les réservations et annulations passent par ce module :
+- le compteur Trajet.places_reservees n'est modifié que par des UPDATE
+  conditionnels (F()), jamais par lecture-modification-écriture ;
+- l'UPDATE verrouille la ligne du trajet jusqu'au commit, ce qui sérialise
+  le choix des sièges entre réservations concurrentes du même trajet ;
+- les sièges sont choisis et marqués dans le bitmap Trajet.plan_sieges,
+  sans relire les réservations.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.core.identifiants import generer
+from . import plan_sieges
+from .models import Trajet, Reservation
+
+
+class AllocationError(Exception):
+    """Réservation impossible (trajet complet, siège pris, ...)"""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def generer_numero_ticket():
+    """Numéro de ticket pour les réservations créées sans numéro"""
+    return generer('ticket_trajet')
+
+
+def sieges_occupes(trajet_id):
+    """Numéros de sièges occupés d'après les réservations (non annulées)"""
+    return set(
+        Reservation.objects.filter(trajet_id=trajet_id, numero_siege__isnull=False)
+        .exclude(statut='annulee')
+        .values_list('numero_siege', flat=True)
+    )
+
+
+def reconstruire_plan(trajet_id):
+    """Recalcule le plan des sièges d'un trajet à partir des réservations"""
+    with transaction.atomic():
+        trajet = Trajet.objects.select_for_update().get(id=trajet_id)
+        plan = plan_sieges.depuis_sieges(sieges_occupes(trajet_id), trajet.capacite_max)
+        _enregistrer_plan(trajet_id, plan, trajet.capacite_max)
+    return plan
+
+
+def changer_capacite(trajet_id, capacite_max):
+    """
+    Change la capacité d'un trajet et recalcule son plan ; refuse une
+    capacité inférieure aux places réservées ou au plus grand siège occupé
+    """
+    with transaction.atomic():
+        places_reservees = Trajet.objects.select_for_update().filter(id=trajet_id).values_list(
+            'places_reservees', flat=True
+        ).get()
+        sieges = sieges_occupes(trajet_id)
+        if capacite_max < places_reservees:
+            raise AllocationError(f"{places_reservees} place(s) déjà réservée(s) sur ce trajet.")
+        if sieges and capacite_max < max(sieges):
+            raise AllocationError(f"Le siège {max(sieges)} est réservé sur ce trajet.")
+        plan = plan_sieges.depuis_sieges(sieges, capacite_max)
+        Trajet.objects.filter(id=trajet_id).update(
+            capacite_max=capacite_max,
+            plan_sieges=plan,
+            places_contigues_max=plan_sieges.plus_longue_serie_libre(plan, capacite_max),
+            updated_at=timezone.now(),
+        )
+
+
+def _plan_verrouille(trajet_id, *champs):
+    """Capacité et plan (puis `champs`) d'un trajet dont la ligne est déjà verrouillée"""
+    return Trajet.objects.filter(id=trajet_id).values_list(
+        'capacite_max', 'plan_sieges', *champs
+    ).get()
+
+
+def _enregistrer_plan(trajet_id, plan, capacite_max):
+    """Enregistre le plan et la plus longue série de sièges libres qui en découle"""
+    Trajet.objects.filter(id=trajet_id).update(
+        plan_sieges=plan,
+        places_contigues_max=plan_sieges.plus_longue_serie_libre(plan, capacite_max),
+    )
+
+
+def _choisir_sieges(capacite_max, plan, demandes):
+    """
+    Attribue un siège à chaque passager : le siège demandé s'il est libre,
+    sinon le plus petit numéro libre.
+    """
+    demandes_explicites = [s for s in demandes if s is not None]
+    if len(demandes_explicites) != len(set(demandes_explicites)):
+        raise AllocationError("Le même siège est demandé plusieurs fois.")
+
+    for siege in demandes_explicites:
+        if siege < 1 or siege > capacite_max:
+            raise AllocationError(f"Le siège {siege} n'existe pas sur ce trajet.")
+        if plan_sieges.est_occupe(plan, siege):
+            raise AllocationError(f"Le siège {siege} est déjà réservé.")
+
+    plan = plan_sieges.occuper(plan, demandes_explicites, capacite_max)
+    libres = iter(plan_sieges.sieges_libres(
+        plan, capacite_max, limite=len(demandes) - len(demandes_explicites)
+    ))
+    return [siege if siege is not None else next(libres) for siege in demandes]
+
+
+def reserver(trajet_id, passagers):
+    """
+    Réserve une place par passager sur le trajet, en une seule transaction.
+
+    `passagers` est une liste de dicts avec les champs de Reservation
+    (client_nom, client_prenom, client_telephone, client, ...). `numero_siege`,
+    `numero_ticket` et `prix` sont optionnels : ils sont attribués
+    automatiquement (prix de base du trajet).
+    Retourne les réservations créées ou lève AllocationError.
+    """
+    nombre = len(passagers)
+    if nombre == 0:
+        raise AllocationError("Aucun passager.")
+
+    try:
+        with transaction.atomic():
+            # Incrément conditionnel : échoue si le trajet n'a plus assez de places
+            mis_a_jour = Trajet.objects.filter(
+                id=trajet_id,
+                statut='planifie',
+                places_reservees__lte=F('capacite_max') - nombre
+            ).update(places_reservees=F('places_reservees') + nombre, updated_at=timezone.now())
+
+            if not mis_a_jour:
+                trajet = Trajet.objects.filter(id=trajet_id).first()
+                if trajet is None:
+                    raise AllocationError("Trajet non trouvé.")
+                if trajet.statut != 'planifie':
+                    raise AllocationError("Ce trajet n'est plus ouvert à la réservation.")
+                raise AllocationError(
+                    f"Places insuffisantes ({trajet.places_disponibles} disponible(s))."
+                )
+
+            # La ligne du trajet est verrouillée jusqu'au commit
+            capacite_max, plan, prix_base = _plan_verrouille(trajet_id, 'prix_base')
+            sieges = _choisir_sieges(
+                capacite_max,
+                plan,
+                [p.get('numero_siege') for p in passagers]
+            )
+            _enregistrer_plan(trajet_id, plan_sieges.occuper(plan, sieges, capacite_max), capacite_max)
+
+            reservations = []
+            for passager, siege in zip(passagers, sieges):
+                donnees = dict(passager)
+                donnees['numero_siege'] = siege
+                donnees['numero_ticket'] = donnees.get('numero_ticket') or generer_numero_ticket()
+                donnees.setdefault('prix', prix_base)
+                reservations.append(Reservation(trajet_id=trajet_id, **donnees))
+
+            return Reservation.objects.bulk_create(reservations)
+    except IntegrityError:
+        raise AllocationError("Siège ou numéro de ticket déjà attribué, veuillez réessayer.")
+
+
+def annuler(reservation):
+    """
+    Annule une réservation et libère sa place.
+    Idempotent : une réservation déjà annulée ne libère rien une seconde fois.
+    """
+    if reservation.is_validee:
+        raise AllocationError("Impossible d'annuler une réservation déjà validée.")
+
+    with transaction.atomic():
+        annulee = Reservation.objects.filter(pk=reservation.pk).exclude(
+            statut__in=['annulee', 'validee']
+        ).update(statut='annulee', updated_at=timezone.now())
+
+        # Les réservations reprises sans siège (trajet complet) ne sont pas comptées
+        if annulee and reservation.numero_siege is not None:
+            libere = Trajet.objects.filter(
+                id=reservation.trajet_id,
+                places_reservees__gt=0
+            ).update(places_reservees=F('places_reservees') - 1, updated_at=timezone.now())
+
+            if libere:
+                capacite_max, plan = _plan_verrouille(reservation.trajet_id)
+                _enregistrer_plan(
+                    reservation.trajet_id,
+                    plan_sieges.liberer(plan, [reservation.numero_siege], capacite_max),
+                    capacite_max
+                )
+
+    reservation.refresh_from_db()
+    return reservation
@@ -5,3 +5,6 @@ class TripsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.trips'
     verbose_name = 'Gestion des Trajets'
+    
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,221 @@
+"""
+Trips billets - Billets signés, vérifiables hors ligne
+
+Le QR code d'un billet porte un code compact signé par HMAC-SHA256 :
+
+    version (1 octet) | clé (1) | réservation (16) | trajet (16) | siège (2) | expiration (4) | signature (16)
+
+encodé en base64 URL (75 caractères). Un portique qui connaît la clé
+BILLETS_SIGNING_KEY vérifie le billet sans réseau : signature, trajet
+embarqué et expiration (départ + BILLETS_VALIDITE_HEURES). Il garde ses
+validations et les envoie plus tard en un lot (appliquer_validations).
+
+La clé est propre aux billets : un portique compromis ne doit pas
+permettre de signer autre chose (jetons JWT...). Les billets portent
+l'identifiant de la clé qui les a signés (BILLETS_SIGNING_KEY_ID) : après
+une rotation, l'ancienne clé reste dans BILLETS_SIGNING_KEYS_ANCIENNES le
+temps que ses billets expirent.
+
+Côté serveur, un billet désigne sa réservation par clé primaire : une
+validation en ligne est un UPDATE conditionnel, une synchronisation une
+lecture et un UPDATE par lot de LOT billets. Rejouer une synchronisation
+ne change rien : les billets déjà validés sont seulement comptés. La date
+de validation d'un scan hors ligne est enregistrée à la minute : l'UPDATE
+porte un cas par minute au lieu d'un cas par billet.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from apps.users.portee import portee_de
+
+from .models import Reservation
+
+
+VERSION = 2
+LOT = 1000
+
+_ENTETE = struct.Struct('>BB16s16sHI')
+_TAILLE_SIGNATURE = 16
+
+Billet = namedtuple('Billet', 'reservation_id trajet_id numero_siege expiration')
+
+
+class BilletInvalide(Exception):
+    """Code de billet illisible, falsifié ou expiré"""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def signature_configuree():
+    """Une clé dédiée aux billets est-elle définie ? (vérifié au démarrage, apps.trips.checks)"""
+    cle = settings.BILLETS_SIGNING_KEY
+    return bool(cle) and cle != settings.SECRET_KEY
+
+
+def _cles():
+    """{identifiant: clé} des clés acceptées ; lève ImproperlyConfigured sans clé dédiée"""
+    if not signature_configuree():
+        raise ImproperlyConfigured(
+            'BILLETS_SIGNING_KEY doit être définie et différente de SECRET_KEY.'
+        )
+    cles = dict(settings.BILLETS_SIGNING_KEYS_ANCIENNES)
+    cles[settings.BILLETS_SIGNING_KEY_ID] = settings.BILLETS_SIGNING_KEY
+    if not all(0 <= identifiant <= 255 for identifiant in cles):
+        raise ImproperlyConfigured('Les identifiants de clé des billets vont de 0 à 255.')
+    return cles
+
+
+def _signature(cle, donnees):
+    return hmac.new(cle.encode(), donnees, hashlib.sha256).digest()[:_TAILLE_SIGNATURE]
+
+
+def expiration_billet(trajet):
+    """Fin de validité des billets d'un trajet"""
+    depart = timezone.make_aware(datetime.combine(trajet.date_depart, trajet.heure_depart))
+    return depart + timedelta(hours=settings.BILLETS_VALIDITE_HEURES)
+
+
+def encoder(reservation_id, trajet_id, numero_siege, expiration):
+    """Code signé d'un billet (numero_siege peut être None), avec la clé courante"""
+    identifiant = settings.BILLETS_SIGNING_KEY_ID
+    cle = _cles()[identifiant]
+    donnees = _ENTETE.pack(
+        VERSION, identifiant, reservation_id.bytes, trajet_id.bytes, numero_siege or 0, int(expiration.timestamp())
+    )
+    return base64.urlsafe_b64encode(donnees + _signature(cle, donnees)).rstrip(b'=').decode('ascii')
+
+
+def code_billet(reservation):
+    """Code signé d'une réservation (lit reservation.trajet)"""
+    return encoder(
+        reservation.id, reservation.trajet_id, reservation.numero_siege, expiration_billet(reservation.trajet)
+    )
+
+
+def code_billet_pour(reservation, user):
+    """
+    Code signé si `user` est le client de la réservation ou un agent de gare
+    (staff compris) ; None sinon, si la réservation est annulée ou si la
+    signature des billets n'est pas configurée
+    """
+    if reservation.statut == 'annulee' or not signature_configuree():
+        return None
+    portee = portee_de(user)
+    if portee.est_agent_gare or (not portee.est_anonyme and reservation.client_id == portee.user_id):
+        return code_billet(reservation)
+    return None
+
+
+def lire(code, instant=None):
+    """
+    Vérifie un code et retourne le Billet ; lève BilletInvalide.
+    `instant` : moment du scan (maintenant par défaut), comparé à l'expiration.
+    """
+    try:
+        brut = base64.urlsafe_b64decode(code + '=' * (-len(code) % 4))
+    except (binascii.Error, ValueError):
+        raise BilletInvalide("Code de billet illisible.")
+    if len(brut) != _ENTETE.size + _TAILLE_SIGNATURE:
+        raise BilletInvalide("Code de billet illisible.")
+
+    if not signature_configuree():
+        raise BilletInvalide("Signature des billets non configurée.")
+    donnees, signature = brut[:_ENTETE.size], brut[_ENTETE.size:]
+    version, identifiant, reservation_id, trajet_id, siege, expiration = _ENTETE.unpack(donnees)
+    if version != VERSION:
+        raise BilletInvalide("Version de billet inconnue.")
+    cle = _cles().get(identifiant)
+    if cle is None or not hmac.compare_digest(signature, _signature(cle, donnees)):
+        raise BilletInvalide("Signature du billet invalide.")
+
+    billet = Billet(
+        reservation_id=uuid.UUID(bytes=reservation_id),
+        trajet_id=uuid.UUID(bytes=trajet_id),
+        numero_siege=siege or None,
+        expiration=datetime.fromtimestamp(expiration, tz=dt_timezone.utc),
+    )
+    if (instant or timezone.now()) > billet.expiration:
+        raise BilletInvalide("Billet expiré.")
+    return billet
+
+
+def appliquer_validations(validations, par, reservations=None):
+    """
+    Applique des validations faites hors ligne : liste de (code, date du scan).
+    `reservations` : celles que le portique peut valider (toutes par défaut),
+    les autres sont refusées comme introuvables.
+
+    Chaque billet n'est validé qu'une fois, à la date de son premier scan ;
+    les billets déjà validés (rejeu, autre portique) sont comptés sans être
+    modifiés. Retourne {'validees', 'deja_validees', 'refusees': [{'code', 'erreur'}]}.
+    """
+    if reservations is None:
+        reservations = Reservation.objects.all()
+    maintenant = timezone.now()
+    refusees = []
+    scans = {}
+    for code, date_scan in validations:
+        date_scan = min(date_scan or maintenant, maintenant)
+        try:
+            billet = lire(code, instant=date_scan)
+        except BilletInvalide as e:
+            refusees.append({'code': code, 'erreur': e.message})
+            continue
+        precedent = scans.get(billet.reservation_id)
+        if precedent is None or date_scan < precedent[2]:
+            scans[billet.reservation_id] = (code, billet, date_scan)
+
+    validees = deja_validees = 0
+    ids = list(scans)
+    for debut in range(0, len(ids), LOT):
+        lot = ids[debut:debut + LOT]
+        etats = {
+            id: (trajet_id, statut)
+            for id, trajet_id, statut in reservations.filter(id__in=lot).values_list('id', 'trajet_id', 'statut')
+        }
+
+        a_valider, minutes = [], {}
+        for id in lot:
+            code, billet, date_scan = scans[id]
+            trajet_id, statut = etats.get(id, (None, None))
+            if trajet_id != billet.trajet_id:
+                refusees.append({'code': code, 'erreur': "Ticket non trouvé."})
+            elif statut == 'annulee':
+                refusees.append({'code': code, 'erreur': "Ce ticket a été annulé."})
+            elif statut == 'validee':
+                deja_validees += 1
+            else:
+                a_valider.append(id)
+                minutes.setdefault(date_scan.replace(second=0, microsecond=0), []).append(id)
+
+        if a_valider:
+            # Conditionnel : une validation concurrente n'est pas écrasée
+            mises_a_jour = reservations.filter(
+                id__in=a_valider,
+                statut__in=Reservation.STATUTS_VALIDABLES,
+            ).update(
+                statut='validee',
+                date_validation=Case(
+                    *(When(id__in=ids_minute, then=Value(minute)) for minute, ids_minute in minutes.items()),
+                    output_field=DateTimeField()
+                ),
+                valide_par=par,
+                updated_at=maintenant,
+            )
+            validees += mises_a_jour
+            deja_validees += len(a_valider) - mises_a_jour
+
+    return {'validees': validees, 'deja_validees': deja_validees, 'refusees': refusees}
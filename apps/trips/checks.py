@@ -0,0 +1,19 @@
+"""
+Trips checks - Vérifications au démarrage (manage.py check, runserver, migrate...)
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from .billets import signature_configuree
+
+
+@register(Tags.security)
+def verifier_cle_billets(app_configs, **kwargs):
+    """Les billets signés exigent une clé dédiée, différente de SECRET_KEY"""
+    if signature_configuree():
+        return []
+    message = 'BILLETS_SIGNING_KEY doit être définie et différente de SECRET_KEY.'
+    aide = 'Sans elle, les réservations sont servies sans code_billet et la validation par code échoue.'
+    if settings.DEBUG:
+        return [Warning(message, hint=aide, id='trips.W001')]
+    return [Error(message, hint=aide, id='trips.E001')]
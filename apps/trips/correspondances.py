@@ -0,0 +1,164 @@
+"""
+Trips correspondances - Recherche d'itinéraires avec changements
+
+Les trajets planifiés forment un horaire de "connexions" (départ, arrivée,
+ville, ville) triées par heure de départ. La recherche est un Connection
+Scan Algorithm (CSA) par tours : le tour k contient les meilleures heures
+d'arrivée avec exactement k trajets. Une seule passe sur les connexions
+triées suffit pour obtenir les meilleurs itinéraires de 1 à 3 trajets.
+
+L'horaire est gardé en mémoire (IndexLocal) et mis à jour trajet par
+trajet via les signaux, au lieu d'être reconstruit à chaque requête. Il ne
+contient que les trajets du jour et à venir : les jours passés sont élagués
+à chaque mise à jour, et à chaque reconstruction (INDEX_LOCAL_TIMEOUT).
+"""
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.core.index_local import IndexLocal
+from .models import Trajet
+
+
+Connexion = namedtuple('Connexion', ['depart', 'arrivee', 'origine', 'destination', 'trajet_id'])
+
+
+def connexion_depuis(trajet_id, ville_depart_cle, ville_arrivee_cle, date_depart, heure_depart, duree_estimee):
+    depart = datetime.combine(date_depart, heure_depart)
+    return Connexion(
+        depart=depart,
+        arrivee=depart + timedelta(minutes=max(duree_estimee, 1)),
+        origine=ville_depart_cle,
+        destination=ville_arrivee_cle,
+        trajet_id=trajet_id,
+    )
+
+
+class Horaire:
+    """Connexions triées par départ, modifiables trajet par trajet"""
+
+    def __init__(self, connexions=()):
+        self.connexions = sorted(connexions)
+        self.par_trajet = {c.trajet_id: c for c in self.connexions}
+
+    def elaguer(self, jour):
+        """Retire les connexions parties avant ce jour"""
+        fin = bisect_left(self.connexions, (datetime.combine(jour, datetime.min.time()),))
+        for connexion in self.connexions[:fin]:
+            del self.par_trajet[connexion.trajet_id]
+        del self.connexions[:fin]
+
+    def retirer(self, trajet_id):
+        connexion = self.par_trajet.pop(trajet_id, None)
+        if connexion is not None:
+            del self.connexions[bisect_left(self.connexions, connexion)]
+
+    def mettre_a_jour(self, trajet):
+        """Reflète un trajet créé, modifié ou supprimé"""
+        aujourd_hui = timezone.localdate()
+        self.elaguer(aujourd_hui)
+        self.retirer(trajet.id)
+        if trajet.statut != 'planifie' or trajet.date_depart < aujourd_hui:
+            return
+        connexion = connexion_depuis(
+            trajet.id, trajet.ville_depart_cle, trajet.ville_arrivee_cle,
+            trajet.date_depart, trajet.heure_depart, trajet.duree_estimee
+        )
+        insort(self.connexions, connexion)
+        self.par_trajet[trajet.id] = connexion
+
+    def rechercher(self, origine, destination, depart_min, correspondance_min,
+                   max_trajets=3, horizon=None, exclus=frozenset()):
+        """
+        Meilleurs itinéraires origine -> destination partant après depart_min.
+        Retourne une liste de tuples de connexions, un par nombre de trajets
+        lorsqu'il améliore l'heure d'arrivée (front de Pareto trajets/arrivée).
+        """
+        if origine == destination:
+            return []
+
+        transfert = timedelta(minutes=correspondance_min)
+        fin = depart_min + horizon if horizon else None
+        # arrivees[k][ville] = (heure d'arrivée, connexions utilisées)
+        arrivees = [{origine: (depart_min, ())}] + [{} for _ in range(max_trajets)]
+        # Meilleure arrivée directe : un itinéraire à plusieurs trajets n'est gardé que s'il
+        # arrive avant elle, une connexion qui part après elle ne sert donc à aucun tour
+        meilleure_directe = None
+
+        debut = bisect_left(self.connexions, (depart_min,))
+        for connexion in self.connexions[debut:]:
+            if meilleure_directe is not None and connexion.depart >= meilleure_directe:
+                break
+            if fin is not None and connexion.depart > fin:
+                break
+            if connexion.trajet_id in exclus:
+                continue
+
+            for k in range(max_trajets, 0, -1):
+                precedent = arrivees[k - 1].get(connexion.origine)
+                if precedent is None:
+                    continue
+                pret = precedent[0] if k == 1 else precedent[0] + transfert
+                if connexion.depart < pret:
+                    continue
+                actuel = arrivees[k].get(connexion.destination)
+                if actuel is None or connexion.arrivee < actuel[0]:
+                    arrivees[k][connexion.destination] = (connexion.arrivee, precedent[1] + (connexion,))
+                    if k == 1 and connexion.destination == destination:
+                        meilleure_directe = connexion.arrivee
+
+        itineraires = []
+        for k in range(1, max_trajets + 1):
+            resultat = arrivees[k].get(destination)
+            if resultat and (not itineraires or resultat[0] < itineraires[-1][-1].arrivee):
+                itineraires.append(resultat[1])
+        return itineraires
+
+
+def construire_horaire():
+    """Charge les trajets planifiés à venir"""
+    lignes = Trajet.objects.filter(
+        statut='planifie',
+        date_depart__gte=timezone.localdate()
+    ).values_list(
+        'id', 'ville_depart_cle', 'ville_arrivee_cle',
+        'date_depart', 'heure_depart', 'duree_estimee'
+    )
+    return Horaire(connexion_depuis(*ligne) for ligne in lignes)
+
+
+horaire = IndexLocal('trips:horaire', construire_horaire)
+
+
+def rechercher_itineraires(origine, destination, depart_min, places=1, correspondance_min=None):
+    """
+    Itinéraires de 1 à 3 trajets avec au moins `places` places sur chaque trajet.
+    Retourne une liste de listes de Trajet (ordre du voyage).
+    """
+    if correspondance_min is None:
+        correspondance_min = settings.CORRESPONDANCE_MIN_MINUTES
+    horizon = timedelta(hours=settings.CORRESPONDANCES_HORIZON_HEURES)
+
+    exclus = set()
+    # Les places évoluent par UPDATE sans signal : on les vérifie en base,
+    # et on relance la recherche sans les trajets devenus complets.
+    for _ in range(5):
+        itineraires = horaire.obtenir().rechercher(
+            origine, destination, depart_min, correspondance_min,
+            horizon=horizon, exclus=frozenset(exclus)
+        )
+        ids = {c.trajet_id for itineraire in itineraires for c in itineraire}
+        trajets = Trajet.objects.in_bulk(ids)
+        complets = {
+            trajet_id for trajet_id in ids
+            if trajet_id not in trajets
+            or trajets[trajet_id].statut != 'planifie'
+            or trajets[trajet_id].places_disponibles < places
+        }
+        if not complets:
+            return [[trajets[c.trajet_id] for c in itineraire] for itineraire in itineraires]
+        exclus |= complets
+    return []
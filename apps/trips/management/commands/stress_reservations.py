@@ -0,0 +1,103 @@
+"""
+Commande de test de charge du service d'allocation des sièges
+"""
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from apps.trips import plan_sieges
+from apps.trips.allocation import AllocationError, reserver
+from apps.trips.models import Trajet, Reservation
+
+
+class Command(BaseCommand):
+    help = 'Lance des réservations concurrentes sur un trajet et vérifie qu\'il n\'y a aucune survente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=300, help='Nombre de réservations parallèles')
+        parser.add_argument('--capacite', type=int, default=50, help='Capacité du trajet de test')
+        parser.add_argument('--threads', type=int, default=32, help='Nombre de threads')
+        parser.add_argument('--groupe', type=int, default=1, help='Places par réservation')
+        parser.add_argument('--garder', action='store_true', help='Ne pas supprimer le trajet de test')
+
+    def handle(self, *args, **options):
+        trajet = Trajet.objects.create(
+            ville_depart='Stress',
+            ville_arrivee='Test',
+            date_depart=timezone.localdate() + timedelta(days=1),
+            heure_depart='08:00',
+            duree_estimee=60,
+            prix_base=1000,
+            capacite_max=options['capacite'],
+        )
+        self.stdout.write(
+            f"Trajet {trajet.id} : {options['reservations']} réservation(s) de "
+            f"{options['groupe']} place(s), capacité {trajet.capacite_max}"
+        )
+
+        def reserver_une(i):
+            passagers = [
+                {
+                    'client_telephone': f'+226{i:08d}',
+                    'client_nom': 'Stress',
+                    'client_prenom': f'{i}-{j}',
+                }
+                for j in range(options['groupe'])
+            ]
+            try:
+                for tentative in range(10):
+                    try:
+                        reserver(trajet.id, passagers)
+                        return 'ok'
+                    except OperationalError:
+                        # SQLite : base verrouillée par un autre écrivain
+                        time.sleep(0.01 * (tentative + 1))
+                return 'erreur'
+            except AllocationError:
+                return 'refusee'
+            finally:
+                connection.close()
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            resultats = Counter(executor.map(reserver_une, range(options['reservations'])))
+        duree = time.perf_counter() - debut
+
+        trajet.refresh_from_db()
+        reservations = Reservation.objects.filter(trajet_id=trajet.id).exclude(statut='annulee')
+        sieges = Counter(reservations.values_list('numero_siege', flat=True))
+        nombre = sum(sieges.values())
+        doublons = sum(1 for n in sieges.values() if n > 1)
+        survente = max(0, nombre - trajet.capacite_max)
+        plan_coherent = bytes(trajet.plan_sieges) == plan_sieges.depuis_sieges(sieges, trajet.capacite_max)
+
+        self.stdout.write(f"Durée : {duree:.2f}s ({options['reservations'] / duree:.0f} réservations/s)")
+        self.stdout.write(
+            f"Acceptées : {resultats['ok']} - Refusées : {resultats['refusee']} - Erreurs : {resultats['erreur']}"
+        )
+        self.stdout.write(
+            f"Places réservées (compteur) : {trajet.places_reservees} - "
+            f"Réservations en base : {nombre} - Sièges en double : {doublons} - Survente : {survente}"
+        )
+        self.stdout.write(f"Plan des sièges cohérent : {'oui' if plan_coherent else 'non'}")
+
+        coherent = (
+            survente == 0
+            and doublons == 0
+            and plan_coherent
+            and nombre == trajet.places_reservees
+            and nombre == resultats['ok'] * options['groupe']
+        )
+
+        if not options['garder']:
+            Reservation.objects.filter(trajet_id=trajet.id).delete()
+            trajet.delete()
+
+        if not coherent:
+            raise CommandError('Incohérence détectée entre le compteur et les réservations')
+        self.stdout.write(self.style.SUCCESS('✓ Aucune survente'))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='reservation',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut', 'annulee'), _negated=True), fields=('trajet_id', 'numero_siege'), name='trips_reservation_siege_unique'),
+        ),
+    ]
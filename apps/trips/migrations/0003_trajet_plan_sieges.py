@@ -0,0 +1,37 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+def construire_plans(apps, schema_editor):
+    """Initialise le plan des sièges depuis les réservations existantes"""
+    Trajet = apps.get_model('trips', 'Trajet')
+    Reservation = apps.get_model('trips', 'Reservation')
+    
+    occupes = {}
+    for trajet_id, siege in Reservation.objects.exclude(statut='annulee').values_list('trajet_id', 'numero_siege'):
+        occupes.setdefault(trajet_id, []).append(siege)
+    
+    for trajet in Trajet.objects.only('id', 'capacite_max'):
+        valeur = 0
+        for siege in occupes.get(trajet.id, []):
+            if 1 <= siege <= trajet.capacite_max:
+                valeur |= 1 << (siege - 1)
+        trajet.plan_sieges = valeur.to_bytes((trajet.capacite_max + 7) // 8, 'little')
+        trajet.save(update_fields=['plan_sieges'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0002_reservation_siege_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trajet',
+            name='plan_sieges',
+            field=models.BinaryField(default=bytes, help_text='Bitmap des sièges occupés (voir apps.trips.plan_sieges)', verbose_name='Plan des sièges'),
+        ),
+        migrations.RunPython(construire_plans, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+from apps.core.utils import normaliser_cle
+
+
+def remplir_cles(apps, schema_editor):
+    """Calcule les clés normalisées des trajets existants"""
+    Trajet = apps.get_model('trips', 'Trajet')
+    trajets = list(Trajet.objects.only('id', 'ville_depart', 'ville_arrivee'))
+    for trajet in trajets:
+        trajet.ville_depart_cle = normaliser_cle(trajet.ville_depart)
+        trajet.ville_arrivee_cle = normaliser_cle(trajet.ville_arrivee)
+    Trajet.objects.bulk_update(trajets, ['ville_depart_cle', 'ville_arrivee_cle'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0003_trajet_plan_sieges'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trajet',
+            name='ville_arrivee_cle',
+            field=models.CharField(default='', editable=False, max_length=100, verbose_name="Clé ville d'arrivée"),
+        ),
+        migrations.AddField(
+            model_name='trajet',
+            name='ville_depart_cle',
+            field=models.CharField(default='', editable=False, max_length=100, verbose_name='Clé ville de départ'),
+        ),
+        migrations.RunPython(remplir_cles, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='trajet',
+            index=models.Index(fields=['statut', 'ville_depart_cle', 'ville_arrivee_cle', 'date_depart', 'heure_depart'], name='trips_trajet_recherche_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0004_trajet_recherche_indexee'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['date_reservation', 'id'], name='trips_reservation_curseur_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:24
+
+import apps.core.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0005_index_curseur'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservation',
+            name='id',
+            field=models.UUIDField(default=apps.core.utils.nouvel_uuid, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='trajet',
+            name='id',
+            field=models.UUIDField(default=apps.core.utils.nouvel_uuid, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0006_uuid_ordonnes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['trajet_id', 'statut', '-date_reservation'], name='trips_resa_trajet_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['client_telephone', '-date_reservation'], name='trips_resa_telephone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['statut', '-date_reservation'], name='trips_resa_statut_idx'),
+        ),
+    ]
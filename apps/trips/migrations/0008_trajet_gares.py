@@ -0,0 +1,49 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from apps.core.utils import normaliser_cle
+
+
+def rattacher_gares(apps, schema_editor):
+    """Rattache les trajets existants à la gare de leur ville quand la ville n'en a qu'une"""
+    Gare = apps.get_model('locations', 'Gare')
+    Trajet = apps.get_model('trips', 'Trajet')
+    gares_par_ville = {}
+    for gare_id, ville in Gare.objects.filter(is_active=True).values_list('id', 'quartier__ville__nom'):
+        gares_par_ville.setdefault(normaliser_cle(ville), []).append(gare_id)
+    for cle, gares in gares_par_ville.items():
+        if len(gares) == 1:
+            Trajet.objects.filter(ville_depart_cle=cle, gare_depart=None).update(gare_depart=gares[0])
+            Trajet.objects.filter(ville_arrivee_cle=cle, gare_arrivee=None).update(gare_arrivee=gares[0])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0003_managers_index_actifs'),
+        ('trips', '0007_index_acces_reservations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trajet',
+            name='gare_arrivee',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trajets_arrivee', to='locations.gare', verbose_name="Gare d'arrivée"),
+        ),
+        migrations.AddField(
+            model_name='trajet',
+            name='gare_depart',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trajets_depart', to='locations.gare', verbose_name='Gare de départ'),
+        ),
+        migrations.AddIndex(
+            model_name='trajet',
+            index=models.Index(fields=['gare_depart', 'date_depart'], name='trips_trajet_gare_dep_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trajet',
+            index=models.Index(fields=['gare_arrivee', 'date_depart'], name='trips_trajet_gare_arr_idx'),
+        ),
+        migrations.RunPython(rattacher_gares, migrations.RunPython.noop),
+    ]
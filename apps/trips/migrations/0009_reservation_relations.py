@@ -0,0 +1,60 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trips', '0008_trajet_gares'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='reservation',
+            name='trips_reservation_siege_unique',
+        ),
+        migrations.RemoveIndex(
+            model_name='reservation',
+            name='trips_resa_trajet_statut_idx',
+        ),
+        # L'ancien identifiant libre est gardé le temps de la reprise (0010)
+        migrations.RenameField(
+            model_name='reservation',
+            old_name='trajet_id',
+            new_name='trajet_uuid',
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='trajet_uuid',
+            field=models.UUIDField(null=True, verbose_name='ID du trajet'),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='trajet',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='trips.trajet', verbose_name='Trajet'),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='client',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to=settings.AUTH_USER_MODEL, verbose_name='Compte client'),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='valide_par',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tickets_valides', to=settings.AUTH_USER_MODEL, verbose_name='Validé par'),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='prix',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Prix'),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='numero_siege',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Numéro de siège'),
+        ),
+    ]
@@ -0,0 +1,134 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:10
+
+import itertools
+from operator import attrgetter
+
+from django.db import migrations
+from django.db.models import F, OuterRef, Subquery
+
+from apps.trips import plan_sieges
+
+
+STATUTS = {
+    'en_attente': 'en_attente',
+    'confirme': 'confirmee',
+    'valide': 'validee',
+    'annule': 'annulee',
+}
+LOT = 1000
+
+
+def rattacher_trajets(apps, schema_editor):
+    """Remplace l'identifiant libre du trajet par la clé étrangère"""
+    Reservation = apps.get_model('trips', 'Reservation')
+    Trajet = apps.get_model('trips', 'Trajet')
+    # Réservations d'un trajet supprimé : elles peuvent porter un paiement, la
+    # migration s'arrête plutôt que de les supprimer
+    orphelines = Reservation.objects.exclude(trajet_uuid__in=Trajet.objects.values('id'))
+    nombre = orphelines.count()
+    if nombre:
+        tickets = ', '.join(orphelines.values_list('numero_ticket', flat=True)[:10])
+        raise RuntimeError(
+            f"{nombre} réservation(s) désignent un trajet supprimé (tickets : {tickets}"
+            f"{', ...' if nombre > 10 else ''}). Les archiver ou les rattacher à un trajet "
+            f"avant de relancer la migration."
+        )
+    # Prix du billet : prix de base du trajet (le champ n'existait pas)
+    Reservation.objects.update(
+        trajet=F('trajet_uuid'),
+        prix=Subquery(Trajet.objects.filter(id=OuterRef('trajet_uuid')).values('prix_base')[:1]),
+    )
+
+
+def detacher_trajets(apps, schema_editor):
+    Reservation = apps.get_model('trips', 'Reservation')
+    Reservation.objects.update(trajet_uuid=F('trajet'))
+
+
+def fusionner(apps, schema_editor):
+    """
+    Reprend les réservations de l'application reservations (clients connectés).
+    Chaque réservation non annulée reçoit le plus petit siège libre de son
+    trajet ; celles d'un trajet déjà complet sont reprises sans siège. Le
+    compteur et le plan des sièges des trajets concernés sont recalculés.
+    """
+    Ancienne = apps.get_model('reservations', 'Reservation')
+    Reservation = apps.get_model('trips', 'Reservation')
+    Trajet = apps.get_model('trips', 'Trajet')
+
+    # Numéros de ticket déjà pris dans trips : ils sont imprimés sur les billets des
+    # deux côtés, la migration s'arrête plutôt que d'en renuméroter un
+    collisions = Ancienne.objects.filter(
+        numero_ticket__in=Reservation.objects.values('numero_ticket')
+    ).values_list('numero_ticket', flat=True)
+    nombre = collisions.count()
+    if nombre:
+        tickets = ', '.join(collisions[:10])
+        raise RuntimeError(
+            f"{nombre} réservation(s) de l'application reservations ont un numéro de ticket "
+            f"déjà utilisé dans trips (tickets : {tickets}{', ...' if nombre > 10 else ''}). "
+            f"Renuméroter l'une des deux réservations avant de relancer la migration."
+        )
+
+    anciennes = Ancienne.objects.select_related('client').order_by('trajet_id', 'date_reservation')
+    capacites = dict(
+        Trajet.objects.filter(id__in=Ancienne.objects.values('trajet_id')).values_list('id', 'capacite_max')
+    )
+    lot = []
+    for trajet_id, groupe in itertools.groupby(anciennes.iterator(), key=attrgetter('trajet_id')):
+        occupes = set(
+            Reservation.objects.filter(trajet_id=trajet_id, numero_siege__isnull=False)
+            .exclude(statut='annulee').values_list('numero_siege', flat=True)
+        )
+        libres = (siege for siege in range(1, capacites[trajet_id] + 1) if siege not in occupes)
+        for ancienne in groupe:
+            statut = STATUTS.get(ancienne.statut, 'en_attente')
+            client = ancienne.client
+            lot.append(Reservation(
+                id=ancienne.id,
+                trajet_id=trajet_id,
+                client_id=client.id,
+                client_telephone=str(client.telephone)[:20],
+                client_nom=client.nom,
+                client_prenom=client.prenom,
+                client_email=client.email or None,
+                numero_ticket=ancienne.numero_ticket,
+                numero_siege=None if statut == 'annulee' else next(libres, None),
+                statut=statut,
+                prix=ancienne.prix,
+                # 'confirme' était posé après paiement
+                montant_paye=ancienne.prix if statut in ('confirmee', 'validee') else 0,
+                date_reservation=ancienne.date_reservation,
+                date_validation=ancienne.date_validation,
+                valide_par_id=ancienne.valide_par_id,
+            ))
+        if len(lot) >= LOT:
+            Reservation.objects.bulk_create(lot)
+            lot = []
+    Reservation.objects.bulk_create(lot)
+
+    reprises = Reservation.objects.filter(id__in=Ancienne.objects.values('id'))
+    reprises.update(created_at=F('date_reservation'), updated_at=F('date_reservation'))
+
+    for trajet_id, capacite_max in capacites.items():
+        sieges = list(
+            Reservation.objects.filter(trajet_id=trajet_id, numero_siege__isnull=False)
+            .exclude(statut='annulee').values_list('numero_siege', flat=True)
+        )
+        Trajet.objects.filter(id=trajet_id).update(
+            places_reservees=len(sieges),
+            plan_sieges=plan_sieges.depuis_sieges(sieges, capacite_max),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0003_index_trajet_date'),
+        ('trips', '0009_reservation_relations'),
+    ]
+
+    operations = [
+        migrations.RunPython(rattacher_trajets, detacher_trajets),
+        migrations.RunPython(fusionner, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0010_fusion_reservations'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='reservation',
+            name='trajet_uuid',
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='trajet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='trips.trajet', verbose_name='Trajet'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['trajet', 'statut', '-date_reservation'], name='trips_resa_trajet_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['client', '-date_reservation'], name='trips_resa_client_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut', 'annulee'), _negated=True), fields=('trajet', 'numero_siege'), name='trips_reservation_siege_unique'),
+        ),
+    ]
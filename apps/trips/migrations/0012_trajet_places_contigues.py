@@ -0,0 +1,34 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:32
+
+from django.db import migrations, models
+
+from apps.trips import plan_sieges
+
+
+def calculer_places_contigues(apps, schema_editor):
+    """Plus longue série de sièges libres des trajets existants, depuis leur plan"""
+    Trajet = apps.get_model('trips', 'Trajet')
+    lot = []
+    for trajet in Trajet.objects.only('id', 'capacite_max', 'plan_sieges').iterator(chunk_size=2000):
+        trajet.places_contigues_max = plan_sieges.plus_longue_serie_libre(trajet.plan_sieges, trajet.capacite_max)
+        lot.append(trajet)
+        if len(lot) >= 2000:
+            Trajet.objects.bulk_update(lot, ['places_contigues_max'])
+            lot = []
+    Trajet.objects.bulk_update(lot, ['places_contigues_max'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0011_reservation_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trajet',
+            name='places_contigues_max',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Sièges libres consécutifs (maximum)'),
+        ),
+        migrations.RunPython(calculer_places_contigues, migrations.RunPython.noop),
+    ]
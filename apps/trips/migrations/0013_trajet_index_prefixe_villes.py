@@ -0,0 +1,21 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0012_trajet_places_contigues'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trajet',
+            index=models.Index(fields=['statut', 'ville_depart_cle'], name='trips_trajet_dep_prefixe_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='trajet',
+            index=models.Index(fields=['statut', 'ville_arrivee_cle'], name='trips_trajet_arr_prefixe_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+    ]
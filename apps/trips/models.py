@@ -1,7 +1,10 @@
-import uuid
 from django.db import models
 from django.utils import timezone
 
+from apps.core.utils import normaliser_cle, nouvel_uuid
+from apps.users.models import Role
+from . import plan_sieges
+
 
 class Trajet(models.Model):
     """Modèle pour les trajets de bus"""
@@ -18,12 +21,36 @@ class Trajet(models.Model):
         ('vip', 'VIP'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=nouvel_uuid, editable=False)
     
     # Informations du trajet
     ville_depart = models.CharField(max_length=100, verbose_name="Ville de départ")
     ville_arrivee = models.CharField(max_length=100, verbose_name="Ville d'arrivée")
     
+    # Clés normalisées (sans accents, minuscules) pour la recherche indexée
+    ville_depart_cle = models.CharField(max_length=100, editable=False, default='', verbose_name="Clé ville de départ")
+    ville_arrivee_cle = models.CharField(max_length=100, editable=False, default='', verbose_name="Clé ville d'arrivée")
+    
+    # Gares de départ et d'arrivée (indexées avec la date dans Meta.indexes)
+    gare_depart = models.ForeignKey(
+        'locations.Gare',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name='trajets_depart',
+        verbose_name="Gare de départ"
+    )
+    gare_arrivee = models.ForeignKey(
+        'locations.Gare',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name='trajets_arrivee',
+        verbose_name="Gare d'arrivée"
+    )
+    
     # Horaires et durée
     date_depart = models.DateField(verbose_name="Date de départ")
     heure_depart = models.TimeField(verbose_name="Heure de départ")
@@ -35,6 +62,18 @@ class Trajet(models.Model):
     # Capacité
     capacite_max = models.IntegerField(verbose_name="Capacité maximale")
     places_reservees = models.IntegerField(default=0, verbose_name="Places réservées")
+    plan_sieges = models.BinaryField(
+        default=bytes,
+        editable=False,
+        help_text="Bitmap des sièges occupés (voir apps.trips.plan_sieges)",
+        verbose_name="Plan des sièges"
+    )
+    # Tenu à jour avec plan_sieges : filtre SQL des recherches de places contiguës
+    places_contigues_max = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Sièges libres consécutifs (maximum)"
+    )
     
     # Type et statut
     type_trajet = models.CharField(
@@ -64,10 +103,44 @@ class Trajet(models.Model):
         verbose_name = 'Trajet'
         verbose_name_plural = 'Trajets'
         ordering = ['-date_depart', '-heure_depart']
+        indexes = [
+            # Recherche publique : statut + villes exactes, puis tri par date/heure
+            models.Index(
+                fields=['statut', 'ville_depart_cle', 'ville_arrivee_cle', 'date_depart', 'heure_depart'],
+                name='trips_trajet_recherche_idx',
+            ),
+            # Recherche par début de nom de ville (LIKE 'cle%' : varchar_pattern_ops sous PostgreSQL)
+            models.Index(
+                fields=['statut', 'ville_depart_cle'],
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+                name='trips_trajet_dep_prefixe_idx',
+            ),
+            models.Index(
+                fields=['statut', 'ville_arrivee_cle'],
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+                name='trips_trajet_arr_prefixe_idx',
+            ),
+            # Trajets d'une gare (départs / arrivées du jour, portée du personnel de gare)
+            models.Index(fields=['gare_depart', 'date_depart'], name='trips_trajet_gare_dep_idx'),
+            models.Index(fields=['gare_arrivee', 'date_depart'], name='trips_trajet_gare_arr_idx'),
+        ]
     
     def __str__(self):
         return f"{self.ville_depart} → {self.ville_arrivee} ({self.date_depart} {self.heure_depart})"
     
+    def save(self, *args, **kwargs):
+        self.ville_depart_cle = normaliser_cle(self.ville_depart)
+        self.ville_arrivee_cle = normaliser_cle(self.ville_arrivee)
+        self.places_contigues_max = plan_sieges.plus_longue_serie_libre(self.plan_sieges, self.capacite_max)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'ville_depart_cle', 'ville_arrivee_cle'}
+            # Recalculé seulement si le plan ou la capacité sont enregistrés avec
+            if update_fields & {'plan_sieges', 'capacite_max'}:
+                update_fields.add('places_contigues_max')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+    
     @property
     def places_disponibles(self):
         """Calcule les places disponibles"""
@@ -86,8 +159,37 @@ class Trajet(models.Model):
         return round((self.places_reservees / self.capacite_max) * 100, 2)
 
 
+class ReservationQuerySet(models.QuerySet):
+    
+    def visibles_par(self, portee):
+        """
+        Réservations visibles selon la portée (apps.users.portee) : toutes pour
+        le staff et l'administrateur, celles des trajets de ses gares pour un
+        agent de gare, les siennes pour un client, aucune sinon
+        """
+        if portee.voit_tout:
+            return self
+        if portee.est_agent_gare:
+            # Le OU porte sur la seule table des trajets (une recherche par index de gare,
+            # résultats réunis), puis l'index (trajet, statut, date) sert la sous-requête
+            trajets = Trajet.objects.filter(
+                portee.filtre_gares('gare_depart', 'gare_arrivee')
+            ).order_by().values('id')
+            return self.filter(trajet_id__in=trajets)
+        if portee.role == Role.CLIENT:
+            return self.filter(client_id=portee.user_id)
+        return self.none()
+
+
 class Reservation(models.Model):
-    """Modèle pour les réservations de trajets"""
+    """
+    Modèle pour les réservations de trajets
+    
+    Table unique des réservations : guichet (passager sans compte) comme
+    clients de l'application (client renseigné). Les informations du
+    passager sont recopiées sur la réservation, qui garde son historique si
+    le compte est supprimé.
+    """
     
     STATUS_CHOICES = [
         ('en_attente', 'En attente'),
@@ -97,10 +199,28 @@ class Reservation(models.Model):
         ('annulee', 'Annulée'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Statuts d'une réservation qui peut encore être validée à l'embarquement
+    STATUTS_VALIDABLES = ('en_attente', 'confirmee', 'payee')
+    
+    id = models.UUIDField(primary_key=True, default=nouvel_uuid, editable=False)
     
-    # Relations
-    trajet_id = models.UUIDField(verbose_name="ID du trajet")
+    # Relations (index composés ci-dessous plutôt qu'un index par clé étrangère)
+    trajet = models.ForeignKey(
+        Trajet,
+        on_delete=models.CASCADE,
+        related_name='reservations',
+        db_index=False,
+        verbose_name="Trajet"
+    )
+    client = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reservations',
+        db_index=False,
+        verbose_name="Compte client"
+    )
     client_telephone = models.CharField(max_length=20, verbose_name="Téléphone du client")
     
     # Informations du client
@@ -110,7 +230,8 @@ class Reservation(models.Model):
     
     # Réservation
     numero_ticket = models.CharField(max_length=50, unique=True, verbose_name="Numéro de ticket")
-    numero_siege = models.IntegerField(verbose_name="Numéro de siège")
+    # Vide pour les réservations sans siège reprises d'un trajet déjà complet
+    numero_siege = models.IntegerField(null=True, blank=True, verbose_name="Numéro de siège")
     
     # Statut et paiement
     statut = models.CharField(
@@ -119,6 +240,12 @@ class Reservation(models.Model):
         default='en_attente',
         verbose_name="Statut"
     )
+    prix = models.DecimalField(
+        max_digits=10, 
+        decimal_places=2, 
+        default=0,
+        verbose_name="Prix"
+    )
     montant_paye = models.DecimalField(
         max_digits=10, 
         decimal_places=2, 
@@ -129,15 +256,56 @@ class Reservation(models.Model):
     # Métadonnées
     date_reservation = models.DateTimeField(default=timezone.now, verbose_name="Date de réservation")
     date_validation = models.DateTimeField(null=True, blank=True, verbose_name="Date de validation")
+    valide_par = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='tickets_valides',
+        db_index=False,
+        verbose_name="Validé par"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Modifié le")
     
+    objects = ReservationQuerySet.as_manager()
+    
     class Meta:
         db_table = 'trips_reservation'
         verbose_name = 'Réservation'
         verbose_name_plural = 'Réservations'
         ordering = ['-date_reservation']
-        unique_together = [['trajet_id', 'numero_siege']]
+        indexes = [
+            # Pagination par curseur (apps.core.pagination)
+            models.Index(fields=['date_reservation', 'id'], name='trips_reservation_curseur_idx'),
+            # Filtres de ReservationViewSet, triés par date de réservation ; le préfixe
+            # trajet sert aussi l'occupation et la restriction aux gares (trajet_id IN ...)
+            models.Index(
+                fields=['trajet', 'statut', '-date_reservation'],
+                name='trips_resa_trajet_statut_idx',
+            ),
+            models.Index(
+                fields=['client_telephone', '-date_reservation'],
+                name='trips_resa_telephone_idx',
+            ),
+            models.Index(
+                fields=['statut', '-date_reservation'],
+                name='trips_resa_statut_idx',
+            ),
+            # Réservations d'un client connecté
+            models.Index(
+                fields=['client', '-date_reservation'],
+                name='trips_resa_client_idx',
+            ),
+        ]
+        constraints = [
+            # Un siège ne peut être pris que par une réservation non annulée
+            models.UniqueConstraint(
+                fields=['trajet', 'numero_siege'],
+                condition=~models.Q(statut='annulee'),
+                name='trips_reservation_siege_unique',
+            ),
+        ]
     
     def __str__(self):
         return f"Ticket {self.numero_ticket} - {self.client_nom} {self.client_prenom}"
@@ -152,8 +320,19 @@ class Reservation(models.Model):
         """Vérifie si la réservation est validée"""
         return self.statut == 'validee'
     
-    def valider(self):
-        """Valide la réservation"""
-        self.statut = 'validee'
-        self.date_validation = timezone.now()
-        self.save()
+    def valider(self, par=None):
+        """
+        Valide la réservation (par le guichetier `par`) en un UPDATE conditionnel :
+        une annulation concurrente n'est pas écrasée. Retourne False si la
+        réservation n'était plus validable (déjà validée ou annulée).
+        """
+        maintenant = timezone.now()
+        valide = Reservation.objects.filter(pk=self.pk, statut__in=self.STATUTS_VALIDABLES).update(
+            statut='validee', date_validation=maintenant, valide_par=par, updated_at=maintenant
+        )
+        if valide:
+            self.statut = 'validee'
+            self.date_validation = maintenant
+            self.valide_par = par
+            self.updated_at = maintenant
+        return bool(valide)
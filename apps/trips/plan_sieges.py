@@ -0,0 +1,91 @@
+"""
+Trips plan des sièges - Occupation compacte d'un trajet
+
+Le plan est un bitmap stocké dans Trajet.plan_sieges : le bit i (ordre
+little-endian) vaut 1 si le siège i + 1 est occupé. Un bus de 70 places
+tient dans 9 octets ; toutes les opérations se font sur un entier Python.
+"""
+
+
+def _entier(plan):
+    return int.from_bytes(bytes(plan or b''), 'little')
+
+
+def _octets(valeur, capacite_max):
+    return valeur.to_bytes((capacite_max + 7) // 8, 'little')
+
+
+def _masque(capacite_max):
+    return (1 << capacite_max) - 1
+
+
+def vide(capacite_max):
+    """Plan d'un trajet sans aucune réservation"""
+    return _octets(0, capacite_max)
+
+
+def depuis_sieges(sieges, capacite_max):
+    """Construit un plan à partir d'une liste de numéros de sièges occupés"""
+    valeur = 0
+    for siege in sieges:
+        if 1 <= siege <= capacite_max:
+            valeur |= 1 << (siege - 1)
+    return _octets(valeur, capacite_max)
+
+
+def occuper(plan, sieges, capacite_max):
+    """Retourne le plan avec les sièges donnés marqués occupés"""
+    valeur = _entier(plan)
+    for siege in sieges:
+        valeur |= 1 << (siege - 1)
+    return _octets(valeur & _masque(capacite_max), capacite_max)
+
+
+def liberer(plan, sieges, capacite_max):
+    """Retourne le plan avec les sièges donnés marqués libres"""
+    valeur = _entier(plan)
+    for siege in sieges:
+        valeur &= ~(1 << (siege - 1))
+    return _octets(valeur & _masque(capacite_max), capacite_max)
+
+
+def est_occupe(plan, siege):
+    return bool(_entier(plan) >> (siege - 1) & 1)
+
+
+def nombre_occupes(plan, capacite_max):
+    return bin(_entier(plan) & _masque(capacite_max)).count('1')
+
+
+def sieges_libres(plan, capacite_max, limite=None):
+    """Numéros des sièges libres, par ordre croissant"""
+    libres_bits = ~_entier(plan) & _masque(capacite_max)
+    libres = []
+    while libres_bits and (limite is None or len(libres) < limite):
+        bit = libres_bits & -libres_bits
+        libres.append(bit.bit_length())
+        libres_bits ^= bit
+    return libres
+
+
+def a_places_contigues(plan, capacite_max, nombre):
+    """Vrai si le trajet a au moins `nombre` sièges libres consécutifs"""
+    if nombre < 1:
+        return True
+    libres_bits = ~_entier(plan) & _masque(capacite_max)
+    # Après k décalages, un bit reste à 1 s'il débute k + 1 sièges libres
+    for _ in range(nombre - 1):
+        libres_bits &= libres_bits >> 1
+        if not libres_bits:
+            return False
+    return bool(libres_bits)
+
+
+def plus_longue_serie_libre(plan, capacite_max):
+    """Nombre maximal de sièges libres consécutifs"""
+    libres_bits = ~_entier(plan) & _masque(capacite_max)
+    longueur = 0
+    while libres_bits:
+        libres_bits &= libres_bits >> 1
+        longueur += 1
+    return longueur
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
+from apps.core.utils import normaliser_cle
+from apps.locations.models import Gare
+from . import allocation, billets
 from .models import Trajet, Reservation
 
 
@@ -15,6 +20,8 @@ class TrajetSerializer(serializers.ModelSerializer):
             'id',
             'ville_depart',
             'ville_arrivee',
+            'gare_depart',
+            'gare_arrivee',
             'date_depart',
             'heure_depart',
             'duree_estimee',
@@ -32,7 +39,50 @@ class TrajetSerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at',
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'places_disponibles', 'is_complet', 'taux_occupation']
+        # Le compteur de places n'est modifié que par apps.trips.allocation
+        read_only_fields = [
+            'id', 'places_reservees', 'created_at', 'updated_at', 'places_disponibles', 'is_complet', 'taux_occupation'
+        ]
+        # La ville de la gare est lue avec elle (validate)
+        extra_kwargs = {
+            'gare_depart': {'queryset': Gare.objects.select_related('quartier__ville')},
+            'gare_arrivee': {'queryset': Gare.objects.select_related('quartier__ville')},
+        }
+    
+    def validate(self, attrs):
+        """Chaque gare doit être dans la ville correspondante du trajet"""
+        erreurs = {}
+        for gare_champ, ville_champ in (('gare_depart', 'ville_depart'), ('gare_arrivee', 'ville_arrivee')):
+            if gare_champ not in attrs and ville_champ not in attrs:
+                continue
+            # Mise à jour partielle : l'autre valeur est celle du trajet
+            gare = attrs[gare_champ] if gare_champ in attrs else getattr(self.instance, gare_champ, None)
+            ville = attrs[ville_champ] if ville_champ in attrs else getattr(self.instance, ville_champ, '')
+            if gare is not None and normaliser_cle(gare.quartier.ville.nom) != normaliser_cle(ville):
+                erreurs[gare_champ] = f"La gare {gare.nom} n'est pas à {ville}."
+        if erreurs:
+            raise serializers.ValidationError(erreurs)
+        return attrs
+    
+    def update(self, instance, validated_data):
+        """
+        Enregistre seulement les champs envoyés : le compteur et le plan des
+        sièges, modifiés par des UPDATE conditionnels, ne sont jamais réécrits
+        depuis une instance lue avant eux
+        """
+        capacite_max = validated_data.pop('capacite_max', None)
+        with transaction.atomic():
+            if capacite_max is not None and capacite_max != instance.capacite_max:
+                try:
+                    allocation.changer_capacite(instance.id, capacite_max)
+                except allocation.AllocationError as e:
+                    raise serializers.ValidationError({'capacite_max': [e.message]})
+            for attr, valeur in validated_data.items():
+                setattr(instance, attr, valeur)
+            if validated_data:
+                instance.save(update_fields=[*validated_data, 'updated_at'])
+        instance.refresh_from_db(fields=['capacite_max', 'places_reservees', 'plan_sieges', 'places_contigues_max'])
+        return instance
 
 
 class TrajetListSerializer(serializers.ModelSerializer):
@@ -60,14 +110,18 @@ class TrajetListSerializer(serializers.ModelSerializer):
 class ReservationSerializer(serializers.ModelSerializer):
     """Serializer pour le modèle Reservation"""
     
+    # Identifiant plutôt que la relation : champ historique de l'API
+    trajet_id = serializers.UUIDField()
     is_payee = serializers.ReadOnlyField()
     is_validee = serializers.ReadOnlyField()
+    code_billet = serializers.SerializerMethodField()
     
     class Meta:
         model = Reservation
         fields = [
             'id',
             'trajet_id',
+            'client',
             'client_telephone',
             'client_nom',
             'client_prenom',
@@ -75,15 +129,41 @@ class ReservationSerializer(serializers.ModelSerializer):
             'numero_ticket',
             'numero_siege',
             'statut',
+            'prix',
             'montant_paye',
             'date_reservation',
             'date_validation',
+            'valide_par',
             'is_payee',
             'is_validee',
+            'code_billet',
             'created_at',
             'updated_at',
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'is_payee', 'is_validee']
+        read_only_fields = ['id', 'client', 'valide_par', 'created_at', 'updated_at', 'is_payee', 'is_validee']
+        extra_kwargs = {
+            # Attribués automatiquement s'ils ne sont pas fournis
+            'numero_ticket': {'required': False},
+            'numero_siege': {'required': False},
+        }
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is None:
+            # Une réservation naît en attente et non payée, au prix de base du trajet :
+            # elle occupe sa place dans le compteur et le plan des sièges (apps.trips.allocation)
+            lecture_seule = ('statut', 'montant_paye', 'prix')
+        else:
+            # Trajet, siège et statut ne changent que par apps.trips.allocation et les actions
+            lecture_seule = ('trajet_id', 'statut', 'numero_siege')
+        for nom in lecture_seule:
+            fields[nom].read_only = True
+        return fields
+    
+    def get_code_billet(self, obj):
+        """Code signé du QR code, pour le client de la réservation et les agents (aucun si annulée)"""
+        request = self.context.get('request')
+        return billets.code_billet_pour(obj, request.user if request else None)
     
     def validate_numero_ticket(self, value):
         """Valide l'unicité du numéro de ticket"""
@@ -94,11 +174,35 @@ class ReservationSerializer(serializers.ModelSerializer):
     
     def validate_numero_siege(self, value):
         """Valide que le numéro de siège est valide"""
-        if value < 1:
+        if value is not None and value < 1:
             raise serializers.ValidationError("Le numéro de siège doit être supérieur à 0.")
         return value
 
 
+class PassagerSerializer(serializers.ModelSerializer):
+    """Un passager d'une réservation de groupe"""
+    
+    class Meta:
+        model = Reservation
+        fields = [
+            'client_telephone',
+            'client_nom',
+            'client_prenom',
+            'client_email',
+            'numero_siege',
+        ]
+        extra_kwargs = {
+            'numero_siege': {'required': False},
+        }
+
+
+class ReservationGroupeSerializer(serializers.Serializer):
+    """Serializer pour une réservation de plusieurs places en une fois"""
+    
+    trajet_id = serializers.UUIDField()
+    passagers = PassagerSerializer(many=True, allow_empty=False)
+
+
 class ReservationListSerializer(serializers.ModelSerializer):
     """Serializer simplifié pour la liste des réservations"""
     
@@ -117,18 +221,45 @@ class ReservationListSerializer(serializers.ModelSerializer):
 
 
 class ValidationReservationSerializer(serializers.Serializer):
-    """Serializer pour la validation d'une réservation"""
+    """
+    Serializer pour la validation d'une réservation, par numéro de ticket
+    ou par code signé du billet (QR code)
     
-    numero_ticket = serializers.CharField(max_length=50)
+    L'existence et le statut de la réservation sont vérifiés par la vue,
+    dans la même requête que la validation.
+    """
     
-    def validate_numero_ticket(self, value):
-        """Valide que le ticket existe"""
+    numero_ticket = serializers.CharField(max_length=50, required=False)
+    code = serializers.CharField(max_length=200, required=False, write_only=True)
+    
+    def validate_code(self, value):
+        """Vérifie la signature et l'expiration du billet"""
         try:
-            reservation = Reservation.objects.get(numero_ticket=value)
-            if reservation.is_validee:
-                raise serializers.ValidationError("Ce ticket a déjà été validé.")
-            if reservation.statut == 'annulee':
-                raise serializers.ValidationError("Ce ticket a été annulé.")
-        except Reservation.DoesNotExist:
-            raise serializers.ValidationError("Ticket non trouvé.")
+            return billets.lire(value)
+        except billets.BilletInvalide as e:
+            raise serializers.ValidationError(e.message)
+    
+    def validate(self, attrs):
+        if not attrs.get('numero_ticket') and not attrs.get('code'):
+            raise serializers.ValidationError("numero_ticket ou code requis.")
+        return attrs
+
+
+class ValidationHorsLigneSerializer(serializers.Serializer):
+    """Une validation faite par un portique hors ligne"""
+    
+    code = serializers.CharField(max_length=200)
+    date_validation = serializers.DateTimeField(required=False)
+
+
+class SynchronisationValidationsSerializer(serializers.Serializer):
+    """Lot de validations hors ligne (codes vérifiés par billets.appliquer_validations)"""
+    
+    validations = ValidationHorsLigneSerializer(many=True, allow_empty=False)
+    
+    def validate_validations(self, value):
+        if len(value) > settings.BILLETS_SYNC_MAX:
+            raise serializers.ValidationError(
+                f"Au plus {settings.BILLETS_SYNC_MAX} validations par synchronisation."
+            )
         return value
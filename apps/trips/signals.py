@@ -0,0 +1,32 @@
+"""
+Trips signals - Mise à jour incrémentale de l'horaire des correspondances
+"""
+from types import SimpleNamespace
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .correspondances import horaire
+from .models import Trajet
+
+
+@receiver(post_save, sender=Trajet)
+def mettre_a_jour_horaire(sender, instance, **kwargs):
+    """Reflète le trajet dans l'horaire en mémoire (après le commit)"""
+    # Copie figée : les dates peuvent encore être des chaînes après un create()
+    trajet = SimpleNamespace(
+        id=instance.id,
+        statut=instance.statut,
+        ville_depart_cle=instance.ville_depart_cle,
+        ville_arrivee_cle=instance.ville_arrivee_cle,
+        date_depart=Trajet._meta.get_field('date_depart').to_python(instance.date_depart),
+        heure_depart=Trajet._meta.get_field('heure_depart').to_python(instance.heure_depart),
+        duree_estimee=int(instance.duree_estimee),
+    )
+    horaire.modifier(lambda h: h.mettre_a_jour(trajet))
+
+
+@receiver(post_delete, sender=Trajet)
+def retirer_de_horaire(sender, instance, **kwargs):
+    trajet_id = instance.id
+    horaire.modifier(lambda h: h.retirer(trajet_id))
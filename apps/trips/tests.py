@@ -0,0 +1,140 @@
+"""
+Trips tests - Attribution des sièges (apps.trips.allocation)
+"""
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from . import plan_sieges
+from .allocation import AllocationError, annuler, reserver
+from .models import Reservation, Trajet
+
+
+def creer_trajet(capacite_max=4, **champs):
+    return Trajet.objects.create(
+        ville_depart='Ouagadougou',
+        ville_arrivee='Bobo-Dioulasso',
+        date_depart=timezone.localdate() + timedelta(days=1),
+        heure_depart='08:00',
+        duree_estimee=300,
+        prix_base=5000,
+        capacite_max=capacite_max,
+        **champs
+    )
+
+
+def passager(i, **champs):
+    return {'client_telephone': f'+226700000{i:02d}', 'client_nom': 'Test', 'client_prenom': str(i), **champs}
+
+
+def sieges_actifs(trajet):
+    return list(
+        Reservation.objects.filter(trajet=trajet).exclude(statut='annulee').values_list('numero_siege', flat=True)
+    )
+
+
+class AllocationTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.trajet = creer_trajet(capacite_max=3)
+
+    def assertCoherent(self):
+        """Compteur, réservations et plan des sièges concordent"""
+        self.trajet.refresh_from_db()
+        sieges = sieges_actifs(self.trajet)
+        self.assertEqual(self.trajet.places_reservees, len(sieges))
+        self.assertEqual(
+            bytes(self.trajet.plan_sieges),
+            plan_sieges.depuis_sieges(sieges, self.trajet.capacite_max)
+        )
+
+    def test_survente_refusee(self):
+        reserver(self.trajet.id, [passager(1), passager(2)])
+        with self.assertRaises(AllocationError):
+            reserver(self.trajet.id, [passager(3), passager(4)])
+        reserver(self.trajet.id, [passager(3)])
+        with self.assertRaises(AllocationError):
+            reserver(self.trajet.id, [passager(4)])
+        self.assertEqual(len(sieges_actifs(self.trajet)), 3)
+        self.assertCoherent()
+
+    def test_sieges_uniques(self):
+        reservations = reserver(self.trajet.id, [passager(1), passager(2, numero_siege=1), passager(3)])
+        self.assertEqual(sorted(r.numero_siege for r in reservations), [1, 2, 3])
+        self.assertEqual(reservations[1].numero_siege, 1)
+
+    def test_siege_deja_pris_refuse(self):
+        reserver(self.trajet.id, [passager(1, numero_siege=2)])
+        with self.assertRaises(AllocationError):
+            reserver(self.trajet.id, [passager(2, numero_siege=2)])
+        self.assertEqual(sieges_actifs(self.trajet), [2])
+        self.assertCoherent()
+
+    def test_annuler_idempotent(self):
+        reservation = reserver(self.trajet.id, [passager(1), passager(2)])[0]
+        annuler(reservation)
+        annuler(reservation)
+        annuler(Reservation.objects.get(pk=reservation.pk))
+        self.assertEqual(reservation.statut, 'annulee')
+        self.assertEqual(len(sieges_actifs(self.trajet)), 1)
+        self.assertCoherent()
+        # La place libérée est de nouveau réservable
+        self.assertEqual(reserver(self.trajet.id, [passager(3)])[0].numero_siege, reservation.numero_siege)
+
+    def test_annuler_validee_refuse(self):
+        reservation = reserver(self.trajet.id, [passager(1)])[0]
+        self.assertTrue(reservation.valider())
+        with self.assertRaises(AllocationError):
+            annuler(reservation)
+        self.assertCoherent()
+
+    def test_groupe_annule_en_entier(self):
+        reserver(self.trajet.id, [passager(1, numero_siege=3)])
+        # Le second passager demande un siège pris : aucune place du groupe n'est gardée
+        with self.assertRaises(AllocationError):
+            reserver(self.trajet.id, [passager(2), passager(3, numero_siege=3)])
+        # Numéro de ticket en double : l'erreur d'intégrité annule aussi le compteur et le plan
+        with self.assertRaises(AllocationError):
+            reserver(self.trajet.id, [passager(4, numero_ticket='TK-DOUBLE'), passager(5, numero_ticket='TK-DOUBLE')])
+        self.assertEqual(sieges_actifs(self.trajet), [3])
+        self.assertCoherent()
+
+
+class AllocationConcurrenteTests(TransactionTestCase):
+    databases = '__all__'
+
+    def test_reservations_concurrentes_sans_survente(self):
+        trajet = creer_trajet(capacite_max=10)
+
+        def reserver_une(i):
+            try:
+                for tentative in range(20):
+                    try:
+                        reserver(trajet.id, [passager(i)])
+                        return 'ok'
+                    except OperationalError:
+                        # SQLite : base verrouillée par un autre écrivain
+                        time.sleep(0.01 * (tentative + 1))
+                return 'erreur'
+            except AllocationError:
+                return 'refusee'
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            resultats = Counter(executor.map(reserver_une, range(40)))
+
+        trajet.refresh_from_db()
+        sieges = sieges_actifs(trajet)
+        self.assertEqual(resultats['ok'], 10)
+        self.assertEqual(resultats['erreur'], 0)
+        self.assertEqual(len(sieges), len(set(sieges)))
+        self.assertEqual(sorted(sieges), list(range(1, 11)))
+        self.assertEqual(trajet.places_reservees, 10)
+        self.assertEqual(bytes(trajet.plan_sieges), plan_sieges.depuis_sieges(sieges, 10))
@@ -1,17 +1,31 @@
+import base64
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
-from django.db.models import Q, F
+from django.utils.dateparse import parse_date, parse_time
+from django.db.models import Count, Q, F, Sum
+from datetime import datetime, time, timedelta
 
+from apps.core.pagination import PaginationCurseur
+from apps.core.utils import normaliser_cle
+from apps.users.models import Role
+from apps.users.permissions import EstAgentGare, EstStaff
+from apps.users.portee import portee_de
+from . import allocation, billets, correspondances, plan_sieges
 from .models import Trajet, Reservation
 from .serializers import (
     TrajetSerializer, 
     TrajetListSerializer,
     ReservationSerializer, 
     ReservationListSerializer,
-    ValidationReservationSerializer
+    ReservationGroupeSerializer,
+    ValidationReservationSerializer,
+    SynchronisationValidationsSerializer
 )
 
 
@@ -20,10 +34,11 @@ class TrajetViewSet(viewsets.ModelViewSet):
     ViewSet pour gérer les trajets
     
     Liste tous les trajets disponibles avec filtres
-    Lecture publique autorisée, modification nécessite authentification
+    Lecture publique autorisée, modification réservée aux agents de gare et au staff
     """
     queryset = Trajet.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]  # Lecture publique, écriture authentifiée
+    budget_requetes = {'list': 4, 'retrieve': 3, 'plan_sieges': 3, 'reservations': 4, 'statistiques': 6, 'correspondances': 4, '*': 10}
     
     def get_serializer_class(self):
         """Utilise un serializer simplifié pour la liste"""
@@ -31,6 +46,11 @@ class TrajetViewSet(viewsets.ModelViewSet):
             return TrajetListSerializer
         return TrajetSerializer
     
+    def get_permissions(self):
+        if self.action in ('create', 'update', 'partial_update', 'destroy'):
+            return [IsAuthenticated(), EstAgentGare()]
+        return super().get_permissions()
+    
     def get_queryset(self):
         """
         Filtre les trajets selon les paramètres de requête
@@ -47,15 +67,16 @@ class TrajetViewSet(viewsets.ModelViewSet):
         if date_depart:
             queryset = queryset.filter(date_depart=date_depart)
         
-        # Filtre par ville de départ
+        # Filtre par ville de départ : début de la clé normalisée (insensible à la casse et
+        # aux accents, "bobo" trouve "Bobo-Dioulasso"), servi par un index varchar_pattern_ops
         ville_depart = self.request.query_params.get('ville_depart')
         if ville_depart:
-            queryset = queryset.filter(ville_depart__icontains=ville_depart)
+            queryset = queryset.filter(ville_depart_cle__startswith=normaliser_cle(ville_depart))
         
         # Filtre par ville d'arrivée
         ville_arrivee = self.request.query_params.get('ville_arrivee')
         if ville_arrivee:
-            queryset = queryset.filter(ville_arrivee__icontains=ville_arrivee)
+            queryset = queryset.filter(ville_arrivee_cle__startswith=normaliser_cle(ville_arrivee))
         
         # Filtre par type (VIP ou non)
         is_vip = self.request.query_params.get('is_vip')
@@ -67,34 +88,131 @@ class TrajetViewSet(viewsets.ModelViewSet):
         if disponible_uniquement and disponible_uniquement.lower() == 'true':
             queryset = queryset.filter(places_reservees__lt=F('capacite_max'))
         
+        # Seulement les trajets avec N sièges libres consécutifs (colonne tenue à jour avec le plan des sièges)
+        places_contigues = self.request.query_params.get('places_contigues')
+        if places_contigues and places_contigues.isdigit() and int(places_contigues) > 0:
+            queryset = queryset.filter(places_contigues_max__gte=int(places_contigues))
+        
         return queryset.order_by('-date_depart', '-heure_depart')
     
+    @action(detail=False, methods=['get'])
+    def correspondances(self, request):
+        """
+        Itinéraires de 1 à 3 trajets entre deux villes (avec changements)
+        
+        Paramètres : ville_depart, ville_arrivee, date_depart (AAAA-MM-JJ),
+        heure (HH:MM, optionnel), places (défaut 1),
+        correspondance_min (minutes entre deux trajets, optionnel)
+        """
+        params = request.query_params
+        ville_depart = normaliser_cle(params.get('ville_depart'))
+        ville_arrivee = normaliser_cle(params.get('ville_arrivee'))
+        if not ville_depart or not ville_arrivee or not params.get('date_depart'):
+            return Response(
+                {'error': 'ville_depart, ville_arrivee et date_depart sont requis.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            date_depart = parse_date(params['date_depart'])
+            heure = parse_time(params['heure']) if params.get('heure') else time.min
+            places = int(params.get('places', 1))
+            correspondance_min = (
+                int(params['correspondance_min']) if params.get('correspondance_min') else None
+            )
+        except ValueError:
+            date_depart = heure = None
+            places = 0
+        if date_depart is None or heure is None or places < 1:
+            return Response(
+                {'error': 'Paramètres invalides.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        itineraires = correspondances.rechercher_itineraires(
+            ville_depart,
+            ville_arrivee,
+            datetime.combine(date_depart, heure),
+            places=places,
+            correspondance_min=correspondance_min,
+        )
+        
+        resultats = []
+        for trajets in itineraires:
+            depart = datetime.combine(trajets[0].date_depart, trajets[0].heure_depart)
+            arrivee = datetime.combine(trajets[-1].date_depart, trajets[-1].heure_depart) + timedelta(
+                minutes=trajets[-1].duree_estimee
+            )
+            resultats.append({
+                'nombre_trajets': len(trajets),
+                'depart': depart,
+                'arrivee': arrivee,
+                'duree_totale': int((arrivee - depart).total_seconds() // 60),
+                'places_disponibles': min(t.places_disponibles for t in trajets),
+                'prix_total': sum(t.prix_base for t in trajets),
+                'trajets': TrajetListSerializer(trajets, many=True).data,
+            })
+        
+        return Response(resultats)
+    
     @action(detail=True, methods=['get'])
     def reservations(self, request, pk=None):
         """
-        Récupère toutes les réservations pour un trajet donné
+        Récupère les réservations d'un trajet donné (celles de la portée de l'utilisateur)
         """
         trajet = self.get_object()
-        reservations = Reservation.objects.filter(trajet_id=trajet.id)
+        reservations = Reservation.objects.visibles_par(portee_de(request.user)).filter(trajet_id=trajet.id)
         serializer = ReservationListSerializer(reservations, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def plan_sieges(self, request, pk=None):
+        """
+        Plan des sièges d'un trajet (sans lire les réservations)
+        
+        `plan` est le bitmap encodé en base64 : bit i = siège i + 1 occupé
+        """
+        try:
+            capacite_max, plan = Trajet.objects.filter(pk=pk).values_list(
+                'capacite_max', 'plan_sieges'
+            ).get()
+        except (Trajet.DoesNotExist, DjangoValidationError):
+            return Response(
+                {'error': 'Trajet non trouvé.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        sieges_libres = plan_sieges.sieges_libres(plan, capacite_max)
+        return Response({
+            'capacite_max': capacite_max,
+            'places_disponibles': len(sieges_libres),
+            'sieges_libres': sieges_libres,
+            'plan': base64.b64encode(bytes(plan)).decode('ascii'),
+        })
+    
     @action(detail=True, methods=['get'])
     def statistiques(self, request, pk=None):
         """
         Récupère les statistiques d'un trajet
         """
         trajet = self.get_object()
-        reservations = Reservation.objects.filter(trajet_id=trajet.id)
+        # Un seul parcours de l'index (trajet, statut, date) des réservations
+        totaux = Reservation.objects.filter(trajet_id=trajet.id).aggregate(
+            nombre=Count('id'),
+            payees=Count('id', filter=Q(statut__in=['payee', 'validee'])),
+            validees=Count('id', filter=Q(statut='validee')),
+            recettes=Sum('montant_paye'),
+        )
         
         stats = {
             'capacite_max': trajet.capacite_max,
             'places_reservees': trajet.places_reservees,
             'places_disponibles': trajet.places_disponibles,
             'taux_occupation': trajet.taux_occupation,
-            'nombre_reservations': reservations.count(),
-            'reservations_payees': reservations.filter(statut__in=['payee', 'validee']).count(),
-            'reservations_validees': reservations.filter(statut='validee').count(),
+            'nombre_reservations': totaux['nombre'],
+            'reservations_payees': totaux['payees'],
+            'reservations_validees': totaux['validees'],
+            'recettes': totaux['recettes'] or 0,
         }
         
         return Response(stats)
@@ -103,9 +221,16 @@ class TrajetViewSet(viewsets.ModelViewSet):
 class ReservationViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour gérer les réservations
+    
+    Chacun ne voit que les réservations de sa portée (Reservation.objects.visibles_par).
+    Modification et suppression (annulation) sont réservées au staff, la
+    validation aux agents des gares du trajet.
     """
     queryset = Reservation.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginationCurseur
+    champ_curseur = 'date_reservation'
+    budget_requetes = {'list': 4, 'retrieve': 3, 'valider_par_ticket': 3, '*': 12}
     
     def get_serializer_class(self):
         """Utilise un serializer simplifié pour la liste"""
@@ -113,13 +238,18 @@ class ReservationViewSet(viewsets.ModelViewSet):
             return ReservationListSerializer
         elif self.action == 'valider':
             return ValidationReservationSerializer
+        elif self.action == 'sync':
+            return SynchronisationValidationsSerializer
         return ReservationSerializer
     
     def get_queryset(self):
         """
-        Filtre les réservations selon les paramètres de requête
+        Filtre les réservations selon la portée puis les paramètres de requête
         """
-        queryset = Reservation.objects.all()
+        queryset = Reservation.objects.visibles_par(portee_de(self.request.user))
+        if self.action != 'list':
+            # Date de départ du trajet pour le code du billet
+            queryset = queryset.select_related('trajet')
         
         # Filtre par trajet
         trajet_id = self.request.query_params.get('trajet_id')
@@ -143,19 +273,62 @@ class ReservationViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-date_reservation')
     
+    def get_permissions(self):
+        if self.action in ('update', 'partial_update', 'destroy'):
+            return [IsAuthenticated(), EstStaff()]
+        # Validation au guichet ou au portique d'embarquement
+        if self.action in ('valider', 'valider_par_ticket', 'sync'):
+            return [IsAuthenticated(), EstAgentGare()]
+        return super().get_permissions()
+    
+    def perform_destroy(self, instance):
+        # La réservation est annulée et sa place libérée, pas supprimée (paiement, historique)
+        try:
+            allocation.annuler(instance)
+        except allocation.AllocationError as e:
+            raise ValidationError({'error': e.message})
+    
     def perform_create(self, serializer):
         """
-        Crée une nouvelle réservation et met à jour le trajet
+        Crée une nouvelle réservation en réservant sa place atomiquement
         """
-        reservation = serializer.save()
+        donnees = dict(serializer.validated_data)
+        trajet_id = donnees.pop('trajet_id')
+        # Un client réserve pour son compte : la réservation lui reste visible (visibles_par)
+        if portee_de(self.request.user).role == Role.CLIENT:
+            donnees['client_id'] = self.request.user.pk
         
-        # Mettre à jour le nombre de places réservées du trajet
         try:
-            trajet = Trajet.objects.get(id=reservation.trajet_id)
-            trajet.places_reservees += 1
-            trajet.save()
-        except Trajet.DoesNotExist:
-            pass
+            serializer.instance = allocation.reserver(trajet_id, [donnees])[0]
+        except allocation.AllocationError as e:
+            raise ValidationError({'error': e.message})
+    
+    @action(detail=False, methods=['post'])
+    def reserver_groupe(self, request):
+        """
+        Réserve plusieurs places sur un trajet en une seule transaction
+        (sièges attribués automatiquement s'ils ne sont pas précisés)
+        """
+        serializer = ReservationGroupeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        passagers = serializer.validated_data['passagers']
+        if portee_de(request.user).role == Role.CLIENT:
+            passagers = [{**passager, 'client_id': request.user.pk} for passager in passagers]
+        
+        try:
+            reservations = allocation.reserver(serializer.validated_data['trajet_id'], passagers)
+        except allocation.AllocationError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Un seul trajet pour les codes des billets
+        trajet = Trajet.objects.get(id=serializer.validated_data['trajet_id'])
+        for reservation in reservations:
+            reservation.trajet = trajet
+        
+        return Response({
+            'message': f'{len(reservations)} place(s) réservée(s) avec succès.',
+            'reservations': ReservationSerializer(reservations, many=True, context={'request': request}).data
+        }, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['post'])
     def valider(self, request, pk=None):
@@ -176,10 +349,15 @@ class ReservationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Valider la réservation
-        reservation.valider()
+        # Valider la réservation (refusé si elle a été annulée ou validée entre-temps)
+        if not reservation.valider(par=request.user):
+            return Response(
+                {'error': 'La réservation a été modifiée entre-temps, elle ne peut plus être validée.'},
+                status=status.HTTP_409_CONFLICT
+            )
         
-        serializer = self.get_serializer(reservation)
+        # get_serializer donnerait le serializer d'entrée de la validation
+        serializer = ReservationSerializer(reservation, context=self.get_serializer_context())
         return Response({
             'message': 'Réservation validée avec succès.',
             'reservation': serializer.data
@@ -188,26 +366,55 @@ class ReservationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def valider_par_ticket(self, request):
         """
-        Valide une réservation par son numéro de ticket
+        Valide une réservation par son numéro de ticket ou le code signé
+        de son billet, en un UPDATE conditionnel puis une lecture
+        (réservations des trajets des gares de l'agent)
         """
         serializer = ValidationReservationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        numero_ticket = serializer.validated_data['numero_ticket']
+        billet = serializer.validated_data.get('code')
+        if billet is not None:
+            filtre = {'pk': billet.reservation_id, 'trajet_id': billet.trajet_id}
+        else:
+            filtre = {'numero_ticket': serializer.validated_data['numero_ticket']}
         
-        try:
-            reservation = Reservation.objects.get(numero_ticket=numero_ticket)
-            reservation.valider()
-            
-            return Response({
-                'message': 'Ticket validé avec succès.',
-                'reservation': ReservationSerializer(reservation).data
-            })
-        except Reservation.DoesNotExist:
+        reservations = Reservation.objects.visibles_par(portee_de(request.user))
+        maintenant = timezone.now()
+        validee = reservations.filter(
+            statut__in=Reservation.STATUTS_VALIDABLES, **filtre
+        ).update(statut='validee', date_validation=maintenant, valide_par=request.user, updated_at=maintenant)
+        
+        reservation = reservations.select_related('trajet').filter(**filtre).first()
+        if reservation is None:
             return Response(
                 {'error': 'Ticket non trouvé.'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        if not validee:
+            erreur = 'Ce ticket a été annulé.' if reservation.statut == 'annulee' else 'Ce ticket a déjà été validé.'
+            return Response({'error': erreur}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': 'Ticket validé avec succès.',
+            'reservation': ReservationSerializer(reservation, context={'request': request}).data
+        })
+    
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Applique en un lot les validations faites hors ligne par un portique
+        (idempotent : un lot peut être renvoyé sans effet de bord)
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        resultat = billets.appliquer_validations(
+            [(v['code'], v.get('date_validation')) for v in serializer.validated_data['validations']],
+            request.user,
+            Reservation.objects.visibles_par(portee_de(request.user))
+        )
+        return Response(resultat)
     
     @action(detail=True, methods=['post'])
     def annuler(self, request, pk=None):
@@ -216,23 +423,11 @@ class ReservationViewSet(viewsets.ModelViewSet):
         """
         reservation = self.get_object()
         
-        if reservation.is_validee:
-            return Response(
-                {'error': 'Impossible d\'annuler une réservation déjà validée.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Annuler la réservation
-        reservation.statut = 'annulee'
-        reservation.save()
-        
-        # Mettre à jour le nombre de places réservées du trajet
+        # Annuler la réservation et libérer la place
         try:
-            trajet = Trajet.objects.get(id=reservation.trajet_id)
-            trajet.places_reservees = max(0, trajet.places_reservees - 1)
-            trajet.save()
-        except Trajet.DoesNotExist:
-            pass
+            allocation.annuler(reservation)
+        except allocation.AllocationError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
         
         serializer = self.get_serializer(reservation)
         return Response({
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(blank=True, max_length=254, null=True, verbose_name='Email'),
+        ),
+    ]
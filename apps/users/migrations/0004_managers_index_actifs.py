@@ -0,0 +1,25 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_uuid_ordonnes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='user',
+            options={'default_manager_name': 'objects', 'ordering': ['-created_at'], 'verbose_name': 'Utilisateur', 'verbose_name_plural': 'Utilisateurs'},
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['nom', 'prenom'], name='users_user_nom_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['role', 'nom'], name='users_user_role_actif_idx'),
+        ),
+    ]
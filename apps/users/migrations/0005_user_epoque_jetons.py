@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_managers_index_actifs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='epoque_jetons',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
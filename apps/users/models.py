@@ -2,6 +2,9 @@
 Users models - User, Role, AffectationGare
 """
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from phonenumber_field.modelfields import PhoneNumberField
 from apps.core.models import BaseModel
@@ -99,6 +102,10 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
     
+    # Époque des jetons JWT : les jetons d'accès d'une époque antérieure sont refusés
+    # (apps.authentication.jetons)
+    epoque_jetons = models.PositiveIntegerField(default=0, editable=False)
+    
     objects = UserManager()
     
     USERNAME_FIELD = 'telephone'
@@ -108,6 +115,21 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
         verbose_name = "Utilisateur"
         verbose_name_plural = "Utilisateurs"
         ordering = ['-created_at']
+        # UserManager (create_user...) reste le manager par défaut malgré `actifs` hérité
+        default_manager_name = 'objects'
+        indexes = [
+            # Index partiels : seuls les utilisateurs actifs sont indexés
+            models.Index(
+                fields=['nom', 'prenom'],
+                condition=models.Q(is_active=True),
+                name='users_user_nom_actif_idx',
+            ),
+            models.Index(
+                fields=['role', 'nom'],
+                condition=models.Q(is_active=True),
+                name='users_user_role_actif_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.prenom} {self.nom} ({self.telephone})"
@@ -115,6 +137,17 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
     @property
     def nom_complet(self):
         return f"{self.prenom} {self.nom}"
+    
+    @cached_property
+    def gare_principale_id(self):
+        """Gare de l'affectation principale en cours (None si aucune)"""
+        aujourd_hui = timezone.localdate()
+        return AffectationGare.actifs.filter(
+            Q(date_fin__isnull=True) | Q(date_fin__gte=aujourd_hui),
+            user_id=self.pk,
+            est_principale=True,
+            date_debut__lte=aujourd_hui,
+        ).order_by('-date_debut').values_list('gare_id', flat=True).first()
 
 
 class AffectationGare(BaseModel):
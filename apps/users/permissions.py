@@ -0,0 +1,20 @@
+"""
+Users permissions - Permissions DRF selon la portée de l'utilisateur (apps.users.portee)
+"""
+from rest_framework.permissions import BasePermission
+
+from .portee import portee_de
+
+
+class EstStaff(BasePermission):
+    """Staff ou administrateur"""
+    
+    def has_permission(self, request, view):
+        return portee_de(request.user).voit_tout
+
+
+class EstAgentGare(BasePermission):
+    """Agent de gare (gérant, guichetier), staff ou administrateur"""
+    
+    def has_permission(self, request, view):
+        return portee_de(request.user).est_agent_gare
@@ -0,0 +1,164 @@
+"""
+Users portee - Rôle et gares d'un utilisateur, pour restreindre les listes
+
+Les ViewSets restreints à une gare (réservations, demandes de fonds,
+membres de gare) demandent la portée de l'utilisateur au lieu de relire
+son rôle et ses gares à chaque requête :
+
+    portee = portee_de(request.user)
+    if portee.role in (Role.GERANT, Role.GUICHETIER):
+        queryset = queryset.filter(portee.filtre_gares('gare'))
+
+Les gares d'un utilisateur sont celles de ses affectations en cours
+(AffectationGare) et de ses appartenances actives (manager.MembreGare).
+Elles sont lues en une requête puis mises en cache PORTEE_CACHE_TIMEOUT
+secondes, comme la gare de l'affectation principale en cours ; les signaux
+de apps.users.signals invalident le cache quand une affectation ou une
+appartenance change. Le claim gare du jeton peut dater de l'émission :
+les écritures qui dépendent de la gare principale lisent
+portee.gare_principale. Le rôle vient de request.user (claims du jeton,
+voir apps.authentication.jetons) : pas de requête.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AffectationGare, Role
+
+
+# Rôles dont la vue est restreinte à leurs gares (le gérant est le responsable de gare)
+ROLES_GARE = (Role.GERANT, Role.GUICHETIER)
+
+CLE_PORTEE = 'users:portee:{}'
+CLE_GARE_PRINCIPALE = 'users:gare_principale:{}'
+
+_NON_LUE = object()
+
+
+def _filtre(chemins, valeurs):
+    """Q des lignes dont l'un des chemins vaut l'une des valeurs (aucune ligne si valeurs est vide)"""
+    if not valeurs:
+        return Q(pk__in=[])
+    filtre = Q()
+    for chemin in chemins:
+        filtre |= Q(**{f'{chemin}__in': valeurs})
+    return filtre
+
+
+class Portee:
+    """Rôle et gares d'un utilisateur, avec le filtre Q correspondant"""
+
+    __slots__ = ('user_id', 'role', 'est_staff', '_gares', '_gare_principale')
+
+    def __init__(self, user_id=None, role=None, est_staff=False, gares=None):
+        self.user_id = user_id
+        self.role = role
+        self.est_staff = est_staff
+        # Lus au premier besoin (les clients n'en ont pas l'usage)
+        self._gares = gares
+        self._gare_principale = _NON_LUE
+
+    @property
+    def est_anonyme(self):
+        return self.user_id is None
+
+    @property
+    def voit_tout(self):
+        """Staff ou administrateur : aucune restriction"""
+        return self.est_staff or self.role == Role.ADMIN
+
+    @property
+    def est_agent_gare(self):
+        """Gérant ou guichetier (restreint à ses gares), staff ou administrateur"""
+        return self.voit_tout or self.role in ROLES_GARE
+
+    @property
+    def gares(self):
+        if self._gares is None:
+            self._gares = gares_de(self.user_id) if self.user_id else frozenset()
+        return self._gares
+
+    @property
+    def gare_principale(self):
+        """Gare de l'affectation principale en cours (None si aucune)"""
+        if self._gare_principale is _NON_LUE:
+            self._gare_principale = gare_principale_de(self.user_id) if self.user_id else None
+        return self._gare_principale
+
+    def filtre_gares(self, *chemins):
+        """Q : rattaché à l'une des gares de l'utilisateur par l'un des chemins ('gare', 'trajet__gare_depart'...)"""
+        return _filtre(chemins, self.gares)
+
+
+PORTEE_ANONYME = Portee()
+
+
+def _lire_gares(user_id):
+    """Gares des affectations en cours et des appartenances actives, en une requête"""
+    from apps.manager.models import MembreGare
+
+    aujourd_hui = timezone.localdate()
+    affectations = AffectationGare.actifs.filter(
+        Q(date_fin__isnull=True) | Q(date_fin__gte=aujourd_hui),
+        user_id=user_id,
+        date_debut__lte=aujourd_hui,
+    ).order_by().values_list('gare_id', flat=True)
+    appartenances = MembreGare.objects.filter(
+        user_id=user_id, est_actif=True
+    ).order_by().values_list('gare_id', flat=True)
+    return frozenset(affectations.union(appartenances))
+
+
+def gares_de(user_id):
+    """Gares de l'utilisateur, depuis le cache si possible"""
+    cle = CLE_PORTEE.format(user_id)
+    gares = cache.get(cle)
+    if gares is None:
+        gares = _lire_gares(user_id)
+        cache.set(cle, gares, settings.PORTEE_CACHE_TIMEOUT)
+    return gares
+
+
+def gare_principale_de(user_id):
+    """Gare de l'affectation principale en cours, depuis le cache si possible"""
+    cle = CLE_GARE_PRINCIPALE.format(user_id)
+    valeur = cache.get(cle)
+    if valeur is None:
+        aujourd_hui = timezone.localdate()
+        gare_id = AffectationGare.actifs.filter(
+            Q(date_fin__isnull=True) | Q(date_fin__gte=aujourd_hui),
+            user_id=user_id,
+            est_principale=True,
+            date_debut__lte=aujourd_hui,
+        ).order_by('-date_debut').values_list('gare_id', flat=True).first()
+        # Tuple : une absence de gare est aussi mise en cache
+        valeur = (gare_id,)
+        cache.set(cle, valeur, settings.PORTEE_CACHE_TIMEOUT)
+    return valeur[0]
+
+
+def portee_de(user):
+    """Portée de l'utilisateur, calculée une fois par requête"""
+    if user is None or not user.is_authenticated:
+        return PORTEE_ANONYME
+    portee = getattr(user, '_portee', None)
+    if portee is None:
+        portee = user._portee = Portee(
+            user_id=user.pk,
+            role=user.role.nom if user.role_id else None,
+            est_staff=user.is_staff,
+        )
+    return portee
+
+
+def invalider_portee(*user_ids):
+    """Supprime les portées en cache (après le commit de la transaction en cours)"""
+    cles = [
+        cle.format(user_id)
+        for user_id in user_ids if user_id
+        for cle in (CLE_PORTEE, CLE_GARE_PRINCIPALE)
+    ]
+    if cles:
+        transaction.on_commit(lambda: cache.delete_many(cles))
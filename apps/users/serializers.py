@@ -14,6 +14,9 @@ class RoleSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_nombre_users(self, obj):
+        # Annoté par le viewset ; requête COUNT seulement hors liste
+        if hasattr(obj, 'nombre_users'):
+            return obj.nombre_users
         return obj.users.filter(is_active=True).count()
 
 
@@ -0,0 +1,15 @@
+"""
+Users signals - Invalidation des portées en cache (apps.users.portee)
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import AffectationGare
+from .portee import invalider_portee
+
+
+@receiver([post_save, post_delete], sender=AffectationGare)
+@receiver([post_save, post_delete], sender='manager.MembreGare')
+def invalider_portee_utilisateur(sender, instance, **kwargs):
+    """Les gares de l'utilisateur ont changé"""
+    invalider_portee(instance.user_id)
@@ -2,6 +2,7 @@
 Users viewsets
 """
 from rest_framework import viewsets, filters
+from django.db.models import Count, Q
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Role, User, AffectationGare
 from .serializers import (
@@ -14,24 +15,28 @@ class RoleViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les Rôles
     """
-    queryset = Role.objects.filter(is_active=True)
+    queryset = Role.actifs.annotate(
+        nombre_users=Count('users', filter=Q(users__is_active=True))
+    )
     serializer_class = RoleSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['nom', 'description']
     ordering_fields = ['nom', 'created_at']
     ordering = ['nom']
+    budget_requetes = {'list': 4, 'retrieve': 3, '*': 8}
 
 
 class UserViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les Utilisateurs
     """
-    queryset = User.objects.filter(is_active=True).select_related('role')
+    queryset = User.actifs.select_related('role')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['role', 'is_staff']
     search_fields = ['nom', 'prenom', 'telephone']
     ordering_fields = ['nom', 'prenom', 'created_at']
     ordering = ['nom']
+    budget_requetes = {'list': 4, 'retrieve': 4, '*': 10}
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -43,7 +48,7 @@ class AffectationGareViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les Affectations Gare
     """
-    queryset = AffectationGare.objects.filter(is_active=True).select_related(
+    queryset = AffectationGare.actifs.select_related(
         'user', 'gare', 'gare__quartier', 'gare__quartier__ville'
     )
     serializer_class = AffectationGareSerializer
@@ -52,3 +57,4 @@ class AffectationGareViewSet(viewsets.ModelViewSet):
     search_fields = ['user__nom', 'user__prenom', 'gare__nom']
     ordering_fields = ['date_debut', 'created_at']
     ordering = ['-date_debut']
+    budget_requetes = {'list': 4, 'retrieve': 3, '*': 8}
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -61,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.core.middleware.BudgetRequetesMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -103,6 +105,13 @@ else:
         }
     }
 
+# Connexion des séquences d'identifiants (apps.core.identifiants) : un bloc est réservé
+# et validé hors de la transaction de l'appelant. SQLite n'a qu'un écrivain, il garde
+# la connexion par défaut : dans une transaction, une valeur par identifiant au lieu
+# d'un bloc (non pris en charge en production, voir le module).
+if DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3':
+    DATABASES['identifiants'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
 # CACHES - Auto-détection
 REDIS_URL = config('REDIS_URL', default=None)
 
@@ -125,6 +134,46 @@ else:
         }
     }
 
+# Durée de vie (secondes) du payload de tracking public en cache
+TRACKING_CACHE_TIMEOUT = config('TRACKING_CACHE_TIMEOUT', default=3600, cast=int)
+# Durée de vie (secondes) de la réponse pour un code de suivi inconnu (0 : pas de cache)
+TRACKING_CACHE_TIMEOUT_INCONNU = config('TRACKING_CACHE_TIMEOUT_INCONNU', default=30, cast=int)
+
+# Durée de vie (secondes) des gares d'un utilisateur en cache (apps.users.portee)
+PORTEE_CACHE_TIMEOUT = config('PORTEE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Âge maximal (secondes) d'un index en mémoire (apps.core.index_local), reconstruit
+# même sans invalidation : seul rafraîchissement entre processus avec un cache locmem
+INDEX_LOCAL_TIMEOUT = config('INDEX_LOCAL_TIMEOUT', default=300, cast=int)
+
+# Recherche de correspondances (apps.trips.correspondances)
+CORRESPONDANCE_MIN_MINUTES = config('CORRESPONDANCE_MIN_MINUTES', default=30, cast=int)
+CORRESPONDANCES_HORIZON_HEURES = config('CORRESPONDANCES_HORIZON_HEURES', default=48, cast=int)
+
+# Clés primaires UUIDv7 ordonnées dans le temps au lieu d'uuid4 (apps.core.utils.nouvel_uuid)
+UUID_ORDONNES = config('UUID_ORDONNES', default=False, cast=bool)
+
+# Générateurs d'identifiants lisibles (apps.core.identifiants)
+# Deux générateurs peuvent partager une séquence : les numéros restent uniques
+IDENTIFIANTS = {
+    'colis': {'prefixe': 'COL-'},
+    'ticket_trajet': {'prefixe': 'TR', 'sequence': 'tickets'},
+    'ticket_reservation': {'prefixe': 'TK', 'sequence': 'tickets'},
+}
+IDENTIFIANTS_TAILLE_BLOC = config('IDENTIFIANTS_TAILLE_BLOC', default=1000, cast=int)
+
+# Budgets de requêtes SQL par vue (apps.core.middleware.BudgetRequetesMiddleware)
+QUERY_BUDGET_ENABLED = config('QUERY_BUDGET_ENABLED', default=DEBUG, cast=bool)
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+QUERY_BUDGET_DEFAULT = config('QUERY_BUDGET_DEFAULT', default=10, cast=int)
+QUERY_BUDGET_N_PLUS_ONE = config('QUERY_BUDGET_N_PLUS_ONE', default=5, cast=int)
+
+# Instrumentation par requête (apps.core.instrumentation) : Server-Timing, journal, /api/v1/metrics/
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=True, cast=bool)
+SERVER_TIMING_ENABLED = config('SERVER_TIMING_ENABLED', default=True, cast=bool)
+# Jeton Bearer du scrapeur Prometheus ; sans jeton, /api/v1/metrics/ est réservé au staff
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -153,10 +202,23 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.authentication.jetons.JWTSansEtatAuthentication',
     ],
 }
 
+# Rendu et lecture JSON par orjson (apps.core.renderers), repli sur DRF s'il n'est pas installé
+JSON_RAPIDE = config('JSON_RAPIDE', default=True, cast=bool)
+if JSON_RAPIDE:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'apps.core.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'apps.core.renderers.OrjsonParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
 # Spectacular (Swagger)
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Colisso API - Module 1',
@@ -185,8 +247,30 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    'TOKEN_REFRESH_SERIALIZER': 'apps.authentication.serializers.RafraichissementSerializer',
 }
 
+# Durée (secondes) de mise en cache de la vérification de révocation des jetons (apps.authentication.jetons)
+JWT_REVOCATION_CACHE_TIMEOUT = config('JWT_REVOCATION_CACHE_TIMEOUT', default=30, cast=int)
+
+# Billets signés (apps.trips.billets) : clé HMAC dédiée, partagée avec les portiques d'embarquement
+# (obligatoire, différente de SECRET_KEY). Rotation : nouvelle clé sous un nouvel identifiant,
+# l'ancienne reste dans BILLETS_SIGNING_KEYS_ANCIENNES ("id:clé,id:clé") jusqu'à expiration de ses billets
+BILLETS_SIGNING_KEY = config('BILLETS_SIGNING_KEY', default='')
+BILLETS_SIGNING_KEY_ID = config('BILLETS_SIGNING_KEY_ID', default=1, cast=int)
+BILLETS_SIGNING_KEYS_ANCIENNES = config(
+    'BILLETS_SIGNING_KEYS_ANCIENNES',
+    default='',
+    cast=lambda v: {
+        int(identifiant): cle
+        for identifiant, cle in (s.strip().split(':', 1) for s in v.split(',') if s.strip())
+    }
+)
+# Validité d'un billet après l'heure de départ du trajet
+BILLETS_VALIDITE_HEURES = config('BILLETS_VALIDITE_HEURES', default=12, cast=int)
+# Nombre maximal de validations hors ligne par synchronisation
+BILLETS_SYNC_MAX = config('BILLETS_SYNC_MAX', default=5000, cast=int)
+
 # ==================== JAZZMIN CONFIGURATION ====================
 
 JAZZMIN_SETTINGS = {
@@ -268,10 +352,7 @@ JAZZMIN_SETTINGS = {
         "trips": "fas fa-route",
         "trips.Trajet": "fas fa-road",
         "trips.Bus": "fas fa-bus",
-        
-        # Reservations
-        "reservations": "fas fa-ticket-alt",
-        "reservations.Reservation": "fas fa-clipboard-list",
+        "trips.Reservation": "fas fa-clipboard-list",
         
         # Parcels
         "parcels": "fas fa-box-open",